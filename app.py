@@ -1,141 +1,234 @@
-from flask import Flask, render_template, flash, redirect, url_for, request, session
-from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from routes.auth_routes import auth_bp
-from routes.student_routes import student_bp
-from routes.syllabus_routes import syllabus_bp
-from routes.admin_routes import admin_bp
-from models import User, get_programs, get_specializations, get_semesters, get_subjects, get_units, get_syllabus_files
-import os
-from werkzeug.utils import secure_filename
+import time
+_import_started = time.perf_counter()
 
-app = Flask(__name__)
-app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-change-this-in-production')
+import logging
+import os
+import json
+import hashlib
+from flask import Flask, render_template, flash, redirect, url_for, request, session, make_response, current_app
+from flask_login import LoginManager, login_required, current_user, user_logged_in, user_logged_out
+from models import load_user_identity, claims_current, get_identity_stats, get_specializations, get_semesters, get_subjects, get_dashboard_stats, get_subject_detail, get_user_counts, get_student_enrollments, search_catalogue, API_PAGE_SIZE
+import db_config
+import file_store
+import maintenance
+import template_cache
+import instrumentation
+import passwords
+import serving
+import throttle
+from config import DEFAULT_SECRET_KEY, get_config
+from template_cache import Deferred
+from catalogue_cache import get_catalogue_cache_stats, get_response_cache_stats, cached_json_response
+from werkzeug.http import is_resource_modified
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+logger = logging.getLogger(__name__)
 
-# Configure upload folder
-UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'txt'}
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
-# Create upload folder if it doesn't exist
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
-
-# Initialize Flask-Login
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'auth.login'
 login_manager.login_message = 'Please log in to access this page.'
 
+IMPORT_SECONDS = time.perf_counter() - _import_started
+
+
+def create_app(config=None):
+    """
+    Build the application.
+    Args:
+        config: a config class or object, or a name from config.CONFIGS;
+                APP_CONFIG / FLASK_ENV pick one by default
+    """
+    started = time.perf_counter()
+    app = Flask(__name__)
+    app.config.from_object(get_config(config) if config is None or isinstance(config, str) else config)
+    logging.basicConfig(level=app.config['LOG_LEVEL'])
+    if not app.debug and not app.testing and app.config['SECRET_KEY'] == DEFAULT_SECRET_KEY:
+        logger.warning("SECRET_KEY is not set; sessions are signed with the default key")
+
+    # Uploads stream straight to disk; MAX_CONTENT_LENGTH rejects oversized bodies up front
+    file_store.init_app(app)
+    # Housekeeping such as orphaned-file cleanup runs off the request path
+    maintenance.init_app(app)
+    # {% cache %} fragments, on-disk template bytecode and debug render timings
+    template_cache.init_app(app)
+    # Per-request latency, SQL and render timings (Server-Timing, /metrics, query budget)
+    instrumentation.init_app(app)
+
+    # Database connection pool (one per worker process, released per request)
+    app.config.setdefault('DATABASE_PATH', db_config.DB_PATH)
+    app.config.setdefault('DB_POOL_SIZE', db_config.POOL_SIZE)
+    app.config.setdefault('DB_POOL_TIMEOUT', db_config.POOL_TIMEOUT)
+    db_config.init_app(app)
+
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+    # Native threads for blocking calls (hashing, libmagic) under gevent workers
+    serving.init_app(app)
+    # Password hashing policy and the optional bounded verification pool
+    passwords.init_app(app)
+    # Token-bucket limits on login and registration attempts, per IP and per account
+    throttle.init_app(app)
+
+    if app.config['TRUSTED_PROXIES']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'],
+                                x_proto=app.config['TRUSTED_PROXIES'])
+
+    login_manager.init_app(app)
+    user_logged_in.connect(store_user_claims, app)
+    user_logged_out.connect(clear_user_claims, app)
+
+    # Blueprints pull in the heavier route modules, so they are imported here
+    # rather than by everything that imports this module
+    from routes.auth_routes import auth_bp
+    from routes.student_routes import student_bp
+    from routes.syllabus_routes import syllabus_bp
+    from routes.admin_routes import admin_bp
+    from routes.api_routes import api_bp
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(student_bp)
+    app.register_blueprint(syllabus_bp)
+    app.register_blueprint(admin_bp)
+    app.register_blueprint(api_bp)
+
+    app.add_url_rule('/', 'home', home)
+    app.add_url_rule('/dashboard', 'dashboard', dashboard)
+    app.add_url_rule('/view_syllabus', 'view_syllabus', view_syllabus)
+    app.add_url_rule('/search', 'search', search)
+    app.add_url_rule('/get_specializations/<int:program_id>', 'get_specializations_ajax', get_specializations_ajax)
+    app.add_url_rule('/get_semesters/<int:program_id>', 'get_semesters_ajax', get_semesters_ajax)
+    app.add_url_rule('/get_subjects/<int:specialization_id>/<int:semester_id>', 'get_subjects_ajax',
+                     get_subjects_ajax)
+    app.add_url_rule('/subject/<int:subject_id>', 'view_subject', view_subject)
+    app.add_url_rule('/health', 'health_check', health_check)
+
+    app.extensions['startup'] = {
+        'import_ms': round(IMPORT_SECONDS * 1000, 2),
+        'create_ms': round((time.perf_counter() - started) * 1000, 2),
+        'created_pid': os.getpid(),
+    }
+    logger.info(f"App created in {app.extensions['startup']['create_ms']:.0f}ms "
+                f"(imports took {app.extensions['startup']['import_ms']:.0f}ms)")
+    return app
+
+
+def __getattr__(name):
+    # "app:app" (gunicorn) and "from app import app" build the default app on first use
+    if name == 'app':
+        globals()['app'] = create_app()
+        return globals()['app']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.get_by_id(int(user_id))
+    claims = session.get('user_claims') if current_app.config['USER_SESSION_CLAIMS'] else None
+    user = load_user_identity(int(user_id), claims)
+    # Claims that expired or predate a change to any account are reissued from the fresh user
+    if claims is not None and user is not None and not claims_current(claims, user.id):
+        session['user_claims'] = user.to_claims()
+    return user
+
+def store_user_claims(sender, user, **extra):
+    if sender.config['USER_SESSION_CLAIMS']:
+        session['user_claims'] = user.to_claims()
 
-# Register Blueprints
-app.register_blueprint(auth_bp)
-app.register_blueprint(student_bp)
-app.register_blueprint(syllabus_bp)
-app.register_blueprint(admin_bp)
+def clear_user_claims(sender, user, **extra):
+    session.pop('user_claims', None)
 
-@app.route('/')
 def home():
     return render_template('home.html')
 
-@app.route('/dashboard')
 @login_required
 def dashboard():
     if current_user.role == 'admin':
-        # Get data for dashboard statistics
-        programs = get_programs()
-        specializations = get_specializations()
-        subjects = get_subjects()
-        units = []
-        files = []
-        
-        # Get all units
-        for subject in subjects:
-            subject_units = get_units(subject['id'])
-            units.extend(subject_units)
-        
-        # Get all files
-        for subject in subjects:
-            subject_files = get_syllabus_files(subject['id'])
-            files.extend(subject_files)
-        
-        return render_template('admin_dashboard.html', 
-                             programs=programs, 
-                             specializations=specializations,
-                             subjects=subjects, 
-                             units=units, 
-                             files=files)
+        # Catalogue counters come from a single aggregate query, only run when
+        # the cached stats cards are stale; user counts are trigger-maintained
+        return render_template('admin_dashboard.html', stats=Deferred(get_dashboard_stats),
+                               user_counts=get_user_counts())
     else:
-        return render_template('student_dashboard.html')
+        return render_template('student_dashboard.html', enrollments=get_student_enrollments(current_user.id))
 
-@app.route('/view_syllabus')
 @login_required
 def view_syllabus():
-    # Get all data from backend
-    programs = get_programs()
-    specializations = get_specializations()
-    semesters = get_semesters()
-    subjects = get_subjects()
-    
-    # Organize data by program for easier access
-    program_data = {}
-    for program in programs:
-        program_data[program['id']] = {
-            'program': program,
-            'specializations': [spec for spec in specializations if spec['program_id'] == program['id']],
-            'semesters': [sem for sem in semesters if sem['program_id'] == program['id']]
-        }
-    
-    return render_template('view_syllabus.html', 
-                         programs=programs, 
-                         specializations=specializations,
-                         semesters=semesters,
-                         subjects=subjects,
-                         program_data=program_data)
-
-@app.route('/get_specializations/<int:program_id>')
+    # The page is a shell; the browser loads the catalogue level by level from /api/v1
+    return render_template('view_syllabus.html', page_size=API_PAGE_SIZE)
+
+@login_required
+def search():
+    query = request.args.get('q', '').strip()
+    page = request.args.get('page', 1, type=int)
+    search_results = search_catalogue(query, page)
+    return render_template('search.html', query=query, **search_results)
+
+@cached_json_response
 def get_specializations_ajax(program_id):
     specializations = get_specializations(program_id)
     return {'specializations': specializations}
 
-@app.route('/get_semesters/<int:program_id>')
+@cached_json_response
 def get_semesters_ajax(program_id):
     semesters = get_semesters(program_id)
     return {'semesters': semesters}
 
-@app.route('/get_subjects/<int:specialization_id>/<int:semester_id>')
+@cached_json_response
 def get_subjects_ajax(specialization_id, semester_id):
     subjects = get_subjects(specialization_id, semester_id)
     return {'subjects': subjects}
 
-@app.route('/subject/<int:subject_id>')
 @login_required
 def view_subject(subject_id):
-    from models import get_subjects, get_units, get_syllabus_files
-    
-    # Get subject details
-    subjects = get_subjects()
-    subject = None
-    for s in subjects:
-        if s['id'] == subject_id:
-            subject = s
-            break
-    
-    if not subject:
+    detail = get_subject_detail(subject_id)
+    if not detail:
         flash('Subject not found', 'error')
         return redirect(url_for('view_syllabus'))
     
-    # Get units and files
-    units = get_units(subject_id)
-    files = get_syllabus_files(subject_id)
+    units = detail.pop('units')
+    files = detail.pop('files')
     
-    return render_template('subject_detail.html', subject=subject, units=units, files=files)
+    # The page varies by viewer (admin navigation), so the ETag covers the user too.
+    # There is no Last-Modified: deactivating a unit or deleting a file changes
+    # the page without leaving a newer timestamp behind, so only the ETag validates.
+    fingerprint = json.dumps([detail, units, files, current_user.id, current_user.role],
+                             sort_keys=True, default=str)
+    etag = hashlib.sha1(fingerprint.encode()).hexdigest()
+    if not is_resource_modified(request.environ, etag=etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(render_template('subject_detail.html', subject=detail, units=units, files=files))
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response
 
-@app.route('/health')
 def health_check():
-    return {'status': 'healthy', 'message': 'Syllabus Management System is running'}
+    health = {
+        'status': 'healthy',
+        'message': 'Syllabus Management System is running'
+    }
+    # Pool, cache and process details are for admins and monitoring hosts only
+    if not instrumentation.monitoring_allowed():
+        return health
+    health.update({
+        'db_pool': db_config.get_pool_stats(),
+        'catalogue_cache': get_catalogue_cache_stats(),
+        'response_cache': get_response_cache_stats(),
+        'fragment_cache': template_cache.get_fragment_cache_stats(),
+        'user_identity': get_identity_stats(),
+        'passwords': passwords.get_password_stats(),
+        'login_throttle': throttle.get_throttle_stats(),
+        'file_cache': file_store.get_file_cache_stats(),
+        'maintenance': maintenance.get_maintenance_stats(),
+        'startup': get_startup_stats(),
+        'serving': serving.get_serving_stats()
+    })
+    return health
+
+def get_startup_stats():
+    startup = current_app.extensions['startup']
+    # Under gunicorn --preload the app is built once in the master and forked into each worker
+    return dict(startup, pid=os.getpid(), preloaded=startup['created_pid'] != os.getpid())
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -150,4 +243,4 @@ if __name__ == '__main__':
     # Get debug mode from environment variable
     debug = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
     
-    app.run(host=host, port=port, debug=debug)
+    create_app().run(host=host, port=port, debug=debug)
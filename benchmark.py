@@ -0,0 +1,808 @@
+#!/usr/bin/env python3
+"""
+Benchmark script for Syllabus Management System
+Seeds synthetic catalogues into a temporary SQLite database and times:
+  dashboard - admin dashboard data loading before (per-subject N+1 queries)
+              and after (single aggregate query)
+  search    - full-text catalogue search queries
+  requests  - end-to-end requests through the Flask test client (dashboards,
+              syllabus browser, subject pages, AJAX and API endpoints, search,
+              admin listings, upload and download), reported as p50/p95/p99
+              latency and throughput per scenario. Results can be saved as a
+              baseline and later runs compared against it; a run whose p95
+              regresses past the tolerance exits non-zero.
+  startup   - cold start of a worker in fresh interpreters: interpreter boot,
+              importing app.py and create_app(), plus the slowest imports
+  serve     - load test of real gunicorn servers, one per worker class (sync,
+              gthread, gevent), with concurrent HTTP clients mixing page and
+              API requests with logins; reports throughput and latency per
+              worker class against the sync baseline
+
+Usage:
+    python benchmark.py [dashboard|search] [size ...]
+    python benchmark.py requests [--scale small|medium|large] [--subjects N ...]
+                                 [--requests N] [--concurrency N]
+                                 [--save baseline.json] [--compare baseline.json]
+    python benchmark.py startup [--runs N]
+    python benchmark.py serve [--worker-class sync gthread gevent] [--workers N]
+                              [--clients N] [--duration SECONDS] [--login-share FRACTION]
+"""
+
+import argparse
+import hashlib
+import http.client
+import io
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import socket
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_SIZES = (10, 1000, 50000)
+SEARCH_UNIT_COUNT = 100000
+UNITS_PER_SUBJECT = 5
+FILES_PER_SUBJECT = 1
+
+VOCABULARY = (
+    "algorithm analysis architecture array automata calculus circuit cloud compiler "
+    "computing concurrency control data database design device digital discrete "
+    "distributed dynamics electronics energy engineering fluid graph hardware heat "
+    "kinematics learning linear logic machine management material mechanics memory "
+    "microprocessor network numerical operating optimization probability process "
+    "programming protocol queue recursion security signal software statistics "
+    "structure structures system systems theory thermodynamics transaction tree "
+    "vector web wireless"
+).split()
+
+# Synthetic catalogue shapes for the request benchmark. Subjects are spread
+# evenly over every (specialization, semester) pair of their program.
+SCALES = {
+    'small': dict(programs=2, specializations=4, semesters=8, subjects=200,
+                  units=5, files=1, users=50),
+    'medium': dict(programs=5, specializations=6, semesters=8, subjects=5000,
+                   units=6, files=2, users=2000),
+    'large': dict(programs=10, specializations=8, semesters=10, subjects=50000,
+                  units=8, files=2, users=20000),
+}
+BENCHMARK_PASSWORD = 'benchmark'
+BLOB_COUNT = 32              # distinct file contents shared by the generated files
+BLOB_SIZE = 64 * 1024
+UPLOAD_SIZE = 256 * 1024
+REQUESTS_PER_SCENARIO = 200
+UPLOADS_PER_RUN = 20
+WARMUP_REQUESTS = 5
+REGRESSION_TOLERANCE = 0.20  # allowed p95 growth over the baseline
+REGRESSION_FLOOR_MS = 1.0    # smaller absolute changes are treated as noise
+STARTUP_RUNS = 5
+SLOWEST_IMPORTS = 10
+SERVE_WORKER_CLASSES = ('sync', 'gthread', 'gevent')
+SERVE_WORKERS = 2
+SERVE_CLIENTS = 50
+SERVE_DURATION = 10.0
+SERVE_LOGIN_SHARE = 0.1      # share of requests that are logins, i.e. a full password hash
+SERVE_BOOT_TIMEOUT = 30.0
+SERVE_REQUEST_TIMEOUT = 60.0
+
+# Keep the app's default pool away from the real database
+os.environ.setdefault('DATABASE_PATH', os.path.join(tempfile.mkdtemp(), 'benchmark.db'))
+
+
+def build_vocabulary(rng, size=5000):
+    """Domain words followed by pronounceable filler words."""
+    syllables = ['ba', 'co', 'de', 'fi', 'gra', 'hy', 'ki', 'lo', 'mu', 'ne', 'pha', 'qui',
+                 'ro', 'si', 'tri', 'vo', 'xe', 'zy', 'ter', 'lin', 'mor', 'tic', 'al', 'ion']
+    vocabulary = list(VOCABULARY)
+    seen = set(vocabulary)
+    while len(vocabulary) < size:
+        word = ''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            vocabulary.append(word)
+    return vocabulary
+
+
+def seed_catalogue(db_path, subject_count, units_per_subject=UNITS_PER_SUBJECT,
+                   files_per_subject=FILES_PER_SUBJECT):
+    """Create the schema and fill it with a synthetic catalogue."""
+    from migrate import run_migrations
+    from models import rebuild_search_index, search_triggers_suspended
+
+    conn = sqlite3.connect(db_path)
+    run_migrations(conn)
+    cursor = conn.cursor()
+    with search_triggers_suspended(cursor):
+        _insert_catalogue(conn, subject_count, units_per_subject, files_per_subject)
+        rebuild_search_index(cursor)
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def _insert_catalogue(conn, subject_count, units_per_subject, files_per_subject):
+
+    spec_ids = [row[0] for row in conn.execute("SELECT id FROM specializations")]
+    sem_ids = [row[0] for row in conn.execute("SELECT id FROM semesters")]
+    rng = random.Random(42)
+    vocabulary = build_vocabulary(rng)
+    # Zipf-like word frequencies, as in real course text
+    cum_weights = []
+    total = 0.0
+    for rank in range(1, len(vocabulary) + 1):
+        total += 1.0 / rank
+        cum_weights.append(total)
+
+    def words(count):
+        return ' '.join(rng.choices(vocabulary, cum_weights=cum_weights, k=count))
+
+    conn.executemany(
+        "INSERT INTO subjects (name, code, credits, description, specialization_id, semester_id) VALUES (?, ?, ?, ?, ?, ?)",
+        ((f"{words(2).title()} {i}", f"BENCH{i:06d}", 3, words(12),
+          spec_ids[i % len(spec_ids)], sem_ids[i % len(sem_ids)]) for i in range(subject_count))
+    )
+    subject_ids = [row[0] for row in conn.execute("SELECT id FROM subjects")]
+    conn.executemany(
+        "INSERT INTO units (subject_id, unit_number, title, description, topics, hours_allocated) VALUES (?, ?, ?, ?, ?, ?)",
+        ((subject_id, n, words(3).title(), words(20), ', '.join(words(2) for _ in range(4)), 10)
+         for subject_id in subject_ids for n in range(1, units_per_subject + 1))
+    )
+    conn.executemany(
+        "INSERT INTO syllabus_files (subject_id, filename, original_filename, file_path, file_size, file_type, uploaded_by) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ((subject_id, f"file_{subject_id}_{n}.pdf", f"file_{n}.pdf", f"uploads/file_{subject_id}_{n}.pdf",
+          1024, 'application/pdf', 1)
+         for subject_id in subject_ids for n in range(files_per_subject))
+    )
+
+
+def generate_catalogue(db_path, blob_dir, programs, specializations, semesters, subjects,
+                       units, files, users, seed=42):
+    """
+    Create the schema and fill it with a synthetic catalogue of the given
+    shape: `specializations` and `semesters` are per program, `units` and
+    `files` per subject. Files point at real blobs in `blob_dir`, so they can
+    be downloaded. Every generated user, and the admin, has BENCHMARK_PASSWORD.
+    Returns the ids the request scenarios pick from.
+    """
+    from migrate import run_migrations
+    from models import rebuild_search_index, search_triggers_suspended
+    from passwords import hash_password
+    from file_store import blob_path
+
+    rng = random.Random(seed)
+    vocabulary = build_vocabulary(rng)
+    cum_weights = []
+    total = 0.0
+    for rank in range(1, len(vocabulary) + 1):
+        total += 1.0 / rank
+        cum_weights.append(total)
+
+    def words(count):
+        return ' '.join(rng.choices(vocabulary, cum_weights=cum_weights, k=count))
+
+    blobs = []
+    for n in range(BLOB_COUNT):
+        data = b'%PDF-1.4\n' + rng.randbytes(BLOB_SIZE)
+        content_hash = hashlib.sha256(data).hexdigest()
+        path = blob_path(blob_dir, content_hash)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        blobs.append((content_hash, path, len(data)))
+
+    conn = sqlite3.connect(db_path)
+    run_migrations(conn)
+    cursor = conn.cursor()
+    # Hashing is deliberately slow, so every account shares one hash
+    password_hash = hash_password(BENCHMARK_PASSWORD)
+    with search_triggers_suspended(cursor):
+        cursor.execute("UPDATE users SET password_hash = ? WHERE role = 'admin'", (password_hash,))
+        admin_id = cursor.execute("SELECT id FROM users WHERE role = 'admin' ORDER BY id").fetchone()[0]
+        cursor.executemany(
+            "INSERT INTO users (username, email, password_hash, role, full_name) VALUES (?, ?, ?, 'student', ?)",
+            ((f"student{n}", f"student{n}@bench.example", password_hash, words(2).title())
+             for n in range(users))
+        )
+
+        pairs = []
+        for p in range(programs):
+            cursor.execute("INSERT INTO programs (name, code, description) VALUES (?, ?, ?)",
+                           (f"{words(2).title()} Program", f"BP{p:04d}", words(10)))
+            program_id = cursor.lastrowid
+            spec_ids = []
+            for n in range(specializations):
+                cursor.execute("INSERT INTO specializations (program_id, name, code, description) VALUES (?, ?, ?, ?)",
+                               (program_id, words(2).title(), f"BS{p:04d}{n:02d}", words(8)))
+                spec_ids.append(cursor.lastrowid)
+            sem_ids = []
+            for n in range(1, semesters + 1):
+                cursor.execute("INSERT INTO semesters (program_id, semester_number, name) VALUES (?, ?, ?)",
+                               (program_id, n, f"Semester {n}"))
+                sem_ids.append(cursor.lastrowid)
+            pairs.extend((program_id, spec_id, sem_id) for spec_id in spec_ids for sem_id in sem_ids)
+
+        cursor.executemany(
+            "INSERT INTO subjects (name, code, credits, description, specialization_id, semester_id) VALUES (?, ?, ?, ?, ?, ?)",
+            ((f"{words(2).title()} {i}", f"BSUB{i:07d}", rng.randint(2, 5), words(12),
+              pairs[i % len(pairs)][1], pairs[i % len(pairs)][2]) for i in range(subjects))
+        )
+        subject_ids = [row[0] for row in cursor.execute("SELECT id FROM subjects WHERE code LIKE 'BSUB%' ORDER BY id")]
+        cursor.executemany(
+            "INSERT INTO units (subject_id, unit_number, title, description, topics, hours_allocated) VALUES (?, ?, ?, ?, ?, ?)",
+            ((subject_id, n, words(3).title(), words(20), ', '.join(words(2) for _ in range(4)), 10)
+             for subject_id in subject_ids for n in range(1, units + 1))
+        )
+
+        def file_rows():
+            for subject_id in subject_ids:
+                for n in range(files):
+                    content_hash, path, size = rng.choice(blobs)
+                    yield (subject_id, f"bench_{subject_id}_{n}.pdf", f"{words(2).replace(' ', '_')}.pdf",
+                           path, size, 'application/pdf', admin_id, content_hash)
+
+        cursor.executemany(
+            "INSERT INTO syllabus_files (subject_id, filename, original_filename, file_path, file_size, file_type, uploaded_by, content_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            file_rows()
+        )
+        rebuild_search_index(cursor)
+    conn.commit()
+    conn.execute("ANALYZE")
+
+    ids = {
+        'programs': sorted({program_id for program_id, _, _ in pairs}),
+        'pairs': [(spec_id, sem_id) for _, spec_id, sem_id in pairs],
+        'semesters': sorted({sem_id for _, _, sem_id in pairs}),
+        'subjects': subject_ids,
+        'files': [row[0] for row in conn.execute("SELECT id FROM syllabus_files ORDER BY id")],
+        'students': [f"student{n}@bench.example" for n in range(min(users, 50))],
+        'words': vocabulary[:200],
+    }
+    conn.close()
+    return ids
+
+
+def dashboard_before():
+    """The original dashboard: one query per subject for units and for files."""
+    from models import get_programs, get_specializations, get_subjects, get_units, get_syllabus_files, get_total_users
+
+    # Bypass the catalogue cache so every run pays for the queries
+    programs = get_programs.uncached()
+    specializations = get_specializations.uncached()
+    subjects = get_subjects.uncached()
+    units = []
+    files = []
+    for subject in subjects:
+        units.extend(get_units.uncached(subject['id']))
+    for subject in subjects:
+        files.extend(get_syllabus_files(subject['id']))
+    return {
+        'programs': len(programs),
+        'specializations': len(specializations),
+        'subjects': len(subjects),
+        'units': len(units),
+        'files': len(files),
+        'users': get_total_users(),
+    }
+
+
+def dashboard_after():
+    from models import get_dashboard_stats
+    return get_dashboard_stats()
+
+
+def time_call(func, repeat=3):
+    """Return (best seconds, result) over `repeat` runs inside an app context."""
+    from app import app
+
+    best = None
+    result = None
+    for _ in range(repeat):
+        with app.app_context():
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def benchmark_dashboard(sizes=DEFAULT_SIZES):
+    import db_config
+    from app import app  # noqa: F401 - creating the app configures the pool, so do it before repointing
+
+    print(f"{'subjects':>10} {'before (ms)':>14} {'after (ms)':>12} {'speedup':>9}")
+    for size in sizes:
+        db_path = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+        seed_catalogue(db_path, size)
+        db_config.configure_pool(db_path)
+
+        before, before_stats = time_call(dashboard_before, repeat=1 if size > 1000 else 3)
+        after, after_stats = time_call(dashboard_after)
+        if before_stats != after_stats:
+            print(f"❌ Stats mismatch at {size} subjects: {before_stats} != {after_stats}")
+        print(f"{size:>10} {before * 1000:>14.2f} {after * 1000:>12.2f} {before / after:>8.0f}x")
+
+
+def benchmark_search(unit_count=SEARCH_UNIT_COUNT):
+    import db_config
+    from app import app
+    from models import search_catalogue
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    seed_catalogue(db_path, max(1, unit_count // UNITS_PER_SUBJECT))
+    db_config.configure_pool(db_path)
+
+    queries = ['data', 'datab', 'network security', 'thermo', 'machine learning',
+               'operating systems', 'graph tree', 'co', 'distributed transaction', 'xyzzy']
+    print(f"{unit_count} units, {len(queries)} queries x pages 1-3")
+    print(f"{'query':<26} {'median (ms)':>12} {'p95 (ms)':>10} {'hits/page':>10}")
+    all_timings = []
+    with app.app_context():
+        for query in queries:
+            timings = []
+            hits = 0
+            for _ in range(10):
+                for page in (1, 2, 3):
+                    start = time.perf_counter()
+                    response = search_catalogue(query, page)
+                    timings.append(time.perf_counter() - start)
+                    hits = max(hits, len(response['results']))
+            timings.sort()
+            all_timings.extend(timings)
+            print(f"{query:<26} {timings[len(timings) // 2] * 1000:>12.2f} "
+                  f"{timings[int(len(timings) * 0.95)] * 1000:>10.2f} {hits:>10}")
+    all_timings.sort()
+    print(f"{'overall':<26} {all_timings[len(all_timings) // 2] * 1000:>12.2f} "
+          f"{all_timings[int(len(all_timings) * 0.95)] * 1000:>10.2f}")
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def login(client, email):
+    response = client.post('/login', data={'email': email, 'password': BENCHMARK_PASSWORD})
+    if response.status_code != 302:
+        raise RuntimeError(f"Benchmark login failed for {email}: {response.status_code}")
+    return client
+
+
+def upload_request(client, rng, ids):
+    data = b'%PDF-1.4\n' + rng.randbytes(UPLOAD_SIZE)
+    return client.post('/admin/upload', content_type='multipart/form-data', data={
+        'subject_id': str(rng.choice(ids['subjects'])),
+        'file': (io.BytesIO(data), 'bench_upload.pdf'),
+    })
+
+
+def build_scenarios(ids):
+    """
+    (name, user, requests, status, make_request) for every scenario. `user`
+    is 'admin' or 'student', `requests` overrides the per-scenario count and
+    any answer other than `status` counts as an error; make_request(client,
+    rng) issues one request.
+    """
+    def get(path_for):
+        return lambda client, rng: client.get(path_for(rng))
+
+    def pair(rng):
+        return rng.choice(ids['pairs'])
+
+    return [
+        ('dashboard', 'student', None, 200, get(lambda rng: '/dashboard')),
+        ('admin_dashboard', 'admin', None, 200, get(lambda rng: '/admin/dashboard')),
+        ('view_syllabus', 'student', None, 200, get(lambda rng: '/view_syllabus')),
+        ('subject_detail', 'student', None, 200,
+         get(lambda rng: f"/subject/{rng.choice(ids['subjects'])}")),
+        ('ajax_specializations', 'student', None, 200,
+         get(lambda rng: f"/get_specializations/{rng.choice(ids['programs'])}")),
+        ('ajax_semesters', 'student', None, 200,
+         get(lambda rng: f"/get_semesters/{rng.choice(ids['programs'])}")),
+        ('ajax_subjects', 'student', None, 200,
+         get(lambda rng: '/get_subjects/{}/{}'.format(*pair(rng)))),
+        ('api_programs', 'student', None, 200, get(lambda rng: '/api/v1/programs')),
+        ('api_subjects', 'student', None, 200,
+         get(lambda rng: f"/api/v1/semesters/{rng.choice(ids['semesters'])}/subjects?fields=name,code,unit_count")),
+        ('search', 'student', None, 200, get(lambda rng: f"/search?q={rng.choice(ids['words'])}")),
+        ('admin_units', 'admin', None, 200, get(lambda rng: f"/admin/units?page={rng.randint(1, 5)}")),
+        ('download', 'admin', None, 200, get(lambda rng: f"/download/{rng.choice(ids['files'])}")),
+        ('upload', 'admin', UPLOADS_PER_RUN, 200, lambda client, rng: upload_request(client, rng, ids)),
+    ]
+
+
+def run_scenario(app, ids, user, count, status, make_request, concurrency, seed):
+    """Issue `count` requests over `concurrency` logged-in clients; returns (latencies, errors, seconds)."""
+    email = 'admin@syllabus.com' if user == 'admin' else None
+    clients = [login(app.test_client(), email or ids['students'][n % len(ids['students'])])
+               for n in range(concurrency)]
+    warmup_rng = random.Random(seed)
+    for _ in range(WARMUP_REQUESTS):
+        make_request(clients[0], warmup_rng)
+
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def worker(n):
+        rng = random.Random(seed * 1000 + n)
+        local = []
+        local_errors = 0
+        for _ in range(count // concurrency + (n < count % concurrency)):
+            start = time.perf_counter()
+            response = make_request(clients[n], rng)
+            local.append(time.perf_counter() - start)
+            if response.status_code != status:
+                local_errors += 1
+            response.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return latencies, errors[0], elapsed
+
+
+def remove_benchmark_uploads(app, db_path):
+    """Delete the files the upload scenario added, through the app so blobs are released."""
+    conn = sqlite3.connect(db_path)
+    file_ids = [row[0] for row in conn.execute(
+        "SELECT id FROM syllabus_files WHERE original_filename = 'bench_upload.pdf'")]
+    conn.close()
+    client = login(app.test_client(), 'admin@syllabus.com')
+    for file_id in file_ids:
+        client.post(f'/admin/files/{file_id}/delete')
+
+
+def benchmark_requests(shape, requests=REQUESTS_PER_SCENARIO, concurrency=1, only=None, seed=42):
+    import db_config
+    import throttle
+    from app import app
+
+    # Every scenario logs its clients in from the same address
+    throttle.configure(enabled=False)
+    work_dir = tempfile.mkdtemp()
+    db_path = os.path.join(work_dir, 'benchmark.db')
+    start = time.perf_counter()
+    ids = generate_catalogue(db_path, os.path.join(work_dir, 'uploads'), seed=seed, **shape)
+    print(f"Generated {shape} in {time.perf_counter() - start:.1f}s")
+    db_config.configure_pool(db_path)
+    # The upload scenario writes its blobs next to the generated ones, not into the repository
+    app.config['UPLOAD_FOLDER'] = os.path.join(work_dir, 'uploads')
+
+    results = {}
+    print(f"{'scenario':<22} {'requests':>8} {'errors':>6} {'p50 (ms)':>9} {'p95 (ms)':>9} "
+          f"{'p99 (ms)':>9} {'req/s':>8}")
+    try:
+        for index, (name, user, count, status, make_request) in enumerate(build_scenarios(ids)):
+            if only and name not in only:
+                continue
+            latencies, errors, elapsed = run_scenario(
+                app, ids, user, count or requests, status, make_request, concurrency, seed + index)
+            latencies.sort()
+            result = {
+                'requests': len(latencies),
+                'errors': errors,
+                'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+                'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+                'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+                'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            }
+            results[name] = result
+            print(f"{name:<22} {result['requests']:>8} {errors:>6} {result['p50_ms']:>9.2f} "
+                  f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['rps']:>8.1f}")
+    finally:
+        remove_benchmark_uploads(app, db_path)
+    return results
+
+
+STARTUP_SCRIPT = (
+    "import json, time; started = time.perf_counter(); import app; imported = time.perf_counter(); "
+    "app.create_app(); print(json.dumps([imported - started, time.perf_counter() - imported]))"
+)
+
+
+def benchmark_startup(runs=STARTUP_RUNS):
+    """Time what every worker without --preload pays before serving, in fresh interpreters."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    totals, imports, creates = [], [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], cwd=here, check=True,
+                                capture_output=True, text=True).stdout
+        totals.append(time.perf_counter() - start)
+        import_seconds, create_seconds = json.loads(output.strip().splitlines()[-1])
+        imports.append(import_seconds)
+        creates.append(create_seconds)
+
+    print(f"{'phase':<22} {'median (ms)':>12} {'min (ms)':>10}")
+    interpreter = [total - i - c for total, i, c in zip(totals, imports, creates)]
+    for name, values in (('interpreter', interpreter), ('import app', imports),
+                         ('create_app()', creates), ('total', totals)):
+        print(f"{name:<22} {statistics.median(values) * 1000:>12.1f} {min(values) * 1000:>10.1f}")
+
+    # -X importtime reports each module's cumulative import time on stderr
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT], cwd=here, check=True,
+                            capture_output=True, text=True).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        # Top-level imports and what they import directly; deeper ones are included in those
+        if len(name) - len(name.lstrip()) <= 3:
+            modules.append((int(cumulative), name.strip()))
+    print(f"\nSlowest imports:")
+    for cumulative, name in sorted(modules, reverse=True)[:SLOWEST_IMPORTS]:
+        print(f"  {name:<30} {cumulative / 1000:>8.1f} ms")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def http_request(port, method, path, cookie=None, body=None):
+    """One request on a fresh connection; returns (status, session cookie or None)."""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=SERVE_REQUEST_TIMEOUT)
+    try:
+        headers = {'Cookie': cookie} if cookie else {}
+        if body is not None:
+            body = urllib.parse.urlencode(body)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        conn.request(method, path, body, headers)
+        response = conn.getresponse()
+        response.read()
+        session = response.getheader('Set-Cookie')
+        return response.status, session.split(';', 1)[0] if session else None
+    finally:
+        conn.close()
+
+
+def start_server(worker_class, workers, port, db_path):
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(workers), GUNICORN_WORKER_CLASS=worker_class,
+               DATABASE_PATH=db_path, LOGIN_THROTTLE='False', SECRET_KEY='benchmark', LOG_LEVEL='WARNING')
+    here = os.path.dirname(os.path.abspath(__file__))
+    server = subprocess.Popen(['gunicorn', '-c', 'gunicorn.conf.py', '--access-logfile', os.devnull, 'app:app'],
+                              cwd=here, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + SERVE_BOOT_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"gunicorn ({worker_class}) exited with {server.returncode}")
+        try:
+            if http_request(port, 'GET', '/health')[0] == 200:
+                return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError(f"gunicorn ({worker_class}) did not answer within {SERVE_BOOT_TIMEOUT:.0f}s")
+
+
+def run_load(port, ids, clients, duration, login_share, seed):
+    """Drive the server from `clients` threads for `duration` seconds; returns latencies by kind and errors."""
+    latencies = {'page': [], 'login': []}
+    errors = [0]
+    lock = threading.Lock()
+
+    def pages(rng):
+        return rng.choice((
+            f"/subject/{rng.choice(ids['subjects'])}",
+            f"/api/v1/semesters/{rng.choice(ids['semesters'])}/subjects?fields=name,code,unit_count",
+            '/get_subjects/{}/{}'.format(*rng.choice(ids['pairs'])),
+            '/dashboard',
+        ))
+
+    def client(n):
+        rng = random.Random(seed * 1000 + n)
+        email = ids['students'][n % len(ids['students'])]
+        credentials = {'email': email, 'password': BENCHMARK_PASSWORD}
+        status, cookie = http_request(port, 'POST', '/login', body=credentials)
+        local = {'page': [], 'login': []}
+        local_errors = 0 if status == 302 else 1
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            kind = 'login' if rng.random() < login_share else 'page'
+            start = time.perf_counter()
+            try:
+                if kind == 'login':
+                    status, _ = http_request(port, 'POST', '/login', body=credentials)
+                    ok = status == 302
+                else:
+                    status, _ = http_request(port, 'GET', pages(rng), cookie)
+                    ok = status == 200
+            except OSError:
+                ok = False
+            local[kind].append(time.perf_counter() - start)
+            local_errors += not ok
+        with lock:
+            for kind, values in local.items():
+                latencies[kind].extend(values)
+            errors[0] += local_errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, range(clients)))
+    return latencies, errors[0], time.perf_counter() - start
+
+
+def benchmark_serving(worker_classes=SERVE_WORKER_CLASSES, workers=SERVE_WORKERS, clients=SERVE_CLIENTS,
+                      duration=SERVE_DURATION, login_share=SERVE_LOGIN_SHARE, seed=42):
+    """
+    Concurrent-request capacity of each gunicorn worker class on the same
+    catalogue and machine. The first class is the baseline the others are
+    compared with.
+    """
+    work_dir = tempfile.mkdtemp()
+    db_path = os.path.join(work_dir, 'benchmark.db')
+    shape = dict(SCALES['small'], users=max(clients, SCALES['small']['users']))
+    ids = generate_catalogue(db_path, os.path.join(work_dir, 'uploads'), seed=seed, **shape)
+    ids['students'] = [f"student{n}@bench.example" for n in range(shape['users'])]
+    print(f"{workers} worker(s), {clients} clients for {duration:.0f}s, {login_share:.0%} logins")
+    print(f"{'worker class':<14} {'requests':>8} {'errors':>6} {'req/s':>8} {'page p50':>9} {'page p95':>9} "
+          f"{'login p95':>10} {'vs base':>8}")
+
+    results = {}
+    baseline = None
+    for worker_class in worker_classes:
+        port = free_port()
+        server = start_server(worker_class, workers, port, db_path)
+        try:
+            latencies, errors, elapsed = run_load(port, ids, clients, duration, login_share, seed)
+        finally:
+            server.terminate()
+            server.wait()
+        pages = sorted(latencies['page'])
+        logins = sorted(latencies['login'])
+        total = len(pages) + len(logins)
+        result = {
+            'requests': total,
+            'errors': errors,
+            'rps': round(total / elapsed, 1) if elapsed else 0.0,
+            'page_p50_ms': round(percentile(pages, 0.50) * 1000, 3),
+            'page_p95_ms': round(percentile(pages, 0.95) * 1000, 3),
+            'login_p95_ms': round(percentile(logins, 0.95) * 1000, 3),
+        }
+        results[worker_class] = result
+        baseline = baseline or result
+        ratio = result['rps'] / baseline['rps'] if baseline['rps'] else 0.0
+        print(f"{worker_class:<14} {total:>8} {errors:>6} {result['rps']:>8.1f} {result['page_p50_ms']:>9.2f} "
+              f"{result['page_p95_ms']:>9.2f} {result['login_p95_ms']:>10.2f} {ratio:>7.2f}x")
+    return results
+
+
+def save_baseline(path, shape, concurrency, results):
+    with open(path, 'w') as f:
+        json.dump({
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'shape': shape,
+            'concurrency': concurrency,
+            'results': results,
+        }, f, indent=2, sort_keys=True)
+    print(f"💾 Baseline saved to {path}")
+
+
+def compare_baseline(path, shape, concurrency, results, tolerance=REGRESSION_TOLERANCE):
+    """Print p95 changes against a saved baseline; returns the regressed scenarios."""
+    with open(path) as f:
+        baseline = json.load(f)
+    if baseline.get('shape') != shape or baseline.get('concurrency') != concurrency:
+        print(f"⚠️  Baseline was recorded with {baseline.get('shape')} at concurrency "
+              f"{baseline.get('concurrency')}; the comparison is not like for like")
+
+    regressions = []
+    print(f"{'scenario':<22} {'base p95':>9} {'p95':>9} {'change':>8}")
+    for name, result in results.items():
+        before = baseline.get('results', {}).get(name)
+        if not before:
+            print(f"{name:<22} {'-':>9} {result['p95_ms']:>9.2f} {'new':>8}")
+            continue
+        change = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0.0
+        regressed = (change > tolerance and result['p95_ms'] - before['p95_ms'] > REGRESSION_FLOOR_MS
+                     or result['errors'] > before.get('errors', 0))
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<22} {before['p95_ms']:>9.2f} {result['p95_ms']:>9.2f} {change:>+7.0%}"
+              f"{'  ❌' if regressed else ''}")
+    return regressions
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the Syllabus Management System.")
+    commands = parser.add_subparsers(dest='command')
+    for name in ('dashboard', 'search'):
+        command = commands.add_parser(name)
+        command.add_argument('sizes', nargs='*', type=int)
+
+    command = commands.add_parser('requests', help="end-to-end request latency and throughput")
+    command.add_argument('--scale', choices=sorted(SCALES), default='small')
+    for field in SCALES['small']:
+        command.add_argument(f'--{field}', type=int, help=f"override the scale's {field}")
+    command.add_argument('--requests', type=int, default=REQUESTS_PER_SCENARIO,
+                         help="requests per scenario")
+    command.add_argument('--concurrency', type=int, default=1, help="concurrent test clients")
+    command.add_argument('--only', nargs='+', metavar='SCENARIO', help="run only these scenarios")
+    command.add_argument('--seed', type=int, default=42)
+    command.add_argument('--save', metavar='FILE', help="save the results as a baseline")
+    command.add_argument('--compare', metavar='FILE', help="compare against a saved baseline")
+    command.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE,
+                         help="allowed p95 growth before a scenario counts as a regression")
+
+    command = commands.add_parser('startup', help="cold start time of a worker")
+    command.add_argument('--runs', type=int, default=STARTUP_RUNS)
+
+    command = commands.add_parser('serve', help="load test gunicorn worker classes over HTTP")
+    command.add_argument('--worker-class', nargs='+', choices=SERVE_WORKER_CLASSES, default=SERVE_WORKER_CLASSES,
+                         help="worker classes to compare; the first is the baseline")
+    command.add_argument('--workers', type=int, default=SERVE_WORKERS)
+    command.add_argument('--clients', type=int, default=SERVE_CLIENTS, help="concurrent HTTP clients")
+    command.add_argument('--duration', type=float, default=SERVE_DURATION, help="seconds per worker class")
+    command.add_argument('--login-share', type=float, default=SERVE_LOGIN_SHARE,
+                         help="fraction of requests that are logins")
+    command.add_argument('--seed', type=int, default=42)
+    command.add_argument('--save', metavar='FILE', help="save the results as JSON")
+
+    # The original "benchmark.py [size ...]" form runs the dashboard benchmark
+    if not argv or argv[0] not in commands.choices and argv[0] not in ('-h', '--help'):
+        argv = ['dashboard'] + list(argv)
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+
+    if args.command == 'search':
+        print("⏱️  Benchmarking full-text search...")
+        print("=" * 50)
+        benchmark_search(*args.sizes[:1])
+    elif args.command == 'requests':
+        shape = dict(SCALES[args.scale])
+        shape.update({field: getattr(args, field) for field in shape if getattr(args, field) is not None})
+        print("⏱️  Benchmarking requests...")
+        print("=" * 50)
+        results = benchmark_requests(shape, args.requests, max(1, args.concurrency), args.only, args.seed)
+        print("=" * 50)
+        if args.save:
+            save_baseline(args.save, shape, args.concurrency, results)
+        if args.compare:
+            regressions = compare_baseline(args.compare, shape, args.concurrency, results, args.tolerance)
+            if regressions:
+                print(f"❌ Regressed: {', '.join(regressions)}")
+                sys.exit(1)
+            print("✅ No regressions")
+        return
+    elif args.command == 'serve':
+        print("⏱️  Load testing gunicorn worker classes...")
+        print("=" * 50)
+        results = benchmark_serving(args.worker_class, max(1, args.workers), max(1, args.clients),
+                                    args.duration, args.login_share, args.seed)
+        if args.save:
+            save_baseline(args.save, {'workers': args.workers, 'login_share': args.login_share},
+                          args.clients, results)
+    elif args.command == 'startup':
+        print("⏱️  Benchmarking startup...")
+        print("=" * 50)
+        benchmark_startup(max(1, args.runs))
+    else:
+        print("⏱️  Benchmarking admin dashboard data loading...")
+        print("=" * 50)
+        benchmark_dashboard(args.sizes or DEFAULT_SIZES)
+    print("=" * 50)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+"""
+In-process cache for catalogue reads (programs, specializations, semesters,
+subjects, units).
+
+Cached entries are tagged with the catalogue version stored in the database.
+Every admin write bumps that version in the same transaction, so each worker
+process notices the change on its next request and rebuilds its cache without
+needing a shared cache service.
+
+The response cache applies the same versioning to whole JSON responses of the
+public catalogue endpoints: bodies are serialized, hashed and gzipped once
+per catalogue version, and repeat requests are answered from memory.
+"""
+
+import gzip
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, g, has_app_context, request
+from db_config import get_db_connection, get_pool
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 2048))
+# Bodies smaller than this are sent uncompressed
+RESPONSE_GZIP_MIN_SIZE = 512
+RESPONSE_GZIP_LEVEL = 6
+
+
+def read_catalogue_version():
+    """
+    Read the current catalogue version (None if it cannot be read).
+    The catalogue_version table comes from migration 0012; a read never creates it.
+    """
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT version FROM catalogue_version WHERE id = 1")
+        row = cursor.fetchone()
+        cursor.close()
+        conn.close()
+        return row[0] if row else None
+    except Exception as e:
+        logger.error(f"Error reading catalogue version: {e}")
+        return None
+
+
+def bump_catalogue_version(cursor):
+    """
+    Bump the catalogue version as part of the caller's transaction.
+    Call this next to every catalogue write, before commit.
+    """
+    cursor.execute("UPDATE catalogue_version SET version = version + 1 WHERE id = 1")
+    catalogue_cache.invalidate()
+    response_cache.invalidate()
+
+
+class CatalogueCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+        self.errors = 0
+
+    def current_version(self):
+        """
+        (database path, catalogue version), or None if the version cannot be
+        read. The path keeps entries filled from one database from being served
+        for another with the same version number.
+        """
+        # The version is read at most once per request
+        if has_app_context():
+            if '_catalogue_version' not in g:
+                g._catalogue_version = self._read_version()
+            return g._catalogue_version
+        return self._read_version()
+
+    @staticmethod
+    def _read_version():
+        version = read_catalogue_version()
+        return None if version is None else (get_pool().db_path, version)
+
+    def get(self, key, loader):
+        version = self.current_version()
+        if version is None:
+            return loader()
+
+        with self._lock:
+            if version != self._version:
+                if self._version is not None:
+                    self.rebuilds += 1
+                self._entries.clear()
+                self._version = version
+            if key in self._entries:
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = loader()
+        with self._lock:
+            if self._version == version:
+                self._entries[key] = value
+        return value
+
+    def record_error(self):
+        """Count a failed catalogue read and mark the request, so nothing built from it is cached."""
+        with self._lock:
+            self.errors += 1
+        if has_app_context():
+            g._catalogue_read_failed = True
+
+    def invalidate(self):
+        """Drop local entries and force the next read to re-check the version."""
+        with self._lock:
+            self._entries.clear()
+        if has_app_context():
+            g.pop('_catalogue_version', None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'version': self._version[1] if self._version else None,
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'rebuilds': self.rebuilds,
+                'errors': self.errors,
+            }
+
+
+catalogue_cache = CatalogueCache()
+
+
+def catalogue_read_failed():
+    """Whether a catalogue read failed in this request; its responses and fragments must not be cached."""
+    return has_app_context() and g.get('_catalogue_read_failed', False)
+
+
+def cached_catalogue(func):
+    """
+    Cache a catalogue getter by its arguments.
+    Callers get fresh row dicts so they can annotate them without touching
+    the cached copy. The getter raises on database errors; those are logged
+    and answered with an empty list that is never cached, so a transient
+    error does not leave the worker with an empty catalogue.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        key = (func.__name__, args, tuple(sorted(kwargs.items())))
+        try:
+            rows = catalogue_cache.get(key, lambda: func(*args, **kwargs))
+        except Exception as e:
+            logger.error(f"Error in {func.__name__}: {e}")
+            catalogue_cache.record_error()
+            return []
+        return [dict(row) for row in rows]
+    wrapper.uncached = func
+    return wrapper
+
+
+def get_catalogue_cache_stats():
+    return catalogue_cache.stats()
+
+
+class CachedResponse:
+    """A serialized JSON body with its ETag and (when worth it) gzipped copy."""
+
+    __slots__ = ('body', 'gzipped', 'etag')
+
+    def __init__(self, body):
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.gzipped = gzip.compress(body, RESPONSE_GZIP_LEVEL) if len(body) >= RESPONSE_GZIP_MIN_SIZE else None
+
+
+class ResponseCache:
+    """Bounded LRU of CachedResponse entries for one catalogue version."""
+
+    def __init__(self, maxsize=RESPONSE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._version = None
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def get(self, key, version):
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry
+
+    def put(self, key, version, entry):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            # A write may have bumped the version while the body was built
+            if version != self._version:
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'version': self._version[1] if self._version else None,
+                'entries': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+                'evictions': self.evictions,
+            }
+
+
+response_cache = ResponseCache()
+
+
+def cached_json_response(view):
+    """
+    Serve a view that returns a JSON-serializable value from the response cache.
+    Entries are keyed by request path and query string and dropped whenever
+    the catalogue version changes. Clients revalidate with If-None-Match and
+    get a 304; gzip-capable clients get the precompressed body.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        version = catalogue_cache.current_version()
+        if version is None:
+            return view(*args, **kwargs)
+
+        key = request.full_path
+        entry = response_cache.get(key, version)
+        if entry is None:
+            body = current_app.json.dumps(view(*args, **kwargs)).encode()
+            entry = CachedResponse(body)
+            if not catalogue_read_failed():
+                response_cache.put(key, version, entry)
+
+        if request.if_none_match.contains(entry.etag):
+            response_cache.record_not_modified()
+            response = current_app.response_class(status=304)
+        elif entry.gzipped is not None and 'gzip' in request.accept_encodings:
+            response = current_app.response_class(entry.gzipped, mimetype='application/json')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = current_app.response_class(entry.body, mimetype='application/json')
+        response.set_etag(entry.etag)
+        response.headers['Cache-Control'] = 'public, no-cache'
+        if entry.gzipped is not None:
+            response.vary.add('Accept-Encoding')
+        return response
+    return wrapper
+
+
+def get_response_cache_stats():
+    return response_cache.stats()
@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+Bulk catalogue import and export for Syllabus Management System.
+
+Records are flat, one per program, specialization, semester, subject or
+unit, tagged with a `type` and linked to their parents by code rather than
+by id, so an export of one database can be imported into another:
+
+    type            key                              other fields
+    program         code                             name, description, duration_years
+    specialization  program_code, code               name, description
+    semester        program_code, semester_number    name
+    subject         code                             name, credits, description, program_code,
+                                                     specialization_code, semester_number
+    unit            subject_code, unit_number        title, description, topics, hours_allocated
+
+Files are CSV (one header with every column) or JSON Lines; a JSON array is
+also accepted on import. An import is validated completely, then written in
+a single transaction: existing rows (matched on their key) are updated and
+reactivated, new rows are inserted, each level with one executemany.
+
+Usage:
+    python catalogue_io.py import <file> [--dry-run]
+    python catalogue_io.py export [csv|jsonl] [output_file]
+"""
+
+import csv
+import io
+import json
+import os
+import sys
+from contextlib import nullcontext
+from db_config import get_db_connection
+from catalogue_cache import bump_catalogue_version
+from models import search_triggers_suspended, rebuild_search_index
+
+RECORD_TYPES = ('program', 'specialization', 'semester', 'subject', 'unit')
+REQUIRED_FIELDS = {
+    'program': ('code', 'name'),
+    'specialization': ('program_code', 'code', 'name'),
+    'semester': ('program_code', 'semester_number', 'name'),
+    'subject': ('code', 'name'),
+    'unit': ('subject_code', 'unit_number', 'title'),
+}
+INTEGER_FIELDS = ('duration_years', 'semester_number', 'credits', 'unit_number', 'hours_allocated')
+CSV_COLUMNS = (
+    'type', 'program_code', 'specialization_code', 'subject_code', 'code',
+    'semester_number', 'unit_number', 'name', 'title', 'credits', 'duration_years',
+    'hours_allocated', 'description', 'topics',
+)
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.json': 'json'}
+
+CATALOGUE_IMPORT_MAX_SIZE = int(os.environ.get('CATALOGUE_IMPORT_MAX_SIZE', 100 * 1024 * 1024))
+IMPORT_MAX_ERRORS = 20
+# Bigger imports skip the per-row search triggers and rebuild the index once
+SEARCH_REBUILD_THRESHOLD = 1000
+EXPORT_CHUNK_ROWS = 1000
+
+
+class CatalogueImportError(Exception):
+    """Raised when an import file has invalid or unresolvable records."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f"{len(errors)} invalid record(s): " + '; '.join(errors[:3]))
+
+
+def detect_format(filename):
+    return FORMATS.get(os.path.splitext(filename or '')[1].lower())
+
+
+def read_records(stream, fmt):
+    """Yield (line_number, raw record) from a binary stream."""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        for line_number, row in enumerate(csv.DictReader(text), start=2):
+            yield line_number, row
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(text, start=1):
+            if line.strip():
+                yield line_number, json.loads(line)
+    elif fmt == 'json':
+        for index, record in enumerate(json.load(text), start=1):
+            yield index, record
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def parse_record(raw):
+    """
+    Validate one raw record.
+    Returns:
+        tuple: (record type, cleaned dict)
+    """
+    if not isinstance(raw, dict):
+        raise ValueError("record must be an object")
+    record_type = str(raw.get('type') or '').strip().lower()
+    if record_type not in RECORD_TYPES:
+        raise ValueError(f"unknown type {raw.get('type')!r}")
+
+    record = {}
+    for field, value in raw.items():
+        if field == 'type' or field is None:
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+        record[field] = None if value in ('', None) else value
+    for field in INTEGER_FIELDS:
+        if record.get(field) is not None:
+            try:
+                record[field] = int(record[field])
+            except (TypeError, ValueError):
+                raise ValueError(f"{field} must be an integer")
+    missing = [field for field in REQUIRED_FIELDS[record_type] if record.get(field) is None]
+    if missing:
+        raise ValueError(f"{record_type} is missing {', '.join(missing)}")
+    if record_type == 'subject' and record.get('program_code') is None and \
+            (record.get('specialization_code') is not None or record.get('semester_number') is not None):
+        raise ValueError("subject needs program_code to resolve its specialization or semester")
+    return record_type, record
+
+
+def record_key(record_type, record):
+    if record_type == 'specialization':
+        return (record['program_code'], record['code'])
+    if record_type == 'semester':
+        return (record['program_code'], record['semester_number'])
+    if record_type == 'unit':
+        return (record['subject_code'], record['unit_number'])
+    return record['code']
+
+
+def _upsert(cursor, records, existing, insert_sql, update_sql, insert_params, update_params):
+    """executemany inserts and updates split on the existing key -> id map."""
+    inserts = []
+    updates = []
+    for key, record in records.items():
+        if key in existing:
+            updates.append(update_params(record) + (existing[key],))
+        else:
+            inserts.append(insert_params(record))
+    if inserts:
+        cursor.executemany(insert_sql, inserts)
+    if updates:
+        cursor.executemany(update_sql, updates)
+    return {'inserted': len(inserts), 'updated': len(updates)}
+
+
+def _resolve(records, errors, field_ids):
+    """Fill in parent ids; field_ids maps id column -> (key function, key -> id map, label)."""
+    for key, record in records.items():
+        for id_field, (key_of, ids, label) in field_ids.items():
+            parent_key = key_of(record)
+            if parent_key is None:
+                record[id_field] = None
+            elif parent_key in ids:
+                record[id_field] = ids[parent_key]
+            else:
+                errors.append(f"{key}: unknown {label} {parent_key}")
+
+
+def write_catalogue(cursor, batches):
+    """
+    Upsert validated records level by level in the caller's transaction.
+    Returns:
+        dict: {'programs': {'inserted': n, 'updated': n}, ...}
+    """
+    report = {}
+    errors = []
+
+    report['programs'] = _upsert(
+        cursor, batches['program'],
+        {code: id for code, id in cursor.execute("SELECT code, id FROM programs")},
+        "INSERT INTO programs (code, name, description, duration_years) VALUES (?, ?, ?, COALESCE(?, 4))",
+        """UPDATE programs SET name = ?, description = COALESCE(?, description),
+               duration_years = COALESCE(?, duration_years), is_active = 1 WHERE id = ?""",
+        lambda r: (r['code'], r['name'], r.get('description'), r.get('duration_years')),
+        lambda r: (r['name'], r.get('description'), r.get('duration_years')),
+    )
+    program_ids = {code: id for code, id in cursor.execute("SELECT code, id FROM programs")}
+
+    _resolve(batches['specialization'], errors,
+             {'program_id': (lambda r: r['program_code'], program_ids, 'program')})
+    _resolve(batches['semester'], errors,
+             {'program_id': (lambda r: r['program_code'], program_ids, 'program')})
+    if errors:
+        raise CatalogueImportError(errors)
+
+    report['specializations'] = _upsert(
+        cursor, batches['specialization'],
+        {(p, c): id for p, c, id in cursor.execute(
+            "SELECT p.code, s.code, s.id FROM specializations s JOIN programs p ON p.id = s.program_id")},
+        "INSERT INTO specializations (program_id, code, name, description) VALUES (?, ?, ?, ?)",
+        "UPDATE specializations SET name = ?, description = COALESCE(?, description), is_active = 1 WHERE id = ?",
+        lambda r: (r['program_id'], r['code'], r['name'], r.get('description')),
+        lambda r: (r['name'], r.get('description')),
+    )
+    report['semesters'] = _upsert(
+        cursor, batches['semester'],
+        {(p, n): id for p, n, id in cursor.execute(
+            "SELECT p.code, s.semester_number, s.id FROM semesters s JOIN programs p ON p.id = s.program_id")},
+        "INSERT INTO semesters (program_id, semester_number, name) VALUES (?, ?, ?)",
+        "UPDATE semesters SET name = ?, is_active = 1 WHERE id = ?",
+        lambda r: (r['program_id'], r['semester_number'], r['name']),
+        lambda r: (r['name'],),
+    )
+
+    specialization_ids = {(p, c): id for p, c, id in cursor.execute(
+        "SELECT p.code, s.code, s.id FROM specializations s JOIN programs p ON p.id = s.program_id")}
+    semester_ids = {(p, n): id for p, n, id in cursor.execute(
+        "SELECT p.code, s.semester_number, s.id FROM semesters s JOIN programs p ON p.id = s.program_id")}
+    _resolve(batches['subject'], errors, {
+        'specialization_id': (
+            lambda r: (r['program_code'], r['specialization_code']) if r.get('specialization_code') is not None else None,
+            specialization_ids, 'specialization'),
+        'semester_id': (
+            lambda r: (r['program_code'], r['semester_number']) if r.get('semester_number') is not None else None,
+            semester_ids, 'semester'),
+    })
+    if errors:
+        raise CatalogueImportError(errors)
+
+    report['subjects'] = _upsert(
+        cursor, batches['subject'],
+        {code: id for code, id in cursor.execute("SELECT code, id FROM subjects")},
+        """INSERT INTO subjects (code, name, credits, description, specialization_id, semester_id)
+           VALUES (?, ?, COALESCE(?, 3), ?, ?, ?)""",
+        """UPDATE subjects SET name = ?, credits = COALESCE(?, credits), description = COALESCE(?, description),
+               specialization_id = COALESCE(?, specialization_id), semester_id = COALESCE(?, semester_id),
+               is_active = 1 WHERE id = ?""",
+        lambda r: (r['code'], r['name'], r.get('credits'), r.get('description'),
+                   r['specialization_id'], r['semester_id']),
+        lambda r: (r['name'], r.get('credits'), r.get('description'),
+                   r['specialization_id'], r['semester_id']),
+    )
+
+    subject_ids = {code: id for code, id in cursor.execute("SELECT code, id FROM subjects")}
+    _resolve(batches['unit'], errors,
+             {'subject_id': (lambda r: r['subject_code'], subject_ids, 'subject')})
+    if errors:
+        raise CatalogueImportError(errors)
+
+    report['units'] = _upsert(
+        cursor, batches['unit'],
+        {(c, n): id for c, n, id in cursor.execute(
+            "SELECT s.code, u.unit_number, u.id FROM units u JOIN subjects s ON s.id = u.subject_id")},
+        """INSERT INTO units (subject_id, unit_number, title, description, topics, hours_allocated)
+           VALUES (?, ?, ?, ?, ?, COALESCE(?, 10))""",
+        """UPDATE units SET title = ?, description = COALESCE(?, description), topics = COALESCE(?, topics),
+               hours_allocated = COALESCE(?, hours_allocated), is_active = 1 WHERE id = ?""",
+        lambda r: (r['subject_id'], r['unit_number'], r['title'], r.get('description'),
+                   r.get('topics'), r.get('hours_allocated')),
+        lambda r: (r['title'], r.get('description'), r.get('topics'), r.get('hours_allocated')),
+    )
+    return report
+
+
+def import_catalogue(stream, fmt, dry_run=False):
+    """
+    Validate and import a catalogue file in one transaction.
+    Raises:
+        CatalogueImportError: nothing is written if any record is invalid
+    Returns:
+        dict: per-level inserted/updated counts, plus records and dry_run
+    """
+    batches = {record_type: {} for record_type in RECORD_TYPES}
+    errors = []
+    records = 0
+    try:
+        for line_number, raw in read_records(stream, fmt):
+            try:
+                record_type, record = parse_record(raw)
+            except ValueError as e:
+                errors.append(f"line {line_number}: {e}")
+                if len(errors) >= IMPORT_MAX_ERRORS:
+                    break
+                continue
+            # A key repeated in the file keeps its last record
+            batches[record_type][record_key(record_type, record)] = record
+            records += 1
+    except (ValueError, csv.Error, UnicodeDecodeError) as e:
+        errors.append(f"unreadable {fmt} file: {e}")
+    if errors:
+        raise CatalogueImportError(errors)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        bulk = len(batches['subject']) + len(batches['unit']) > SEARCH_REBUILD_THRESHOLD
+        with search_triggers_suspended(cursor) if bulk else nullcontext():
+            report = write_catalogue(cursor, batches)
+            if bulk and not dry_run:
+                rebuild_search_index(cursor)
+        if dry_run:
+            conn.rollback()
+        else:
+            bump_catalogue_version(cursor)
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    report['records'] = records
+    report['dry_run'] = dry_run
+    return report
+
+
+EXPORT_QUERIES = (
+    ('program', """
+        SELECT code, name, description, duration_years
+        FROM programs WHERE is_active = 1 ORDER BY code
+    """),
+    ('specialization', """
+        SELECT p.code AS program_code, s.code, s.name, s.description
+        FROM specializations s JOIN programs p ON p.id = s.program_id
+        WHERE s.is_active = 1 ORDER BY p.code, s.code
+    """),
+    ('semester', """
+        SELECT p.code AS program_code, s.semester_number, s.name
+        FROM semesters s JOIN programs p ON p.id = s.program_id
+        WHERE s.is_active = 1 ORDER BY p.code, s.semester_number
+    """),
+    ('subject', """
+        SELECT s.code, s.name, s.credits, s.description,
+               COALESCE(sp_program.code, sem_program.code) AS program_code,
+               sp.code AS specialization_code, sem.semester_number
+        FROM subjects s
+        LEFT JOIN specializations sp ON sp.id = s.specialization_id
+        LEFT JOIN programs sp_program ON sp_program.id = sp.program_id
+        LEFT JOIN semesters sem ON sem.id = s.semester_id
+        LEFT JOIN programs sem_program ON sem_program.id = sem.program_id
+        WHERE s.is_active = 1 ORDER BY s.code
+    """),
+    ('unit', """
+        SELECT s.code AS subject_code, u.unit_number, u.title, u.description, u.topics, u.hours_allocated
+        FROM units u JOIN subjects s ON s.id = u.subject_id
+        WHERE u.is_active = 1 AND s.is_active = 1 ORDER BY s.code, u.unit_number
+    """),
+)
+
+
+def export_catalogue(fmt='csv'):
+    """Yield the active catalogue as CSV or JSON Lines text, a chunk of rows at a time."""
+    if fmt not in ('csv', 'jsonl'):
+        raise ValueError(f"Unsupported export format: {fmt}")
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, lineterminator='\n') if fmt == 'csv' else None
+    if writer:
+        writer.writeheader()
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        for record_type, sql in EXPORT_QUERIES:
+            cursor.execute(sql)
+            columns = [column[0] for column in cursor.description]
+            while True:
+                rows = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+                if not rows:
+                    break
+                for row in rows:
+                    record = {'type': record_type, **dict(zip(columns, row))}
+                    if writer:
+                        writer.writerow(record)
+                    else:
+                        buffer.write(json.dumps(record) + '\n')
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+    finally:
+        cursor.close()
+        conn.close()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def main():
+    args = sys.argv[1:]
+    command = args.pop(0) if args else None
+    dry_run = '--dry-run' in args
+    args = [arg for arg in args if arg != '--dry-run']
+
+    if command == 'import' and args:
+        fmt = detect_format(args[0])
+        if fmt is None:
+            print(f"❌ Unknown file type for {args[0]} (use .csv, .jsonl or .json)")
+            sys.exit(1)
+        print(f"📥 Importing {args[0]}{' (dry run)' if dry_run else ''}...")
+        try:
+            with open(args[0], 'rb') as f:
+                report = import_catalogue(f, fmt, dry_run)
+        except CatalogueImportError as e:
+            for error in e.errors:
+                print(f"   - {error}")
+            print(f"❌ Import failed, nothing was written")
+            sys.exit(1)
+        for level in ('programs', 'specializations', 'semesters', 'subjects', 'units'):
+            print(f"   - {level}: {report[level]['inserted']} inserted, {report[level]['updated']} updated")
+        print(f"✅ {report['records']} record(s) {'checked' if dry_run else 'imported'}")
+    elif command == 'export':
+        fmt = args[0] if args else 'csv'
+        output = open(args[1], 'w', newline='') if len(args) > 1 else sys.stdout
+        try:
+            for chunk in export_catalogue(fmt):
+                output.write(chunk)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+    else:
+        print('\n'.join(line.strip() for line in __doc__.strip().splitlines()[-2:]))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
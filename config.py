@@ -0,0 +1,51 @@
+"""
+Application configuration for Syllabus Management System.
+
+create_app() takes one of these classes, or picks it by APP_CONFIG
+(development, production or testing; FLASK_ENV when unset). Settings that
+belong to one module - the pool, password hashing, throttling, caches - keep
+their own environment variables and defaults there and are only overridden
+here when an environment needs something different.
+"""
+
+import os
+
+DEFAULT_SECRET_KEY = 'your-secret-key-change-this-in-production'
+
+
+class Config:
+    SECRET_KEY = os.environ.get('SECRET_KEY', DEFAULT_SECRET_KEY)
+    UPLOAD_FOLDER = 'uploads'
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    # Number of reverse proxies in front of the app whose X-Forwarded-For is trusted
+    TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 0))
+    # Rebuild the user from signed session claims instead of querying the database
+    USER_SESSION_CLAIMS = os.environ.get('USER_SESSION_CLAIMS', 'False').lower() == 'true'
+
+
+class DevelopmentConfig(Config):
+    pass
+
+
+class ProductionConfig(Config):
+    TEMPLATES_AUTO_RELOAD = False
+
+
+class TestingConfig(Config):
+    TESTING = True
+
+
+CONFIGS = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+}
+
+
+def get_config(name=None):
+    """The config class for `name`, APP_CONFIG or FLASK_ENV."""
+    name = name or os.environ.get('APP_CONFIG') or os.environ.get('FLASK_ENV') or 'development'
+    try:
+        return CONFIGS[name]
+    except KeyError:
+        raise ValueError(f"Unknown config {name!r}, expected one of {', '.join(CONFIGS)}")
@@ -1,11 +1,428 @@
 import sqlite3
 import os
+import threading
+import time
+from flask import g, has_app_context
+import serving
+
+# Database location and pool settings (overridable from the environment)
+DB_DIR = os.environ.get('DATABASE_DIR', 'database')
+DB_PATH = os.environ.get('DATABASE_PATH', os.path.join(DB_DIR, 'syllabus_app.db'))
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+# Milliseconds a statement waits for another connection's write lock
+BUSY_TIMEOUT = int(os.environ.get('DB_BUSY_TIMEOUT', 5000))
+# Backoff between lock retries under gevent, in seconds (see _retry_busy)
+BUSY_RETRY_MIN = 0.001
+BUSY_RETRY_MAX = 0.05
+
+# PRAGMAs applied once when a pooled connection is opened
+PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('cache_size', -16000),       # ~16MB page cache per connection
+    ('mmap_size', 134217728),     # 128MB memory-mapped I/O
+    ('busy_timeout', BUSY_TIMEOUT),
+    ('temp_store', 'MEMORY'),
+)
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes available in time."""
+
+
+# Optional hooks for request instrumentation, see set_observer()
+_observer = None
+
+
+def set_observer(observer):
+    """
+    Report pool checkouts and statement timings to observer, which provides
+    checkout(opened) and query(sql, seconds, executed). None turns reporting off.
+    """
+    global _observer
+    _observer = observer
+
+
+class TimedCursor:
+    """Cursor proxy that reports the time spent executing and fetching each statement."""
+
+    def __init__(self, cursor, observer):
+        self._cursor = cursor
+        self._observer = observer
+        self._sql = None
+
+    def _timed(self, method, *args, executed=False):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._observer.query(self._sql, time.perf_counter() - started, executed)
+
+    def execute(self, sql, parameters=()):
+        self._sql = sql
+        self._timed(self._cursor.execute, sql, parameters, executed=True)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._sql = sql
+        self._timed(self._cursor.executemany, sql, seq_of_parameters, executed=True)
+        return self
+
+    def executescript(self, script):
+        self._sql = script
+        self._timed(self._cursor.executescript, script, executed=True)
+        return self
+
+    def fetchone(self):
+        return self._timed(self._cursor.fetchone)
+
+    def fetchmany(self, size=None):
+        return self._timed(self._cursor.fetchmany, size or self._cursor.arraysize)
+
+    def fetchall(self):
+        return self._timed(self._cursor.fetchall)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self._timed(self._cursor.__next__)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def _retry_busy(method, *args):
+    """
+    Call method, retrying SQLITE_BUSY with sleeps that yield to other
+    greenlets, for up to BUSY_TIMEOUT in all. Used by gevent workers, whose
+    connections give up on a lock at once (see ConnectionPool._connect).
+    """
+    deadline = None
+    delay = BUSY_RETRY_MIN
+    while True:
+        try:
+            return method(*args)
+        except sqlite3.OperationalError as e:
+            # SQLITE_BUSY_SNAPSHOT and other lock errors cannot clear by waiting
+            if getattr(e, 'sqlite_errorcode', None) != sqlite3.SQLITE_BUSY:
+                raise
+            now = time.monotonic()
+            if deadline is None:
+                deadline = now + BUSY_TIMEOUT / 1000
+            if now >= deadline:
+                raise
+            time.sleep(min(delay, deadline - now))  # gevent.sleep once monkey-patched
+            delay = min(delay * 2, BUSY_RETRY_MAX)
+
+
+class BusyRetryCursor:
+    """
+    Cursor proxy for gevent workers. SQLite waits for a lock by sleeping
+    inside the C library, which would stall every greenlet of the worker, so
+    their connections give up at once (busy_timeout=0) and statements are
+    retried with _retry_busy() instead.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, parameters=()):
+        _retry_busy(self._cursor.execute, sql, parameters)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        _retry_busy(self._cursor.executemany, sql, seq_of_parameters)
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self._cursor.__next__()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class ConnectionPool:
+    """Bounded per-process pool of SQLite connections."""
+
+    def __init__(self, db_path=DB_PATH, size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.db_path = db_path
+        self.size = max(1, int(size))
+        self.timeout = timeout
+        self.pid = os.getpid()
+        # gunicorn.conf.py patches before the app is loaded, so this is settled by now
+        self.cooperative = serving.cooperative()
+        self._idle = []
+        self._open = 0
+        self._cond = threading.Condition()
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.created = 0
+
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        for pragma, value in PRAGMAS:
+            conn.execute(f"PRAGMA {pragma}={value}")
+        if self.cooperative:
+            # Lock waits happen in BusyRetryCursor instead, without blocking the hub
+            conn.execute("PRAGMA busy_timeout=0")
+        return conn
+
+    def acquire(self):
+        """Check out a raw connection, opening a new one if the pool has room."""
+        with self._cond:
+            self.checkouts += 1
+            if not self._idle and self._open >= self.size:
+                self.waits += 1
+                deadline = time.monotonic() + self.timeout
+                while not self._idle and self._open >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeout(f"No database connection available after {self.timeout}s")
+                    self._cond.wait(remaining)
+            if self._idle:
+                conn = self._idle.pop()
+                if _observer is not None:
+                    _observer.checkout(False)
+                return conn
+            self._open += 1
+
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.created += 1
+        if _observer is not None:
+            _observer.checkout(True)
+        return conn
+
+    def release(self, conn):
+        """Return a raw connection to the pool, discarding any open transaction."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+        except sqlite3.Error:
+            # Broken connection: drop it and free its slot
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            return
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def close_all(self):
+        """Close every idle connection (checked-out ones are closed on release)."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for conn in idle:
+            conn.close()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self.size,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._open - len(self._idle),
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'created': self.created,
+                'cooperative': self.cooperative,
+            }
+
+
+class PooledConnection:
+    """
+    Proxy around a pooled sqlite3 connection.
+    close() hands the connection back to the pool instead of closing it; for
+    request-scoped connections it is a no-op and the release happens on
+    app context teardown.
+    """
+
+    def __init__(self, pool, conn, request_scoped=False):
+        object.__setattr__(self, '_pool', pool)
+        object.__setattr__(self, '_conn', conn)
+        object.__setattr__(self, '_request_scoped', request_scoped)
+
+    def _raw(self):
+        conn = object.__getattribute__(self, '_conn')
+        if conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return conn
+
+    def __getattr__(self, name):
+        return getattr(self._raw(), name)
+
+    def cursor(self, *args):
+        cursor = self._raw().cursor(*args)
+        if self._pool.cooperative:
+            cursor = BusyRetryCursor(cursor)
+        observer = _observer
+        return TimedCursor(cursor, observer) if observer is not None else cursor
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def __setattr__(self, name, value):
+        setattr(self._raw(), name, value)
+
+    def __enter__(self):
+        return self
+
+    def commit(self):
+        if self._pool.cooperative:
+            # A commit can meet a lock too, and must not wait for it inside SQLite
+            return _retry_busy(self._raw().commit)
+        return self._raw().commit()
+
+    def __exit__(self, exc_type, exc, tb):
+        # Same semantics as sqlite3.Connection: commit on success, rollback on error
+        if exc_type is None and self._pool.cooperative:
+            self.commit()
+            return False
+        return self._raw().__exit__(exc_type, exc, tb)
+
+    def close(self):
+        if not self._request_scoped:
+            self.release()
+
+    def release(self):
+        conn = object.__getattribute__(self, '_conn')
+        if conn is not None:
+            object.__setattr__(self, '_conn', None)
+            self._pool.release(conn)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def configure_pool(db_path=None, size=None, timeout=None):
+    """(Re)create the process-wide pool, e.g. from app config or after fork."""
+    global _pool
+    with _pool_lock:
+        old = _pool
+        _pool = ConnectionPool(
+            db_path or (old.db_path if old else DB_PATH),
+            size or (old.size if old else POOL_SIZE),
+            timeout or (old.timeout if old else POOL_TIMEOUT),
+        )
+    if old is not None and old.pid == os.getpid():
+        old.close_all()
+    return _pool
+
+
+def get_pool():
+    pool = _pool
+    # Connections must never cross a fork, so each worker builds its own pool
+    if pool is None or pool.pid != os.getpid():
+        pool = configure_pool()
+    return pool
+
+
+# Pools inherited over a fork; see reinit_after_fork()
+_inherited_pools = []
+
+
+def close_idle_before_fork():
+    """Close idle connections so a forked child does not inherit open SQLite handles."""
+    pool = _pool
+    if pool is not None and pool.pid == os.getpid():
+        pool.close_all()
+
+
+def reinit_after_fork():
+    """
+    Replace the pool inherited from the parent process with an empty one of
+    the same settings. Connections that were checked out at the fork are kept
+    referenced and never closed here: closing a copied SQLite handle would
+    release the parent's POSIX locks on the database file.
+    """
+    global _pool, _pool_lock
+    _pool_lock = threading.Lock()
+    inherited = _pool
+    if inherited is not None:
+        _inherited_pools.append(inherited)
+        _pool = ConnectionPool(inherited.db_path, inherited.size, inherited.timeout)
+
+
+# Covers gunicorn --preload and any other forking server, with no hooks to configure
+os.register_at_fork(before=close_idle_before_fork, after_in_child=reinit_after_fork)
+
 
 def get_db_connection():
-    # Create database directory if it doesn't exist
-    db_dir = 'database'
-    if not os.path.exists(db_dir):
-        os.makedirs(db_dir)
-    
-    db_path = os.path.join(db_dir, 'syllabus_app.db')
-    return sqlite3.connect(db_path)
+    """
+    Get a database connection.
+    Inside a Flask app context the same connection is reused for the whole
+    request and released on teardown; elsewhere the caller owns it until close().
+    """
+    pool = get_pool()
+    if has_app_context():
+        conn = g.get('_db_conn')
+        if conn is None:
+            conn = PooledConnection(pool, pool.acquire(), request_scoped=True)
+            g._db_conn = conn
+        else:
+            # Every helper starts from plain tuples, whatever the previous one set
+            conn.row_factory = None
+        return conn
+    return PooledConnection(pool, pool.acquire())
+
+
+def rollback_request_connection():
+    """
+    Discard uncommitted work on the request-scoped connection after a failed
+    write, so later reads in the request do not see it and a later commit()
+    cannot persist it.
+    """
+    conn = g.get('_db_conn') if has_app_context() else None
+    if conn is not None and conn.in_transaction:
+        conn.rollback()
+
+
+def release_request_connection(exc=None):
+    """
+    Return the request-scoped connection to the pool. Also called mid-request
+    before slow work such as password hashing; the next get_db_connection()
+    checks out a connection again.
+    """
+    if not has_app_context():
+        return
+    conn = g.pop('_db_conn', None)
+    if conn is not None:
+        conn.release()
+
+
+def get_pool_stats():
+    return get_pool().stats()
+
+
+def init_app(app):
+    """Configure the pool from app config and register request teardown."""
+    configure_pool(
+        app.config.get('DATABASE_PATH'),
+        app.config.get('DB_POOL_SIZE'),
+        app.config.get('DB_POOL_TIMEOUT'),
+    )
+    app.teardown_appcontext(release_request_connection)
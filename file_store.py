@@ -0,0 +1,408 @@
+"""
+Streaming ingest for uploaded syllabus files.
+
+Werkzeug normally spools each uploaded file to a temporary file (or memory)
+before the view sees it. Views that opt in with request.stream_uploads_to()
+instead get an IngestStream: the multipart parser writes each chunk straight
+into a partial file in the upload directory while the size is enforced, the
+content is hashed and the first chunk is kept for MIME sniffing. commit()
+then renames the partial file to its final name atomically, so every byte is
+written once and memory per upload stays constant.
+
+Stored files are content-addressed: a blob lives at
+blobs/<ab>/<cd>/<sha256> under the upload directory, so identical uploads
+share one file. The file_blobs table reference-counts blobs (see migration
+0004); release_blob() forgets one when no syllabus_files row is left and
+remove_released_blob() unlinks it once that delete has committed.
+
+Usage:
+    python file_store.py backfill [--dry-run] [upload_dir]
+"""
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from flask import Request, request, has_request_context, current_app, send_file
+from werkzeug.exceptions import RequestEntityTooLarge
+from serving import offload
+
+MAX_UPLOAD_SIZE = int(os.environ.get('MAX_UPLOAD_SIZE', 10 * 1024 * 1024))  # 10MB
+# Room for the other form fields and multipart framing around the file
+FORM_OVERHEAD = 64 * 1024
+# libmagic only needs the start of a file to identify it
+SNIFF_BYTES = 64 * 1024
+PARTIAL_PREFIX = '.upload-'
+BLOB_DIR = 'blobs'
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Download metadata cache and serving mode
+FILE_CACHE_SIZE = int(os.environ.get('FILE_CACHE_SIZE', 4096))
+FILE_CACHE_TTL = float(os.environ.get('FILE_CACHE_TTL', 300))
+FILE_SENDFILE = os.environ.get('FILE_SENDFILE', '')  # '', 'x-sendfile' or 'x-accel-redirect'
+FILE_ACCEL_PREFIX = os.environ.get('FILE_ACCEL_PREFIX', '/protected-uploads/')
+# Blobs never change, so browsers may keep them for a year
+BLOB_MAX_AGE = 365 * 24 * 3600
+
+
+class UploadTooLarge(RequestEntityTooLarge):
+    """Raised while streaming an upload that exceeds the size limit."""
+
+
+class IngestStream:
+    """Writable upload target that counts, hashes and sniffs as it writes."""
+
+    def __init__(self, directory, max_size=MAX_UPLOAD_SIZE):
+        fd, self.partial_path = tempfile.mkstemp(dir=directory, prefix=PARTIAL_PREFIX, suffix='.part')
+        self._file = os.fdopen(fd, 'w+b')
+        self.max_size = max_size
+        self.size = 0
+        self.head = b''
+        self.path = None
+        self.deduplicated = False
+        self._hash = hashlib.sha256()
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise UploadTooLarge(f'File too large. Maximum size is {self.max_size / 1024 / 1024:g}MB')
+        if len(self.head) < SNIFF_BYTES:
+            self.head += data[:SNIFF_BYTES - len(self.head)]
+        self._hash.update(data)
+        return self._file.write(data)
+
+    def __getattr__(self, name):
+        # read/seek/tell etc. for FileStorage
+        return getattr(self._file, name)
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    def sniff_mime(self):
+        """MIME type detected from the first chunk, without touching the disk."""
+        # Loading libmagic is left to the first upload instead of every worker's boot
+        import magic
+        return offload(magic.from_buffer, self.head, mime=True)
+
+    def commit(self, final_path):
+        """Atomically move the finished upload to final_path."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self.partial_path, final_path)
+        self.path = final_path
+        return final_path
+
+    def commit_blob(self, upload_dir):
+        """
+        Move the upload into the blob store. If a blob with the same content
+        already exists the partial file is dropped and the blob is reused.
+        Returns:
+            str: blob path
+        """
+        path = blob_path(upload_dir, self.sha256)
+        if os.path.isfile(path):
+            self.discard()
+            self.path = path
+            self.deduplicated = True
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return self.commit(path)
+
+    def discard(self):
+        """Remove the partial file unless it has been committed."""
+        if not self._file.closed:
+            self._file.close()
+        if self.path is None:
+            try:
+                os.remove(self.partial_path)
+            except FileNotFoundError:
+                pass
+
+
+def blob_path(upload_dir, content_hash):
+    """Sharded location of a blob, e.g. blobs/3f/a2/3fa2..."""
+    return os.path.join(upload_dir, BLOB_DIR, content_hash[:2], content_hash[2:4], content_hash)
+
+
+def hash_file(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def release_blob(cursor, content_hash):
+    """
+    Forget a blob once no syllabus_files row references it. Call after
+    deleting the row, inside the same transaction, and unlink the file with
+    remove_released_blob() only once that transaction has committed.
+    Returns:
+        bool: True if the blob was released
+    """
+    cursor.execute("SELECT ref_count FROM file_blobs WHERE content_hash = ?", (content_hash,))
+    row = cursor.fetchone()
+    if row and row[0] > 0:
+        return False
+    cursor.execute("DELETE FROM file_blobs WHERE content_hash = ?", (content_hash,))
+    return True
+
+
+def remove_released_blob(conn, content_hash, path):
+    """
+    Unlink a blob released by a committed transaction. The write lock is
+    taken again and file_blobs re-checked, so an upload that reused the blob
+    in the meantime keeps it; a blob left behind by a crash here is picked up
+    by the orphan sweep.
+    Returns:
+        bool: True if the blob was removed
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if conn.execute("SELECT 1 FROM file_blobs WHERE content_hash = ?", (content_hash,)).fetchone():
+            return False
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        return True
+    finally:
+        conn.rollback()
+
+
+class FileMetadataCache:
+    """Bounded LRU cache of download metadata by file id, with a time-to-live."""
+
+    def __init__(self, maxsize=FILE_CACHE_SIZE, ttl=FILE_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, file_id, loader):
+        with self._lock:
+            entry = self._entries.get(file_id)
+            if entry is not None:
+                metadata, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(file_id)
+                    self.hits += 1
+                    return metadata
+                del self._entries[file_id]
+            self.misses += 1
+
+        metadata = loader(file_id)
+        if metadata is not None and self.maxsize > 0:
+            with self._lock:
+                self._entries[file_id] = (metadata, time.monotonic() + self.ttl)
+                self._entries.move_to_end(file_id)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return metadata
+
+    def invalidate(self, file_id=None):
+        with self._lock:
+            if file_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(file_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+file_cache = FileMetadataCache()
+
+
+def send_stored_file(metadata, upload_dir, download_name):
+    """
+    Serve an uploaded file. Blobs get their content hash as a strong ETag and
+    a long-lived private Cache-Control; Range and conditional requests are
+    answered by werkzeug. With FILE_SENDFILE the front-end server sends the
+    bytes (X-Sendfile, or X-Accel-Redirect under FILE_ACCEL_PREFIX).
+    """
+    file_path = metadata['file_path']
+    content_hash = metadata.get('content_hash')
+    mimetype = metadata.get('file_type') or 'application/octet-stream'
+    mode = current_app.config.get('FILE_SENDFILE', '')
+
+    if mode == 'x-accel-redirect':
+        relative_path = os.path.relpath(file_path, upload_dir).replace(os.sep, '/')
+        response = current_app.response_class(mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = FILE_ACCEL_PREFIX.rstrip('/') + '/' + relative_path
+        response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+        if content_hash:
+            response.set_etag(content_hash)
+        response.make_conditional(request)
+    else:
+        response = send_file(
+            file_path,
+            as_attachment=True,
+            download_name=download_name,
+            mimetype=mimetype,
+            etag=content_hash or True,
+            conditional=True
+        )
+        # Flask emits X-Sendfile itself when USE_X_SENDFILE is set
+        response.accept_ranges = 'bytes'
+
+    if content_hash:
+        response.cache_control.no_cache = None
+        response.cache_control.private = True
+        response.cache_control.max_age = BLOB_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        # Files from before content addressing may still be replaced by a backfill
+        response.cache_control.private = True
+        response.cache_control.max_age = 0
+    return response
+
+
+def get_file_cache_stats():
+    return file_cache.stats()
+
+
+class UploadRequest(Request):
+    """Request that can stream uploaded files directly into the upload directory."""
+
+    upload_target = None
+    content_limit = None
+
+    @property
+    def max_content_length(self):
+        # Views such as the catalogue import may raise the app-wide limit
+        if self.content_limit is not None:
+            return self.content_limit
+        return super().max_content_length
+
+    def stream_uploads_to(self, directory, max_size=MAX_UPLOAD_SIZE):
+        """Opt in to streaming ingest; call before touching request.files."""
+        self.upload_target = (directory, max_size)
+        self.upload_streams = []
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.upload_target is None:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        stream = IngestStream(*self.upload_target)
+        self.upload_streams.append(stream)
+        return stream
+
+
+def discard_pending_uploads(exc=None):
+    """Drop partial files of uploads the view did not commit."""
+    if has_request_context():
+        for stream in getattr(request, 'upload_streams', ()):
+            stream.discard()
+
+
+def init_app(app):
+    app.request_class = UploadRequest
+    app.config.setdefault('MAX_CONTENT_LENGTH', MAX_UPLOAD_SIZE + FORM_OVERHEAD)
+    app.teardown_request(discard_pending_uploads)
+    app.config.setdefault('FILE_SENDFILE', FILE_SENDFILE)
+    app.config.setdefault('USE_X_SENDFILE', app.config['FILE_SENDFILE'] == 'x-sendfile')
+
+
+def backfill_blob_store(conn, upload_dir, dry_run=False):
+    """
+    Move files uploaded before content addressing into the blob store,
+    removing duplicate copies. Each row is committed before its old file is
+    removed, so an interrupted run can simply be restarted.
+    Returns:
+        dict: rows, moved, deduplicated, missing, bytes_reclaimed
+    """
+    report = {'rows': 0, 'moved': 0, 'deduplicated': 0, 'missing': 0, 'bytes_reclaimed': 0}
+    rows = conn.execute(
+        "SELECT id, file_path FROM syllabus_files WHERE content_hash IS NULL ORDER BY id"
+    ).fetchall()
+    known_blobs = set()
+    moved_paths = {}
+    for file_id, file_path in rows:
+        report['rows'] += 1
+        if file_path in moved_paths:
+            # Another row pointed at the same file, which is already in the store
+            content_hash = moved_paths[file_path]
+            if not dry_run:
+                conn.execute(
+                    "UPDATE syllabus_files SET content_hash = ?, file_path = ? WHERE id = ?",
+                    (content_hash, blob_path(upload_dir, content_hash), file_id)
+                )
+                conn.commit()
+            continue
+        if not os.path.isfile(file_path):
+            # Older rows may carry a path from another checkout of the app
+            file_path = os.path.join(upload_dir, os.path.basename(file_path))
+            if not os.path.isfile(file_path):
+                report['missing'] += 1
+                continue
+
+        content_hash = hash_file(file_path)
+        moved_paths[file_path] = content_hash
+        target = blob_path(upload_dir, content_hash)
+        duplicate = content_hash in known_blobs or os.path.isfile(target)
+        known_blobs.add(content_hash)
+        if duplicate:
+            report['deduplicated'] += 1
+            report['bytes_reclaimed'] += os.path.getsize(file_path)
+        else:
+            report['moved'] += 1
+        if dry_run:
+            continue
+
+        if not duplicate:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            try:
+                os.link(file_path, target)
+            except OSError:
+                shutil.copy2(file_path, target)
+        conn.execute(
+            "UPDATE syllabus_files SET content_hash = ?, file_path = ? WHERE id = ?",
+            (content_hash, target, file_id)
+        )
+        conn.commit()
+        if file_path != target:
+            os.remove(file_path)
+    return report
+
+
+def main():
+    import db_config
+
+    args = sys.argv[1:]
+    if not args or args[0] != 'backfill':
+        print(__doc__.strip().splitlines()[-1].strip())
+        sys.exit(1)
+    dry_run = '--dry-run' in args
+    paths = [arg for arg in args[1:] if arg != '--dry-run']
+    upload_dir = paths[0] if paths else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+
+    print(f"🚀 Moving {upload_dir} into the content-addressed store{' (dry run)' if dry_run else ''}...")
+    conn = sqlite3.connect(db_config.DB_PATH)
+    try:
+        report = backfill_blob_store(conn, upload_dir, dry_run)
+    finally:
+        conn.close()
+    print(f"✅ {report['rows']} file(s): {report['moved']} moved, {report['deduplicated']} duplicate(s) removed, "
+          f"{report['missing']} missing, {report['bytes_reclaimed'] / 1024 / 1024:.1f}MB reclaimed")
+
+
+if __name__ == '__main__':
+    main()
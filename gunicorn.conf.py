@@ -0,0 +1,41 @@
+"""
+Gunicorn settings for Syllabus Management System.
+
+The app is built once in the master (preload_app) and forked into the
+workers, so they boot without re-importing Flask, the routes and the
+templates. Database pools and password hashing pools are rebuilt in each
+worker by fork handlers registered in db_config and passwords.
+
+GUNICORN_WORKER_CLASS picks the serving mode (see serving.py): sync, gthread
+or gevent. gevent patches the standard library here, before the app is
+preloaded, so every lock and pool the app creates is cooperative.
+
+    gunicorn -c gunicorn.conf.py app:app
+"""
+
+import os
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+if worker_class == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+# Requests each gthread worker runs at once, and greenlets each gevent worker runs at once
+threads = int(os.environ.get('GUNICORN_THREADS', 8 if worker_class == 'gthread' else 1))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+if worker_class == 'gevent':
+    # Every greenlet holds a pooled connection for its request, but each connection keeps
+    # its own page cache (~16MB), so past the cap greenlets queue for one cooperatively;
+    # db_config reads this when the app loads
+    os.environ.setdefault('DB_POOL_SIZE', str(min(worker_connections, 16)))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True').lower() == 'true'
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    server.log.info(f"Worker {worker.pid} forked from the preloaded app" if preload_app
+                    else f"Worker {worker.pid} forked, it will build its own app")
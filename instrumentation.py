@@ -0,0 +1,269 @@
+"""
+Request instrumentation for Syllabus Management System.
+
+Every request records its latency, the number of SQL statements it ran and
+the time spent in them, the pooled connections it checked out (and how many
+had to be opened) and the time spent rendering templates. The numbers are
+sent back in a Server-Timing header, aggregated per endpoint for /metrics
+(Prometheus text format, per worker process), and requests that run more
+statements than QUERY_BUDGET are logged with their most repeated statements,
+which is how N+1 loops show up.
+
+/metrics and the detailed /health payload are only served to logged-in
+admins and to clients in METRICS_ALLOWLIST (addresses or networks, e.g. the
+Prometheus host), since they expose endpoint names, pool sizes and pids.
+"""
+
+import ipaddress
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from flask import Response, abort, before_render_template, current_app, g, has_app_context, request, template_rendered
+from flask_login import current_user
+import db_config
+import passwords
+import throttle
+
+logger = logging.getLogger(__name__)
+
+INSTRUMENTATION = os.environ.get('INSTRUMENTATION', 'True').lower() == 'true'
+SERVER_TIMING = os.environ.get('SERVER_TIMING', 'True').lower() == 'true'
+QUERY_BUDGET = int(os.environ.get('QUERY_BUDGET', 20))  # 0 disables the check
+# Comma-separated client addresses or networks that may read /metrics without logging in
+METRICS_ALLOWLIST = os.environ.get('METRICS_ALLOWLIST', '')
+
+# Request latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+BUDGET_REPORT_STATEMENTS = 3
+
+
+class RequestStats:
+    """Counters for the request in progress."""
+
+    __slots__ = ('started', 'queries', 'sql_time', 'checkouts', 'connections_opened',
+                 'render_time', 'render_stack', 'statements')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.checkouts = 0
+        self.connections_opened = 0
+        self.render_time = 0.0
+        self.render_stack = []
+        self.statements = Counter()
+
+
+def _current():
+    return g.get('_request_stats') if has_app_context() else None
+
+
+class RequestObserver:
+    """db_config observer that charges pool and statement activity to the current request."""
+
+    def checkout(self, opened):
+        stats = _current()
+        if stats is not None:
+            stats.checkouts += 1
+            stats.connections_opened += opened
+
+    def query(self, sql, seconds, executed):
+        stats = _current()
+        if stats is not None:
+            stats.sql_time += seconds
+            if executed:
+                stats.queries += 1
+                stats.statements[sql] += 1
+
+
+class MetricsRegistry:
+    """Per-process request metrics, aggregated by endpoint."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.requests = Counter()              # (endpoint, method, status)
+        self.latency = defaultdict(lambda: [0] * (len(self.buckets) + 1))
+        self.latency_sum = Counter()
+        self.queries = Counter()
+        self.sql_seconds = Counter()
+        self.render_seconds = Counter()
+        self.checkouts = 0
+        self.connections_opened = 0
+        self.budget_exceeded = Counter()
+
+    def record(self, endpoint, method, status, seconds, stats, over_budget):
+        with self._lock:
+            self.requests[(endpoint, method, status)] += 1
+            counts = self.latency[endpoint]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self.latency_sum[endpoint] += seconds
+            self.queries[endpoint] += stats.queries
+            self.sql_seconds[endpoint] += stats.sql_time
+            self.render_seconds[endpoint] += stats.render_time
+            self.checkouts += stats.checkouts
+            self.connections_opened += stats.connections_opened
+            if over_budget:
+                self.budget_exceeded[endpoint] += 1
+
+    def render(self):
+        """Prometheus text exposition of everything recorded so far."""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{_escape_label(val)}"' for key, val in labels)
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        with self._lock:
+            metric('syllabus_http_requests_total', 'counter', 'Requests handled.',
+                   [((('endpoint', e), ('method', m), ('status', s)), n)
+                    for (e, m, s), n in sorted(self.requests.items())])
+
+            lines.append("# HELP syllabus_http_request_duration_seconds Request latency.")
+            lines.append("# TYPE syllabus_http_request_duration_seconds histogram")
+            for endpoint, counts in sorted(self.latency.items()):
+                label = f'endpoint="{_escape_label(endpoint)}"'
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'syllabus_http_request_duration_seconds_bucket{{{label},le="{le}"}} {cumulative}')
+                lines.append(f'syllabus_http_request_duration_seconds_sum{{{label}}} {self.latency_sum[endpoint]:.6f}')
+                lines.append(f'syllabus_http_request_duration_seconds_count{{{label}}} {cumulative}')
+
+            metric('syllabus_db_queries_total', 'counter', 'SQL statements executed.',
+                   [((('endpoint', e),), n) for e, n in sorted(self.queries.items())])
+            metric('syllabus_db_query_seconds_total', 'counter', 'Time spent executing and fetching SQL.',
+                   [((('endpoint', e),), f"{n:.6f}") for e, n in sorted(self.sql_seconds.items())])
+            metric('syllabus_template_render_seconds_total', 'counter', 'Time spent rendering templates.',
+                   [((('endpoint', e),), f"{n:.6f}") for e, n in sorted(self.render_seconds.items())])
+            metric('syllabus_query_budget_exceeded_total', 'counter',
+                   'Requests that ran more SQL statements than the query budget.',
+                   [((('endpoint', e),), n) for e, n in sorted(self.budget_exceeded.items())])
+            metric('syllabus_db_checkouts_total', 'counter', 'Pooled connections checked out by requests.',
+                   [((), self.checkouts)])
+            metric('syllabus_db_connections_opened_total', 'counter', 'New SQLite connections opened by requests.',
+                   [((), self.connections_opened)])
+
+        hashing = passwords.get_password_stats()
+        metric('syllabus_logins_total', 'counter', 'Login attempts by result.',
+               [((('result', result),), n) for result, n in sorted(hashing['logins'].items())])
+        metric('syllabus_password_verify_seconds_total', 'counter', 'Time spent verifying passwords.',
+               [((), f"{hashing['verify_seconds']:.6f}")])
+        metric('syllabus_password_verifications_total', 'counter', 'Password hashes verified.',
+               [((), hashing['verifications'])])
+        metric('syllabus_password_rehashes_total', 'counter', 'Hashes upgraded to the current policy on login.',
+               [((), hashing['rehashed'])])
+        metric('syllabus_password_busy_total', 'counter', 'Hashing requests turned away by a saturated pool.',
+               [((), hashing['busy'])])
+        metric('syllabus_login_throttled_total', 'counter', 'Login and registration attempts rejected by rate limits.',
+               [((('scope', scope),), n) for scope, n in sorted(throttle.get_throttle_stats()['rejected'].items())])
+        metric('syllabus_password_in_flight', 'gauge', 'Password hashes running or queued.',
+               [((), hashing['in_flight'])])
+
+        pool = db_config.get_pool_stats()
+        metric('syllabus_db_pool_connections', 'gauge', 'Pooled connections by state.',
+               [((('state', 'idle'),), pool['idle']), ((('state', 'in_use'),), pool['in_use'])])
+        metric('syllabus_db_pool_waits_total', 'counter', 'Checkouts that had to wait for a connection.',
+               [((), pool['waits'])])
+        return '\n'.join(lines) + '\n'
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+metrics = MetricsRegistry()
+
+
+def _start_request():
+    g._request_stats = RequestStats()
+
+
+def _template_started(sender, template, context, **extra):
+    stats = _current()
+    if stats is not None:
+        stats.render_stack.append(time.perf_counter())
+
+
+def _template_finished(sender, template, context, **extra):
+    stats = _current()
+    if stats is not None and stats.render_stack:
+        started = stats.render_stack.pop()
+        # Nested renders are already counted by the outer one
+        if not stats.render_stack:
+            stats.render_time += time.perf_counter() - started
+
+
+def _finish_request(response):
+    stats = g.pop('_request_stats', None)
+    if stats is None:
+        return response
+    seconds = time.perf_counter() - stats.started
+    endpoint = request.endpoint or 'unmatched'
+    budget = current_app.config['QUERY_BUDGET']
+    over_budget = budget > 0 and stats.queries > budget
+    if over_budget:
+        repeated = ', '.join(f"{count}x {_one_line(sql)}"
+                             for sql, count in stats.statements.most_common(BUDGET_REPORT_STATEMENTS))
+        logger.warning(f"Query budget exceeded: {request.method} {request.path} ran {stats.queries} "
+                       f"statements (budget {budget}); most repeated: {repeated}")
+    metrics.record(endpoint, request.method, response.status_code, seconds, stats, over_budget)
+
+    if current_app.config['SERVER_TIMING']:
+        response.headers['Server-Timing'] = ', '.join((
+            f'app;dur={seconds * 1000:.2f}',
+            f'db;dur={stats.sql_time * 1000:.2f};desc="{stats.queries} queries"',
+            f'tpl;dur={stats.render_time * 1000:.2f}',
+            f'conn;desc="{stats.checkouts} checkouts, {stats.connections_opened} opened"',
+        ))
+    return response
+
+
+def _one_line(sql, width=100):
+    return re.sub(r'\s+', ' ', sql or '').strip()[:width]
+
+
+def monitoring_allowed():
+    """Whether this request may read /metrics and the detailed /health."""
+    if current_user.is_authenticated and current_user.role == 'admin':
+        return True
+    try:
+        client = ipaddress.ip_address(request.remote_addr or '')
+    except ValueError:
+        return False
+    allowlist = current_app.config['METRICS_ALLOWLIST']
+    return any(client in ipaddress.ip_network(entry.strip(), strict=False)
+               for entry in allowlist.split(',') if entry.strip())
+
+
+def metrics_view():
+    if not monitoring_allowed():
+        abort(403)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    app.config.setdefault('QUERY_BUDGET', QUERY_BUDGET)
+    app.config.setdefault('METRICS_ALLOWLIST', METRICS_ALLOWLIST)
+    app.config.setdefault('SERVER_TIMING', SERVER_TIMING)
+    if not app.config.get('INSTRUMENTATION', INSTRUMENTATION):
+        return
+    db_config.set_observer(RequestObserver())
+    # First, so the other before_request hooks are measured too
+    app.before_request_funcs.setdefault(None, []).insert(0, _start_request)
+    app.after_request(_finish_request)
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_finished, app)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
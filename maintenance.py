@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Background maintenance for Syllabus Management System.
+
+Orphaned-file cleanup removes files in uploads/ that no syllabus_files row
+references: blobs whose reference count dropped to zero without being
+unlinked, files from failed uploads and stale partial uploads. It works one
+blob shard directory at a time, checks each shard against an indexed range
+of file_blobs, and stops when its time budget or file limit is reached,
+resuming from the saved cursor on the next run. Files younger than
+MAINTENANCE_GRACE are never touched, so uploads still being committed are
+safe.
+
+Each worker runs a small scheduler thread; the maintenance_jobs table makes
+sure only one process runs a due job. The job can also be run from cron.
+
+Usage:
+    python maintenance.py cleanup [--dry-run] [upload_dir]
+"""
+
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from db_config import get_db_connection
+from file_store import BLOB_DIR, PARTIAL_PREFIX
+
+logger = logging.getLogger(__name__)
+
+MAINTENANCE_INTERVAL = float(os.environ.get('MAINTENANCE_INTERVAL', 6 * 3600))  # 0 disables the scheduler
+MAINTENANCE_POLL = 60
+MAINTENANCE_TIME_BUDGET = float(os.environ.get('MAINTENANCE_TIME_BUDGET', 2.0))
+MAINTENANCE_MAX_FILES = int(os.environ.get('MAINTENANCE_MAX_FILES', 5000))
+MAINTENANCE_GRACE = float(os.environ.get('MAINTENANCE_GRACE', 3600))
+
+ORPHAN_JOB = 'orphaned_files'
+# Cursor value for the top level of uploads/ (legacy files and partial uploads)
+TOP_LEVEL = '.'
+
+
+def _iter_batches(upload_dir, after=None):
+    """Yield (cursor, directory) for the top level and every blob shard, in sorted order."""
+    if after is None:
+        yield TOP_LEVEL, upload_dir
+    blob_root = os.path.join(upload_dir, BLOB_DIR)
+    if not os.path.isdir(blob_root):
+        return
+    for first in sorted(entry.name for entry in os.scandir(blob_root) if entry.is_dir()):
+        if after not in (None, TOP_LEVEL) and first < after[:2]:
+            continue
+        first_dir = os.path.join(blob_root, first)
+        for second in sorted(entry.name for entry in os.scandir(first_dir) if entry.is_dir()):
+            shard = f"{first}/{second}"
+            if after not in (None, TOP_LEVEL) and shard <= after:
+                continue
+            yield shard, os.path.join(first_dir, second)
+
+
+def _referenced_names(cursor, shard):
+    if shard == TOP_LEVEL:
+        cursor.execute("SELECT file_path FROM syllabus_files WHERE content_hash IS NULL")
+        return {os.path.basename(row[0]) for row in cursor.fetchall()}
+    prefix = shard.replace('/', '')
+    # Hex hashes sort below 'g', so this is an index range scan over one shard
+    cursor.execute("""
+        SELECT content_hash FROM file_blobs
+        WHERE content_hash >= ? AND content_hash < ? AND ref_count > 0
+    """, (prefix, prefix + 'g'))
+    return {row[0] for row in cursor.fetchall()}
+
+
+def cleanup_orphaned_files(upload_dir, cursor_value=None, dry_run=False,
+                           time_budget=MAINTENANCE_TIME_BUDGET, max_files=MAINTENANCE_MAX_FILES,
+                           grace=MAINTENANCE_GRACE):
+    """
+    Remove unreferenced files, starting after cursor_value.
+    Returns:
+        dict: scanned, removed, bytes_reclaimed, batches, cursor, complete, dry_run
+    """
+    report = {'scanned': 0, 'removed': 0, 'bytes_reclaimed': 0, 'batches': 0,
+              'cursor': cursor_value, 'complete': True, 'dry_run': dry_run}
+    deadline = time.monotonic() + time_budget
+    cutoff = time.time() - grace
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        for shard, directory in _iter_batches(upload_dir, cursor_value):
+            if report['batches'] and (time.monotonic() > deadline or report['scanned'] >= max_files):
+                report['complete'] = False
+                break
+            referenced = _referenced_names(cursor, shard)
+            removed_here = 0
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    report['scanned'] += 1
+                    stat = entry.stat(follow_symlinks=False)
+                    # Partial uploads are never referenced; they only go once stale
+                    if entry.name in referenced or stat.st_mtime > cutoff:
+                        continue
+                    if shard == TOP_LEVEL and entry.name.startswith('.') and not entry.name.startswith(PARTIAL_PREFIX):
+                        continue
+                    if not dry_run:
+                        try:
+                            os.remove(entry.path)
+                        except OSError as e:
+                            logger.error(f"Failed to remove orphaned file {entry.path}: {e}")
+                            continue
+                        logger.info(f"Removed orphaned file: {entry.path}")
+                    report['removed'] += 1
+                    removed_here += 1
+                    report['bytes_reclaimed'] += stat.st_size
+            if removed_here and shard != TOP_LEVEL and not dry_run:
+                try:
+                    os.rmdir(directory)  # only succeeds once the shard is empty
+                except OSError:
+                    pass
+            report['batches'] += 1
+            report['cursor'] = shard
+    finally:
+        cursor.close()
+        conn.close()
+
+    if report['complete']:
+        report['cursor'] = None
+    return report
+
+
+def claim_job(name, interval):
+    """
+    Claim a due job for this process.
+    Returns:
+        str or None: the job's saved cursor if claimed ('' for a fresh start), else None
+    """
+    now = time.time()
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            UPDATE maintenance_jobs SET next_run_at = ?, last_run_at = ?
+            WHERE name = ? AND next_run_at <= ?
+        """, (now + interval, now, name, now))
+        claimed = cursor.rowcount == 1
+        saved = None
+        if claimed:
+            cursor.execute("SELECT cursor FROM maintenance_jobs WHERE name = ?", (name,))
+            saved = cursor.fetchone()[0] or ''
+        conn.commit()
+        return saved
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def finish_job(name, report, run_again_now=False):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        if run_again_now:
+            # Unfinished incremental run: continue on the next poll
+            cursor.execute("UPDATE maintenance_jobs SET next_run_at = 0 WHERE name = ?", (name,))
+        cursor.execute(
+            "UPDATE maintenance_jobs SET cursor = ?, last_report = ? WHERE name = ?",
+            (report.get('cursor'), json.dumps(report), name)
+        )
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def run_orphan_cleanup(upload_dir, interval=MAINTENANCE_INTERVAL):
+    """Run the cleanup if it is due and no other process has claimed it."""
+    saved = claim_job(ORPHAN_JOB, interval)
+    if saved is None:
+        return None
+    report = cleanup_orphaned_files(upload_dir, saved or None)
+    finish_job(ORPHAN_JOB, report, run_again_now=not report['complete'])
+    logger.info(f"Orphaned-file cleanup: {report}")
+    return report
+
+
+def get_maintenance_stats():
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT name, last_run_at, last_report FROM maintenance_jobs")
+        rows = cursor.fetchall()
+        cursor.close()
+        conn.close()
+        return {name: {'last_run_at': last_run_at, 'last_report': json.loads(last_report) if last_report else None}
+                for name, last_run_at, last_report in rows}
+    except Exception as e:
+        logger.error(f"Error reading maintenance stats: {e}")
+        return {}
+
+
+class MaintenanceScheduler:
+    """Per-process daemon thread that polls for due maintenance jobs."""
+
+    def __init__(self, upload_dir, interval=MAINTENANCE_INTERVAL, poll=MAINTENANCE_POLL):
+        self.upload_dir = upload_dir
+        self.interval = interval
+        self.poll = poll
+        self.pid = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        # Threads do not survive fork, so each worker starts its own
+        if self.interval <= 0 or self.pid == os.getpid():
+            return
+        with self._lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='maintenance', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            # Jitter keeps workers from polling in lockstep
+            time.sleep(self.poll * random.uniform(0.5, 1.5))
+            try:
+                run_orphan_cleanup(self.upload_dir, self.interval)
+            except Exception as e:
+                logger.error(f"Maintenance job failed: {e}", exc_info=True)
+
+
+def init_app(app):
+    scheduler = MaintenanceScheduler(
+        os.path.join(app.root_path, 'uploads'),
+        app.config.get('MAINTENANCE_INTERVAL', MAINTENANCE_INTERVAL),
+    )
+    app.extensions['maintenance'] = scheduler
+    app.before_request(scheduler.ensure_started)
+
+
+def main():
+    import db_config
+
+    args = sys.argv[1:]
+    if not args or args[0] != 'cleanup':
+        print(__doc__.strip().splitlines()[-1].strip())
+        sys.exit(1)
+    dry_run = '--dry-run' in args
+    paths = [arg for arg in args[1:] if arg != '--dry-run']
+    upload_dir = paths[0] if paths else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+
+    db_config.configure_pool(db_config.DB_PATH)
+    print(f"🧹 Cleaning orphaned files in {upload_dir}{' (dry run)' if dry_run else ''}...")
+    report = cleanup_orphaned_files(upload_dir, dry_run=dry_run, time_budget=float('inf'), max_files=sys.maxsize)
+    print(f"✅ {report['scanned']} file(s) scanned in {report['batches']} batch(es), "
+          f"{report['removed']} {'would be ' if dry_run else ''}removed, "
+          f"{report['bytes_reclaimed'] / 1024 / 1024:.1f}MB reclaimed")
+
+
+if __name__ == '__main__':
+    main()
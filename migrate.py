@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Versioned schema migrations for Syllabus Management System.
+
+db_schema.sql is the baseline (version 1); later migrations live in
+migrations/ as NNNN_description.sql and are applied in order, each in its
+own transaction. Applied versions are recorded in schema_migrations.
+
+Usage:
+    python migrate.py [database_path]
+"""
+
+import os
+import re
+import sqlite3
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_SCHEMA = os.path.join(BASE_DIR, 'db_schema.sql')
+MIGRATIONS_DIR = os.path.join(BASE_DIR, 'migrations')
+MIGRATION_FILE_PATTERN = re.compile(r'^(\d+)_(\w+)\.sql$')
+
+
+def discover_migrations():
+    """Return [(version, name, path)] sorted by version."""
+    migrations = [(1, 'initial_schema', BASELINE_SCHEMA)]
+    if os.path.isdir(MIGRATIONS_DIR):
+        for filename in os.listdir(MIGRATIONS_DIR):
+            match = MIGRATION_FILE_PATTERN.match(filename)
+            if match:
+                migrations.append((int(match.group(1)), match.group(2),
+                                   os.path.join(MIGRATIONS_DIR, filename)))
+    migrations.sort()
+
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration versions in {MIGRATIONS_DIR}")
+    return migrations
+
+
+def get_applied_versions(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.commit()
+    return {row[0] for row in conn.execute("SELECT version FROM schema_migrations")}
+
+
+def run_migrations(conn, verbose=False):
+    """
+    Apply pending migrations and refresh planner statistics.
+    Returns:
+        list: versions applied by this call
+    """
+    applied = get_applied_versions(conn)
+    newly_applied = []
+
+    for version, name, path in discover_migrations():
+        if version in applied:
+            continue
+        with open(path, 'r') as f:
+            sql = f.read()
+        try:
+            conn.executescript(
+                f"BEGIN;\n{sql}\n;"
+                f"INSERT INTO schema_migrations (version, name) VALUES ({version}, '{name}');\n"
+                "COMMIT;"
+            )
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        newly_applied.append(version)
+        if verbose:
+            print(f"   - Applied migration {version:04d}_{name}")
+
+    if newly_applied:
+        conn.execute("ANALYZE")
+        conn.commit()
+    return newly_applied
+
+
+def main():
+    import db_config
+
+    db_path = sys.argv[1] if len(sys.argv) > 1 else db_config.DB_PATH
+    db_dir = os.path.dirname(db_path)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+
+    print(f"🚀 Migrating {db_path}...")
+    conn = sqlite3.connect(db_path)
+    try:
+        applied = run_migrations(conn, verbose=True)
+        current = max(get_applied_versions(conn))
+    finally:
+        conn.close()
+    if applied:
+        print(f"✅ Applied {len(applied)} migration(s), schema is at version {current}")
+    else:
+        print(f"✅ Schema is up to date (version {current})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+-- Secondary indexes for the hot query paths in models.py.
+-- Lookups by parent id use partial indexes that only hold active rows,
+-- matching the "is_active = 1" filters. Whole-table listings and counts use
+-- (is_active, sort column) so they are answered from the index alone.
+
+CREATE INDEX IF NOT EXISTS idx_programs_active_name
+    ON programs(is_active, name);
+
+CREATE INDEX IF NOT EXISTS idx_specializations_program_active
+    ON specializations(program_id, name) WHERE is_active = 1;
+CREATE INDEX IF NOT EXISTS idx_specializations_active_name
+    ON specializations(is_active, name);
+
+CREATE INDEX IF NOT EXISTS idx_semesters_program_active
+    ON semesters(program_id, semester_number) WHERE is_active = 1;
+CREATE INDEX IF NOT EXISTS idx_semesters_active_number
+    ON semesters(is_active, semester_number);
+
+CREATE INDEX IF NOT EXISTS idx_subjects_spec_sem_active
+    ON subjects(specialization_id, semester_id, name) WHERE is_active = 1;
+CREATE INDEX IF NOT EXISTS idx_subjects_active_name
+    ON subjects(is_active, name);
+
+CREATE INDEX IF NOT EXISTS idx_units_subject_active
+    ON units(subject_id, unit_number) WHERE is_active = 1;
+
+CREATE INDEX IF NOT EXISTS idx_syllabus_files_subject_uploaded
+    ON syllabus_files(subject_id, uploaded_at);
+
+-- users.email is already covered by the UNIQUE constraint's automatic index
@@ -0,0 +1,91 @@
+-- Full-text search over active subjects and units (SQLite FTS5).
+-- Row ids encode the source row: subjects are id*2, units are id*2+1, so
+-- triggers can maintain the index with rowid lookups only. Units of inactive
+-- subjects are kept out of the index. Prefix indexes on 3 and 4 characters
+-- keep as-you-type queries to a single doclist read.
+
+CREATE VIRTUAL TABLE IF NOT EXISTS catalogue_search USING fts5(
+    subject_id UNINDEXED,
+    title,
+    code,
+    description,
+    topics,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '3 4'
+);
+
+-- BM25 column weights: title, then code, topics, description
+INSERT INTO catalogue_search(catalogue_search, rank) VALUES ('rank', 'bm25(0.0, 10.0, 5.0, 1.0, 2.0)');
+
+-- Subjects
+CREATE TRIGGER IF NOT EXISTS subjects_search_ai AFTER INSERT ON subjects
+WHEN new.is_active = 1
+BEGIN
+    INSERT INTO catalogue_search (rowid, subject_id, title, code, description, topics)
+    VALUES (new.id * 2, new.id, new.name, new.code, new.description, NULL);
+END;
+
+CREATE TRIGGER IF NOT EXISTS subjects_search_au AFTER UPDATE OF name, code, description, is_active ON subjects
+BEGIN
+    DELETE FROM catalogue_search WHERE rowid = old.id * 2;
+    INSERT INTO catalogue_search (rowid, subject_id, title, code, description, topics)
+    SELECT new.id * 2, new.id, new.name, new.code, new.description, NULL
+    WHERE new.is_active = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS subjects_search_deactivate AFTER UPDATE OF is_active ON subjects
+WHEN old.is_active = 1 AND new.is_active != 1
+BEGIN
+    DELETE FROM catalogue_search
+    WHERE rowid IN (SELECT id * 2 + 1 FROM units WHERE subject_id = new.id AND is_active = 1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS subjects_search_activate AFTER UPDATE OF is_active ON subjects
+WHEN old.is_active != 1 AND new.is_active = 1
+BEGIN
+    INSERT INTO catalogue_search (rowid, subject_id, title, code, description, topics)
+    SELECT id * 2 + 1, subject_id, title, NULL, description, topics
+    FROM units WHERE subject_id = new.id AND is_active = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS subjects_search_ad AFTER DELETE ON subjects
+BEGIN
+    DELETE FROM catalogue_search WHERE rowid = old.id * 2;
+    DELETE FROM catalogue_search
+    WHERE rowid IN (SELECT id * 2 + 1 FROM units WHERE subject_id = old.id);
+END;
+
+-- Units
+CREATE TRIGGER IF NOT EXISTS units_search_ai AFTER INSERT ON units
+WHEN new.is_active = 1
+BEGIN
+    INSERT INTO catalogue_search (rowid, subject_id, title, code, description, topics)
+    SELECT new.id * 2 + 1, new.subject_id, new.title, NULL, new.description, new.topics
+    WHERE EXISTS (SELECT 1 FROM subjects WHERE id = new.subject_id AND is_active = 1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS units_search_au AFTER UPDATE OF subject_id, title, description, topics, is_active ON units
+BEGIN
+    DELETE FROM catalogue_search WHERE rowid = old.id * 2 + 1;
+    INSERT INTO catalogue_search (rowid, subject_id, title, code, description, topics)
+    SELECT new.id * 2 + 1, new.subject_id, new.title, NULL, new.description, new.topics
+    WHERE new.is_active = 1
+      AND EXISTS (SELECT 1 FROM subjects WHERE id = new.subject_id AND is_active = 1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS units_search_ad AFTER DELETE ON units
+BEGIN
+    DELETE FROM catalogue_search WHERE rowid = old.id * 2 + 1;
+END;
+
+-- Backfill existing rows (in rowid order, so FTS5 never has to flush mid-load)
+INSERT INTO catalogue_search (rowid, subject_id, title, code, description, topics)
+SELECT id * 2, id, name, code, description, NULL
+FROM subjects WHERE is_active = 1
+ORDER BY id;
+
+INSERT INTO catalogue_search (rowid, subject_id, title, code, description, topics)
+SELECT u.id * 2 + 1, u.subject_id, u.title, NULL, u.description, u.topics
+FROM units u JOIN subjects s ON s.id = u.subject_id
+WHERE u.is_active = 1 AND s.is_active = 1
+ORDER BY u.id;
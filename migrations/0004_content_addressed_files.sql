@@ -0,0 +1,46 @@
+-- Content-addressed storage for uploaded files.
+-- syllabus_files rows point at blobs named by the SHA-256 of their content,
+-- so the same document uploaded to many subjects is stored once. file_blobs
+-- counts the rows referencing each blob; triggers keep the count exact and a
+-- blob is only unlinked once its count drops to zero.
+-- Rows uploaded before this migration keep content_hash NULL until
+-- "python file_store.py backfill" moves their files into the blob store.
+
+ALTER TABLE syllabus_files ADD COLUMN content_hash TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_syllabus_files_content_hash
+    ON syllabus_files(content_hash) WHERE content_hash IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS file_blobs (
+    content_hash TEXT PRIMARY KEY,
+    file_size INTEGER NOT NULL,
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS syllabus_files_blob_ai
+AFTER INSERT ON syllabus_files WHEN NEW.content_hash IS NOT NULL
+BEGIN
+    INSERT INTO file_blobs (content_hash, file_size, ref_count)
+    VALUES (NEW.content_hash, COALESCE(NEW.file_size, 0), 1)
+    ON CONFLICT(content_hash) DO UPDATE SET ref_count = ref_count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS syllabus_files_blob_ad
+AFTER DELETE ON syllabus_files WHEN OLD.content_hash IS NOT NULL
+BEGIN
+    UPDATE file_blobs SET ref_count = ref_count - 1
+    WHERE content_hash = OLD.content_hash;
+END;
+
+CREATE TRIGGER IF NOT EXISTS syllabus_files_blob_au
+AFTER UPDATE OF content_hash ON syllabus_files
+WHEN OLD.content_hash IS NOT NEW.content_hash
+BEGIN
+    UPDATE file_blobs SET ref_count = ref_count - 1
+    WHERE OLD.content_hash IS NOT NULL AND content_hash = OLD.content_hash;
+    INSERT INTO file_blobs (content_hash, file_size, ref_count)
+    SELECT NEW.content_hash, COALESCE(NEW.file_size, 0), 1
+    WHERE NEW.content_hash IS NOT NULL
+    ON CONFLICT(content_hash) DO UPDATE SET ref_count = ref_count + 1;
+END;
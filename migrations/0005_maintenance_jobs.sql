@@ -0,0 +1,19 @@
+-- Scheduling state for background maintenance jobs.
+-- Workers claim a due job with a conditional UPDATE of next_run_at, so only
+-- one process runs it per interval. Incremental jobs keep their resume point
+-- in cursor and their last summary (JSON) in last_report.
+
+CREATE TABLE IF NOT EXISTS maintenance_jobs (
+    name TEXT PRIMARY KEY,
+    next_run_at REAL NOT NULL DEFAULT 0,
+    cursor TEXT,
+    last_run_at REAL,
+    last_report TEXT
+);
+
+INSERT OR IGNORE INTO maintenance_jobs (name) VALUES ('orphaned_files');
+
+-- Orphan cleanup checks top-level uploads against the rows not yet moved
+-- into the blob store
+CREATE INDEX IF NOT EXISTS idx_syllabus_files_legacy_path
+    ON syllabus_files(file_path) WHERE content_hash IS NULL;
@@ -0,0 +1,8 @@
+-- Indexes for the keyset-paginated JSON API (/api/v1).
+-- Each listing is read in (sort column, id) order within its parent, so a
+-- page is a single index range scan starting after the previous page's last
+-- row. The rowid tail of each index supplies the id tie-breaker.
+
+-- Subjects are browsed per semester, optionally narrowed to a specialization
+CREATE INDEX IF NOT EXISTS idx_subjects_semester_active
+    ON subjects(semester_id, name) WHERE is_active = 1;
@@ -0,0 +1,6 @@
+-- Indexes for the paginated admin listings.
+-- The file listing shows the newest uploads first across all subjects, so
+-- a page reads the newest rows from this index instead of sorting every file.
+
+CREATE INDEX IF NOT EXISTS idx_syllabus_files_uploaded
+    ON syllabus_files(uploaded_at);
@@ -0,0 +1,13 @@
+-- Token buckets for login and registration throttling, shared by every
+-- worker process. A bucket holds `tokens` as of `updated_at` (epoch seconds)
+-- and refills lazily on the next attempt; full_at is when it would be full
+-- again, after which the row carries no information and may be purged.
+
+CREATE TABLE IF NOT EXISTS login_throttle (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    full_at REAL NOT NULL
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_login_throttle_full_at ON login_throttle(full_at);
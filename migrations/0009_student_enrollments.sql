@@ -0,0 +1,11 @@
+-- Student enrollments: one active enrollment per student and program, and
+-- the student's own enrollments found by index for the "my syllabus" page.
+-- Drops deactivate the row, so enrollment history is kept.
+
+UPDATE student_enrollments SET is_active = 0
+WHERE is_active = 1 AND id NOT IN (
+    SELECT MAX(id) FROM student_enrollments WHERE is_active = 1 GROUP BY student_id, program_id
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_enrollments_student_program_active
+    ON student_enrollments(student_id, program_id) WHERE is_active = 1;
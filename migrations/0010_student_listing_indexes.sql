@@ -0,0 +1,9 @@
+-- Students API listings filtered by program or specialization walk the
+-- active enrollments of that program/specialization in student id order,
+-- instead of every user.
+
+CREATE INDEX IF NOT EXISTS idx_enrollments_program_student_active
+    ON student_enrollments(program_id, student_id) WHERE is_active = 1;
+
+CREATE INDEX IF NOT EXISTS idx_enrollments_specialization_student_active
+    ON student_enrollments(specialization_id, student_id) WHERE is_active = 1;
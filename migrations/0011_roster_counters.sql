@@ -0,0 +1,75 @@
+-- Counters for the admin dashboard and student roster, kept up to date by
+-- triggers so reading them is a primary-key lookup instead of a COUNT(*)
+-- over users or student_enrollments. Each write adjusts one counter row.
+-- Only active enrollments are counted.
+
+CREATE TABLE IF NOT EXISTS user_role_counts (
+    role TEXT PRIMARY KEY,
+    count INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS program_enrollment_counts (
+    program_id INTEGER PRIMARY KEY,
+    count INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT OR REPLACE INTO user_role_counts (role, count)
+SELECT role, COUNT(*) FROM users WHERE role IS NOT NULL GROUP BY role;
+
+INSERT OR REPLACE INTO program_enrollment_counts (program_id, count)
+SELECT program_id, COUNT(*) FROM student_enrollments
+WHERE is_active = 1 AND program_id IS NOT NULL GROUP BY program_id;
+
+-- Users per role
+CREATE TRIGGER IF NOT EXISTS users_count_ai AFTER INSERT ON users
+WHEN new.role IS NOT NULL
+BEGIN
+    INSERT INTO user_role_counts (role, count) VALUES (new.role, 1)
+    ON CONFLICT(role) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS users_count_ad AFTER DELETE ON users
+WHEN old.role IS NOT NULL
+BEGIN
+    UPDATE user_role_counts SET count = count - 1 WHERE role = old.role;
+END;
+
+CREATE TRIGGER IF NOT EXISTS users_count_au AFTER UPDATE OF role ON users
+WHEN old.role IS NOT new.role
+BEGIN
+    UPDATE user_role_counts SET count = count - 1 WHERE role = old.role;
+    INSERT INTO user_role_counts (role, count) SELECT new.role, 1 WHERE new.role IS NOT NULL
+    ON CONFLICT(role) DO UPDATE SET count = count + 1;
+END;
+
+-- Active enrollments per program
+CREATE TRIGGER IF NOT EXISTS enrollments_count_ai AFTER INSERT ON student_enrollments
+WHEN new.is_active = 1 AND new.program_id IS NOT NULL
+BEGIN
+    INSERT INTO program_enrollment_counts (program_id, count) VALUES (new.program_id, 1)
+    ON CONFLICT(program_id) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS enrollments_count_ad AFTER DELETE ON student_enrollments
+WHEN old.is_active = 1
+BEGIN
+    UPDATE program_enrollment_counts SET count = count - 1 WHERE program_id = old.program_id;
+END;
+
+-- An update that keeps a row active in the same program fires both and nets out
+CREATE TRIGGER IF NOT EXISTS enrollments_count_au_old AFTER UPDATE OF is_active, program_id ON student_enrollments
+WHEN old.is_active = 1
+BEGIN
+    UPDATE program_enrollment_counts SET count = count - 1 WHERE program_id = old.program_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS enrollments_count_au_new AFTER UPDATE OF is_active, program_id ON student_enrollments
+WHEN new.is_active = 1 AND new.program_id IS NOT NULL
+BEGIN
+    INSERT INTO program_enrollment_counts (program_id, count) VALUES (new.program_id, 1)
+    ON CONFLICT(program_id) DO UPDATE SET count = count + 1;
+END;
+
+-- Roster: students by name or email prefix, case-insensitively, in name order
+CREATE INDEX IF NOT EXISTS idx_users_role_name_nocase ON users(role, full_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_users_role_email_nocase ON users(role, email COLLATE NOCASE);
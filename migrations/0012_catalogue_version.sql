@@ -0,0 +1,10 @@
+-- Catalogue version, bumped on every catalogue write and used for cache
+-- invalidation. The row used to be created on first read by catalogue_cache;
+-- reads no longer write, so every database gets the table here.
+
+CREATE TABLE IF NOT EXISTS catalogue_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO catalogue_version (id, version) VALUES (1, 0);
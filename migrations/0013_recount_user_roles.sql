@@ -0,0 +1,8 @@
+-- setup.py used to re-seed the admin with INSERT OR REPLACE, whose implicit
+-- delete does not fire users_count_ad, so every deploy counted the admin
+-- once more. Recount users per role from the table.
+
+DELETE FROM user_role_counts;
+
+INSERT INTO user_role_counts (role, count)
+SELECT role, COUNT(*) FROM users WHERE role IS NOT NULL GROUP BY role;
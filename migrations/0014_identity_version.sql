@@ -0,0 +1,21 @@
+-- Version of the user identities that workers cache (models.UserCache) and
+-- sign into sessions (USER_SESSION_CLAIMS). The triggers bump it whenever an
+-- account is deleted or its role or profile changes, so every worker drops
+-- what it holds, not only the one that made the change.
+
+CREATE TABLE IF NOT EXISTS identity_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO identity_version (id, version) VALUES (1, 0);
+
+CREATE TRIGGER IF NOT EXISTS users_identity_au AFTER UPDATE OF username, email, role, full_name ON users
+BEGIN
+    UPDATE identity_version SET version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS users_identity_ad AFTER DELETE ON users
+BEGIN
+    UPDATE identity_version SET version = version + 1 WHERE id = 1;
+END;
@@ -1,8 +1,28 @@
+from flask import g, has_app_context
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
-from db_config import get_db_connection
+from db_config import get_db_connection, release_request_connection, rollback_request_connection
+from catalogue_cache import cached_catalogue
+import passwords
+import logging
 import os
+import re
+import json
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from markupsafe import Markup, escape
+
+logger = logging.getLogger(__name__)
+
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1024))
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 300))
+# Seconds signed session claims are trusted before the user is reloaded and the claims reissued
+USER_CLAIMS_MAX_AGE = float(os.environ.get('USER_CLAIMS_MAX_AGE', 900))
+
+# Identity columns only; password_hash is never loaded for session users
+USER_COLUMNS = "id, username, email, role, full_name"
 
 class User(UserMixin):
     def __init__(self, id, username, email, role, full_name):
@@ -18,7 +38,7 @@ class User(UserMixin):
             conn = get_db_connection()
             conn.row_factory = sqlite3.Row  # Enable dictionary-like access
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+            cursor.execute(f"SELECT {USER_COLUMNS} FROM users WHERE id = ?", (user_id,))
             user_data = cursor.fetchone()
             cursor.close()
             conn.close()
@@ -33,7 +53,7 @@ class User(UserMixin):
                 )
             return None
         except Exception as e:
-            print(f"Error getting user by ID: {e}")
+            logger.error(f"Error getting user by ID: {e}")
             return None
 
     @staticmethod
@@ -42,7 +62,7 @@ class User(UserMixin):
             conn = get_db_connection()
             conn.row_factory = sqlite3.Row  # Enable dictionary-like access
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
+            cursor.execute(f"SELECT {USER_COLUMNS} FROM users WHERE email = ?", (email,))
             user_data = cursor.fetchone()
             cursor.close()
             conn.close()
@@ -57,13 +77,56 @@ class User(UserMixin):
                 )
             return None
         except Exception as e:
-            print(f"Error getting user by email: {e}")
+            logger.error(f"Error getting user by email: {e}")
             return None
 
+    @staticmethod
+    def authenticate(email, password):
+        """
+        The user with this email and password, or None.
+        The hash is read in the same query as the user, and a hash made under
+        an older hashing policy is replaced once the password has verified.
+        Raises passwords.VerifierBusy when the hashing pool is saturated.
+        """
+        try:
+            conn = get_db_connection()
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT {USER_COLUMNS}, password_hash FROM users WHERE email = ?", (email,))
+            user_data = cursor.fetchone()
+            cursor.close()
+            conn.close()
+            # Verifying takes far longer than any query, and may queue for the
+            # hashing pool, so the connection is not held across it
+            release_request_connection()
+        except Exception as e:
+            logger.error(f"Error authenticating user: {e}")
+            return None
+
+        try:
+            valid = bool(user_data) and passwords.verify_password(user_data['password_hash'], password)
+        except passwords.VerifierBusy:
+            passwords.hasher.record_login('busy')
+            raise
+        passwords.hasher.record_login('success' if valid else 'failure')
+        if not valid:
+            return None
+
+        user = User(
+            id=user_data['id'],
+            username=user_data['username'],
+            email=user_data['email'],
+            role=user_data['role'],
+            full_name=user_data['full_name']
+        )
+        if passwords.needs_rehash(user_data['password_hash']):
+            user.rehash_password(user_data['password_hash'], password)
+        return user
+
     @staticmethod
     def create_user(username, email, password, full_name, role='student'):
         try:
-            password_hash = generate_password_hash(password)
+            password_hash = passwords.hash_password(password)
             conn = get_db_connection()
             cursor = conn.cursor()
             
@@ -75,12 +138,84 @@ class User(UserMixin):
             user_id = cursor.lastrowid
             cursor.close()
             conn.close()
+            user_cache.invalidate(user_id)
             
             return User(id=user_id, username=username, email=email, role=role, full_name=full_name)
         except Exception as e:
-            print(f"Error creating user: {e}")
+            rollback_request_connection()
+            logger.error(f"Error creating user: {e}")
             return None
 
+    def set_password(self, password):
+        try:
+            password_hash = passwords.hash_password(password)
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE users SET password_hash = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (password_hash, self.id)
+            )
+            conn.commit()
+            cursor.close()
+            conn.close()
+            user_cache.invalidate(self.id)
+            return True
+        except Exception as e:
+            rollback_request_connection()
+            logger.error(f"Error setting password: {e}")
+            return False
+
+    def rehash_password(self, old_hash, password):
+        """
+        Store the verified password under the current hashing policy.
+        Skipped if the hash changed meanwhile; a failure only delays the
+        upgrade to the next login.
+        """
+        try:
+            new_hash = passwords.hash_password(password)
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?",
+                (new_hash, self.id, old_hash)
+            )
+            conn.commit()
+            rehashed = cursor.rowcount == 1
+            cursor.close()
+            conn.close()
+            if rehashed:
+                passwords.hasher.record_rehash()
+            return rehashed
+        except Exception as e:
+            rollback_request_connection()
+            logger.error(f"Error rehashing password: {e}")
+            return False
+
+    def to_claims(self):
+        """
+        Identity fields stored in the signed session cookie, with the
+        identity version and time they were issued at so they can expire.
+        """
+        return {
+            'id': self.id,
+            'username': self.username,
+            'email': self.email,
+            'role': self.role,
+            'full_name': self.full_name,
+            'version': current_identity_version(),
+            'issued_at': time.time()
+        }
+
+    @staticmethod
+    def from_claims(claims):
+        return User(
+            id=claims['id'],
+            username=claims['username'],
+            email=claims['email'],
+            role=claims['role'],
+            full_name=claims['full_name']
+        )
+
     def check_password(self, password):
         try:
             conn = get_db_connection()
@@ -92,152 +227,1140 @@ class User(UserMixin):
             conn.close()
             
             if result:
-                return check_password_hash(result['password_hash'], password)
+                return passwords.verify_password(result['password_hash'], password)
             return False
         except Exception as e:
-            print(f"Error checking password: {e}")
+            logger.error(f"Error checking password: {e}")
             return False
 
+def read_identity_version():
+    """
+    Read the identity version (None if it cannot be read). Triggers from
+    migration 0014 bump it whenever any account is deleted or its role or
+    profile changes, in whichever process made the change.
+    """
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT version FROM identity_version WHERE id = 1")
+        row = cursor.fetchone()
+        cursor.close()
+        conn.close()
+        return row[0] if row else None
+    except Exception as e:
+        logger.error(f"Error reading identity version: {e}")
+        return None
+
+def current_identity_version():
+    """The identity version, read at most once per request."""
+    if has_app_context():
+        if '_identity_version' not in g:
+            g._identity_version = read_identity_version()
+        return g._identity_version
+    return read_identity_version()
+
+class UserCache:
+    """
+    Bounded LRU cache of User objects with a time-to-live. Entries are tagged
+    with the identity version they were loaded under, so a user deleted or
+    demoted through any worker is reloaded by every other one.
+    """
+
+    def __init__(self, maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.session_hits = 0
+
+    def get(self, user_id, version):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                user, expires_at, entry_version = entry
+                if expires_at > time.monotonic() and entry_version == version:
+                    self._entries.move_to_end(user_id)
+                    self.hits += 1
+                    return user
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+
+    def put(self, user, version):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[user.id] = (user, time.monotonic() + self.ttl, version)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def record_session_hit(self):
+        with self._lock:
+            self.session_hits += 1
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.session_hits + self.hits + self.misses
+            saved = self.session_hits + self.hits
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'lookups': lookups,
+                'session_hits': self.session_hits,
+                'cache_hits': self.hits,
+                'db_loads': self.misses,
+                'evictions': self.evictions,
+                'db_round_trips_saved': saved,
+                'saved_per_request': round(saved / lookups, 3) if lookups else 0.0
+            }
+
+user_cache = UserCache()
+
+def claims_current(claims, user_id):
+    """Whether session claims are for user_id, younger than USER_CLAIMS_MAX_AGE and of the current identity version."""
+    version = current_identity_version()
+    return (bool(claims) and claims.get('id') == user_id and version is not None
+            and claims.get('version') == version
+            and time.time() - claims.get('issued_at', 0) < USER_CLAIMS_MAX_AGE)
+
+def load_user_identity(user_id, claims=None):
+    """
+    Resolve the logged-in user for Flask-Login.
+    Current signed session claims are used first, then the user cache, and
+    only then the users table; all of them are checked against the identity
+    version, which costs one primary-key read per request.
+    """
+    if claims_current(claims, user_id):
+        user_cache.record_session_hit()
+        return User.from_claims(claims)
+
+    version = current_identity_version()
+    # Without a version nothing can be trusted to be current, so nothing is cached
+    user = user_cache.get(user_id, version) if version is not None else None
+    if user is None:
+        user = User.get_by_id(user_id)
+        if user and version is not None:
+            user_cache.put(user, version)
+    return user
+
+def get_identity_stats():
+    return user_cache.stats()
+
 # Database helper functions
+@cached_catalogue
 def get_programs():
+    conn = get_db_connection()
+    conn.row_factory = sqlite3.Row  # Enable dictionary-like access
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM programs WHERE is_active = 1 ORDER BY name")
+    programs = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    return [dict(program) for program in programs]
+
+@cached_catalogue
+def get_specializations(program_id=None):
+    conn = get_db_connection()
+    conn.row_factory = sqlite3.Row  # Enable dictionary-like access
+    cursor = conn.cursor()
+    if program_id:
+        cursor.execute("SELECT * FROM specializations WHERE program_id = ? AND is_active = 1 ORDER BY name", (program_id,))
+    else:
+        cursor.execute("SELECT * FROM specializations WHERE is_active = 1 ORDER BY name")
+    specializations = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    return [dict(spec) for spec in specializations]
+
+@cached_catalogue
+def get_semesters(program_id=None):
+    conn = get_db_connection()
+    conn.row_factory = sqlite3.Row  # Enable dictionary-like access
+    cursor = conn.cursor()
+    if program_id:
+        cursor.execute("SELECT * FROM semesters WHERE program_id = ? AND is_active = 1 ORDER BY semester_number", (program_id,))
+    else:
+        cursor.execute("SELECT * FROM semesters WHERE is_active = 1 ORDER BY semester_number")
+    semesters = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    return [dict(semester) for semester in semesters]
+
+@cached_catalogue
+def get_subjects(specialization_id=None, semester_id=None):
+    conn = get_db_connection()
+    conn.row_factory = sqlite3.Row  # Enable dictionary-like access
+    cursor = conn.cursor()
+    
+    if specialization_id and semester_id:
+        cursor.execute("""
+            SELECT s.*, sp.name as specialization_name, sem.name as semester_name 
+            FROM subjects s 
+            LEFT JOIN specializations sp ON s.specialization_id = sp.id 
+            LEFT JOIN semesters sem ON s.semester_id = sem.id 
+            WHERE s.specialization_id = ? AND s.semester_id = ? AND s.is_active = 1 
+            ORDER BY s.name
+        """, (specialization_id, semester_id))
+    elif specialization_id:
+        cursor.execute("""
+            SELECT s.*, sp.name as specialization_name, sem.name as semester_name 
+            FROM subjects s 
+            LEFT JOIN specializations sp ON s.specialization_id = sp.id 
+            LEFT JOIN semesters sem ON s.semester_id = sem.id 
+            WHERE s.specialization_id = ? AND s.is_active = 1 
+            ORDER BY s.name
+        """, (specialization_id,))
+    elif semester_id:
+        cursor.execute("""
+            SELECT s.*, sp.name as specialization_name, sem.name as semester_name 
+            FROM subjects s 
+            LEFT JOIN specializations sp ON s.specialization_id = sp.id 
+            LEFT JOIN semesters sem ON s.semester_id = sem.id 
+            WHERE s.semester_id = ? AND s.is_active = 1 
+            ORDER BY s.name
+        """, (semester_id,))
+    else:
+        cursor.execute("""
+            SELECT s.*, sp.name as specialization_name, sem.name as semester_name 
+            FROM subjects s 
+            LEFT JOIN specializations sp ON s.specialization_id = sp.id 
+            LEFT JOIN semesters sem ON s.semester_id = sem.id 
+            WHERE s.is_active = 1 
+            ORDER BY s.name
+        """)
+    
+    subjects = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    return [dict(subject) for subject in subjects]
+
+def get_subject(subject_id):
+    """Get a single active subject by primary key, with its specialization and semester names."""
     try:
         conn = get_db_connection()
-        conn.row_factory = sqlite3.Row  # Enable dictionary-like access
+        conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM programs WHERE is_active = 1 ORDER BY name")
-        programs = cursor.fetchall()
+        cursor.execute("""
+            SELECT s.*, sp.name as specialization_name, sem.name as semester_name 
+            FROM subjects s 
+            LEFT JOIN specializations sp ON s.specialization_id = sp.id 
+            LEFT JOIN semesters sem ON s.semester_id = sem.id 
+            WHERE s.id = ? AND s.is_active = 1
+        """, (subject_id,))
+        subject = cursor.fetchone()
         cursor.close()
         conn.close()
-        return [dict(program) for program in programs]
+        return dict(subject) if subject else None
     except Exception as e:
-        print(f"Error getting programs: {e}")
-        return []
+        logger.error(f"Error getting subject: {e}")
+        return None
 
-def get_specializations(program_id=None):
+def get_subject_detail(subject_id):
+    """
+    Get a subject with its units and files in a single query.
+    Units and files are aggregated with SQLite's JSON functions, so the
+    cost does not depend on the size of the rest of the catalogue.
+    Returns:
+        dict: the subject row plus 'units' and 'files', or None
+    """
     try:
         conn = get_db_connection()
-        conn.row_factory = sqlite3.Row  # Enable dictionary-like access
+        conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
-        if program_id:
-            cursor.execute("SELECT * FROM specializations WHERE program_id = ? AND is_active = 1 ORDER BY name", (program_id,))
-        else:
-            cursor.execute("SELECT * FROM specializations WHERE is_active = 1 ORDER BY name")
-        specializations = cursor.fetchall()
+        cursor.execute("""
+            SELECT s.*, sp.name as specialization_name, sem.name as semester_name,
+                (SELECT json_group_array(json_object(
+                        'id', u.id, 'subject_id', u.subject_id, 'unit_number', u.unit_number,
+                        'title', u.title, 'description', u.description, 'topics', u.topics,
+                        'hours_allocated', u.hours_allocated, 'is_active', u.is_active,
+                        'created_at', u.created_at))
+                 FROM (SELECT * FROM units
+                       WHERE subject_id = s.id AND is_active = 1
+                       ORDER BY unit_number) u) AS units_json,
+                (SELECT json_group_array(json_object(
+                        'id', f.id, 'subject_id', f.subject_id, 'filename', f.filename,
+                        'original_filename', f.original_filename, 'file_path', f.file_path,
+                        'file_size', f.file_size, 'file_type', f.file_type,
+                        'uploaded_by', f.uploaded_by, 'uploaded_at', f.uploaded_at,
+                        'uploaded_by_name', f.uploaded_by_name))
+                 FROM (SELECT sf.*, usr.username as uploaded_by_name
+                       FROM syllabus_files sf
+                       LEFT JOIN users usr ON sf.uploaded_by = usr.id
+                       WHERE sf.subject_id = s.id
+                       ORDER BY sf.uploaded_at DESC) f) AS files_json
+            FROM subjects s
+            LEFT JOIN specializations sp ON s.specialization_id = sp.id
+            LEFT JOIN semesters sem ON s.semester_id = sem.id
+            WHERE s.id = ? AND s.is_active = 1
+        """, (subject_id,))
+        row = cursor.fetchone()
+        cursor.close()
+        conn.close()
+        if not row:
+            return None
+        subject = dict(row)
+        subject['units'] = json.loads(subject.pop('units_json'))
+        subject['files'] = json.loads(subject.pop('files_json'))
+        return subject
+    except Exception as e:
+        logger.error(f"Error getting subject detail: {e}")
+        return None
+
+@cached_catalogue
+def get_units(subject_id):
+    conn = get_db_connection()
+    conn.row_factory = sqlite3.Row  # Enable dictionary-like access
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM units WHERE subject_id = ? AND is_active = 1 ORDER BY unit_number", (subject_id,))
+    units = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    return [dict(unit) for unit in units]
+
+def get_syllabus_files(subject_id):
+    try:
+        conn = get_db_connection()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT sf.*, u.username as uploaded_by_name 
+            FROM syllabus_files sf
+            LEFT JOIN users u ON sf.uploaded_by = u.id
+            WHERE sf.subject_id = ?
+            ORDER BY sf.uploaded_at DESC
+        """, (subject_id,))
+        files = [dict(row) for row in cursor.fetchall()]
         cursor.close()
         conn.close()
-        return [dict(spec) for spec in specializations]
+        return files
     except Exception as e:
-        print(f"Error getting specializations: {e}")
+        logger.error(f"Error getting syllabus files: {e}")
         return []
 
-def get_semesters(program_id=None):
+def get_syllabus_file(file_id):
+    """
+    Get the metadata needed to serve one uploaded file.
+    Returns:
+        dict or None
+    """
     try:
         conn = get_db_connection()
-        conn.row_factory = sqlite3.Row  # Enable dictionary-like access
+        conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
-        if program_id:
-            cursor.execute("SELECT * FROM semesters WHERE program_id = ? AND is_active = 1 ORDER BY semester_number", (program_id,))
-        else:
-            cursor.execute("SELECT * FROM semesters WHERE is_active = 1 ORDER BY semester_number")
-        semesters = cursor.fetchall()
+        cursor.execute("""
+            SELECT id, file_path, original_filename, file_type, file_size,
+                   uploaded_by, content_hash
+            FROM syllabus_files
+            WHERE id = ?
+        """, (file_id,))
+        row = cursor.fetchone()
         cursor.close()
         conn.close()
-        return [dict(semester) for semester in semesters]
+        return dict(row) if row else None
     except Exception as e:
-        print(f"Error getting semesters: {e}")
+        logger.error(f"Error getting syllabus file: {e}")
+        return None
+
+
+USER_ROLES = ('admin', 'student')
+
+def get_user_counts():
+    """
+    Get the number of users per role from the trigger-maintained counters.
+    Returns:
+        dict: role -> count
+    """
+    counts = dict.fromkeys(USER_ROLES, 0)
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT role, count FROM user_role_counts WHERE role IN ({', '.join('?' * len(USER_ROLES))})",
+                       USER_ROLES)
+        counts.update(cursor.fetchall())
+        cursor.close()
+        conn.close()
+    except Exception as e:
+        logger.error(f"Error getting user counts: {e}")
+    return counts
+
+def get_total_users():
+    """
+    Get the total number of registered users.
+    Returns:
+        int: Total number of users
+    """
+    return sum(get_user_counts().values())
+
+def get_enrollment_counts():
+    """
+    Get the number of active enrollments in each active program, from the
+    trigger-maintained counters.
+    Returns:
+        list: dicts with id, name, code and enrollments, ordered by name
+    """
+    try:
+        conn = get_db_connection()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT p.id, p.name, p.code, COALESCE(c.count, 0) AS enrollments
+            FROM programs p
+            LEFT JOIN program_enrollment_counts c ON c.program_id = p.id
+            WHERE p.is_active = 1
+            ORDER BY p.name
+        """)
+        counts = [dict(row) for row in cursor.fetchall()]
+        cursor.close()
+        conn.close()
+        return counts
+    except Exception as e:
+        logger.error(f"Error getting enrollment counts: {e}")
         return []
 
-def get_subjects(specialization_id=None, semester_id=None):
+# Admin student roster
+ROSTER_PAGE_SIZE = 50
+ROSTER_MAX_PAGE_SIZE = 200
+
+def _like_prefix(text):
+    """LIKE pattern matching values that start with text, wildcards escaped."""
+    return re.sub(r'([\\%_])', r'\\\1', text) + '%'
+
+def get_student_roster(search=None, after=None, limit=ROSTER_PAGE_SIZE):
+    """
+    Read one page of students in name order, optionally only those whose
+    name or email starts with `search` (case-insensitively). Both searches
+    and the keyset seek run on the NOCASE role indexes, so deep pages and
+    large rosters cost the same as the first page.
+    Args:
+        after: [full_name, id] of the previous page's last student
+    Returns:
+        tuple: (rows, next_key) where next_key is None on the last page
+    Raises:
+        ValueError: malformed key
+    """
+    if after is not None and (len(after) != 2 or not isinstance(after[0], str) or not isinstance(after[1], int)):
+        raise ValueError("Malformed cursor")
+    where = ["u.role = 'student'"]
+    params = []
+    search = (search or '').strip()
+    if search:
+        where.append("(u.full_name LIKE ? ESCAPE '\\' OR u.email LIKE ? ESCAPE '\\')")
+        params += [_like_prefix(search)] * 2
+    if after is not None:
+        where.append("u.full_name COLLATE NOCASE >= ? AND (u.full_name COLLATE NOCASE > ? OR u.id > ?)")
+        params += [after[0], after[0], after[1]]
+
+    conn = get_db_connection()
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT u.id, u.username, u.email, u.full_name, u.created_at,
+                (SELECT json_group_array(json_object(
+                        'program_id', e.program_id, 'program_name', p.name,
+                        'specialization_id', e.specialization_id, 'specialization_name', sp.name))
+                 FROM student_enrollments e
+                 JOIN programs p ON p.id = e.program_id
+                 LEFT JOIN specializations sp ON sp.id = e.specialization_id
+                 WHERE e.student_id = u.id AND e.is_active = 1) AS enrollments_json
+            FROM users u
+            WHERE {' AND '.join(where)}
+            ORDER BY u.full_name COLLATE NOCASE, u.id
+            LIMIT ?
+        """, params + [limit + 1])
+        rows = [dict(row) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+    for row in rows:
+        row['enrollments'] = json.loads(row.pop('enrollments_json'))
+    next_key = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_key = [rows[-1]['full_name'], rows[-1]['id']]
+    return rows, next_key
+
+def delete_student_account(student_id):
+    """Delete a student account and its enrollments. Returns True if it existed."""
     try:
         conn = get_db_connection()
-        conn.row_factory = sqlite3.Row  # Enable dictionary-like access
-        cursor = conn.cursor()
-        
-        if specialization_id and semester_id:
-            cursor.execute("""
-                SELECT s.*, sp.name as specialization_name, sem.name as semester_name 
-                FROM subjects s 
-                LEFT JOIN specializations sp ON s.specialization_id = sp.id 
-                LEFT JOIN semesters sem ON s.semester_id = sem.id 
-                WHERE s.specialization_id = ? AND s.semester_id = ? AND s.is_active = 1 
-                ORDER BY s.name
-            """, (specialization_id, semester_id))
-        elif specialization_id:
-            cursor.execute("""
-                SELECT s.*, sp.name as specialization_name, sem.name as semester_name 
-                FROM subjects s 
-                LEFT JOIN specializations sp ON s.specialization_id = sp.id 
-                LEFT JOIN semesters sem ON s.semester_id = sem.id 
-                WHERE s.specialization_id = ? AND s.is_active = 1 
-                ORDER BY s.name
-            """, (specialization_id,))
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM student_enrollments WHERE student_id = ?", (student_id,))
+        cursor.execute("DELETE FROM users WHERE id = ? AND role = 'student'", (student_id,))
+        deleted = cursor.rowcount == 1
+        if deleted:
+            conn.commit()
         else:
-            cursor.execute("""
-                SELECT s.*, sp.name as specialization_name, sem.name as semester_name 
-                FROM subjects s 
-                LEFT JOIN specializations sp ON s.specialization_id = sp.id 
-                LEFT JOIN semesters sem ON s.semester_id = sem.id 
-                WHERE s.is_active = 1 
-                ORDER BY s.name
-            """)
-        
-        subjects = cursor.fetchall()
+            conn.rollback()
         cursor.close()
         conn.close()
-        return [dict(subject) for subject in subjects]
+        user_cache.invalidate(student_id)
+        return deleted
     except Exception as e:
-        print(f"Error getting subjects: {e}")
-        return []
+        logger.error(f"Error deleting student: {e}")
+        return False
 
-def get_units(subject_id):
+# Student enrollments and the per-student syllabus
+
+def get_student_enrollments(student_id):
+    """
+    Get a student's active enrollments with their program and specialization.
+    Returns:
+        list: enrollment dicts with program and specialization names
+    """
     try:
         conn = get_db_connection()
-        conn.row_factory = sqlite3.Row  # Enable dictionary-like access
+        conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM units WHERE subject_id = ? AND is_active = 1 ORDER BY unit_number", (subject_id,))
-        units = cursor.fetchall()
+        cursor.execute("""
+            SELECT e.id, e.student_id, e.program_id, e.specialization_id, e.enrollment_date,
+                   p.name as program_name, p.code as program_code,
+                   sp.name as specialization_name, sp.code as specialization_code
+            FROM student_enrollments e
+            JOIN programs p ON e.program_id = p.id
+            LEFT JOIN specializations sp ON e.specialization_id = sp.id
+            WHERE e.student_id = ? AND e.is_active = 1
+            ORDER BY p.name
+        """, (student_id,))
+        enrollments = [dict(row) for row in cursor.fetchall()]
         cursor.close()
         conn.close()
-        return [dict(unit) for unit in units]
+        return enrollments
     except Exception as e:
-        print(f"Error getting units: {e}")
+        logger.error(f"Error getting student enrollments: {e}")
         return []
 
-def get_syllabus_files(subject_id):
+def _check_enrollment(cursor, program_id, specialization_id):
+    """Error message if the specialization is not an active one of the active program."""
+    cursor.execute("""
+        SELECT 1 FROM specializations sp JOIN programs p ON sp.program_id = p.id
+        WHERE sp.id = ? AND sp.program_id = ? AND sp.is_active = 1 AND p.is_active = 1
+    """, (specialization_id, program_id))
+    if cursor.fetchone() is None:
+        return 'Please choose a specialization of the selected program'
+    return None
+
+def enroll_student(student_id, program_id, specialization_id):
+    """
+    Enroll a student in a program and specialization. An active enrollment
+    in the same program switches to the new specialization.
+    Returns:
+        tuple: (enrollment id or None, error message or None)
+    """
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        error = _check_enrollment(cursor, program_id, specialization_id)
+        if error:
+            cursor.close()
+            conn.close()
+            return None, error
+        cursor.execute("""
+            INSERT INTO student_enrollments (student_id, program_id, specialization_id, enrollment_date)
+            VALUES (?, ?, ?, date('now'))
+            ON CONFLICT(student_id, program_id) WHERE is_active = 1
+            DO UPDATE SET specialization_id = excluded.specialization_id
+            RETURNING id
+        """, (student_id, program_id, specialization_id))
+        enrollment_id = cursor.fetchone()[0]
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return enrollment_id, None
+    except Exception as e:
+        rollback_request_connection()
+        logger.error(f"Error enrolling student: {e}")
+        return None, 'Error saving enrollment. Please try again.'
+
+def update_enrollment(enrollment_id, student_id, specialization_id):
+    """
+    Move one of the student's active enrollments to another specialization of its program.
+    Returns:
+        str: error message, or None on success
+    """
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT program_id FROM student_enrollments WHERE id = ? AND student_id = ? AND is_active = 1",
+            (enrollment_id, student_id)
+        )
+        row = cursor.fetchone()
+        error = 'Enrollment not found' if row is None else _check_enrollment(cursor, row[0], specialization_id)
+        if not error:
+            cursor.execute("UPDATE student_enrollments SET specialization_id = ? WHERE id = ?",
+                           (specialization_id, enrollment_id))
+            conn.commit()
+        cursor.close()
+        conn.close()
+        return error
+    except Exception as e:
+        rollback_request_connection()
+        logger.error(f"Error updating enrollment: {e}")
+        return 'Error saving enrollment. Please try again.'
+
+def drop_enrollment(enrollment_id, student_id):
+    """Deactivate one of the student's enrollments. Returns True if it was active."""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE student_enrollments SET is_active = 0 WHERE id = ? AND student_id = ? AND is_active = 1",
+            (enrollment_id, student_id)
+        )
+        dropped = cursor.rowcount == 1
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return dropped
+    except Exception as e:
+        rollback_request_connection()
+        logger.error(f"Error dropping enrollment: {e}")
+        return False
+
+@cached_catalogue
+def get_program_syllabus(program_id, specialization_id):
+    """
+    Get the syllabus of one program and specialization: every active semester
+    of the program with its subjects, their units and files, in one query.
+    Cached per catalogue version and shared by every student with the same
+    enrollment, so the cost follows the size of this slice, not the catalogue.
+    Returns:
+        list: one dict per (semester, subject), ordered by semester and subject
+        name; semesters without subjects have subject id None
+    """
+    conn = get_db_connection()
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT sem.id as semester_id, sem.semester_number, sem.name as semester_name,
+            s.id, s.name, s.code, s.credits, s.description,
+            (SELECT json_group_array(json_object(
+                    'id', u.id, 'unit_number', u.unit_number, 'title', u.title,
+                    'topics', u.topics, 'hours_allocated', u.hours_allocated))
+             FROM (SELECT * FROM units
+                   WHERE subject_id = s.id AND is_active = 1
+                   ORDER BY unit_number) u) AS units_json,
+            (SELECT json_group_array(json_object(
+                    'id', f.id, 'original_filename', f.original_filename,
+                    'file_size', f.file_size, 'file_type', f.file_type,
+                    'uploaded_at', f.uploaded_at))
+             FROM (SELECT * FROM syllabus_files
+                   WHERE subject_id = s.id
+                   ORDER BY uploaded_at DESC) f) AS files_json
+        FROM semesters sem
+        LEFT JOIN subjects s ON s.semester_id = sem.id AND s.specialization_id = ? AND s.is_active = 1
+        WHERE sem.program_id = ? AND sem.is_active = 1
+        ORDER BY sem.semester_number, s.name
+    """, (specialization_id, program_id))
+    rows = []
+    for row in cursor.fetchall():
+        subject = dict(row)
+        units_json = subject.pop('units_json')
+        files_json = subject.pop('files_json')
+        subject['units'] = json.loads(units_json) if subject['id'] else []
+        subject['files'] = json.loads(files_json) if subject['id'] else []
+        rows.append(subject)
+    cursor.close()
+    conn.close()
+    return rows
+
+# Batched loaders (constant number of queries regardless of catalogue size)
+SQLITE_MAX_VARIABLES = 500
+
+def _chunks(ids, size=SQLITE_MAX_VARIABLES):
+    ids = list(ids)
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+def get_units_by_subject_ids(subject_ids):
+    """
+    Get active units for many subjects at once.
+    Returns:
+        dict: subject_id -> list of units ordered by unit_number
+    """
+    units_by_subject = {subject_id: [] for subject_id in subject_ids}
+    try:
+        conn = get_db_connection()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        for chunk in _chunks(units_by_subject):
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f"""
+                SELECT * FROM units
+                WHERE subject_id IN ({placeholders}) AND is_active = 1
+                ORDER BY subject_id, unit_number
+            """, chunk)
+            for row in cursor.fetchall():
+                units_by_subject[row['subject_id']].append(dict(row))
+        cursor.close()
+        conn.close()
+    except Exception as e:
+        logger.error(f"Error getting units by subject ids: {e}")
+    return units_by_subject
+
+def get_syllabus_files_by_subject_ids(subject_ids):
+    """
+    Get syllabus files for many subjects at once.
+    Returns:
+        dict: subject_id -> list of files, newest first
+    """
+    files_by_subject = {subject_id: [] for subject_id in subject_ids}
+    try:
+        conn = get_db_connection()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        for chunk in _chunks(files_by_subject):
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f"""
+                SELECT sf.*, u.username as uploaded_by_name
+                FROM syllabus_files sf
+                LEFT JOIN users u ON sf.uploaded_by = u.id
+                WHERE sf.subject_id IN ({placeholders})
+                ORDER BY sf.subject_id, sf.uploaded_at DESC
+            """, chunk)
+            for row in cursor.fetchall():
+                files_by_subject[row['subject_id']].append(dict(row))
+        cursor.close()
+        conn.close()
+    except Exception as e:
+        logger.error(f"Error getting syllabus files by subject ids: {e}")
+    return files_by_subject
+
+def get_dashboard_stats():
+    """
+    Get all dashboard counters: the catalogue ones in a single query, users
+    from the trigger-maintained counters.
+    Units and files are only counted for active subjects, matching what the
+    per-subject listings show.
+    Returns:
+        dict: programs, specializations, subjects, units, files, users counts
+    """
+    stats = dict.fromkeys(('programs', 'specializations', 'subjects', 'units', 'files', 'users'), 0)
     try:
         conn = get_db_connection()
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         cursor.execute("""
-            SELECT sf.*, u.username as uploaded_by_name 
-            FROM syllabus_files sf
-            LEFT JOIN users u ON sf.uploaded_by = u.id
-            WHERE sf.subject_id = ?
-            ORDER BY sf.uploaded_at DESC
-        """, (subject_id,))
-        files = [dict(row) for row in cursor.fetchall()]
+            SELECT
+                (SELECT COUNT(*) FROM programs WHERE is_active = 1) AS programs,
+                (SELECT COUNT(*) FROM specializations WHERE is_active = 1) AS specializations,
+                (SELECT COUNT(*) FROM subjects WHERE is_active = 1) AS subjects,
+                (SELECT COUNT(*) FROM units u JOIN subjects s ON u.subject_id = s.id
+                  WHERE u.is_active = 1 AND s.is_active = 1) AS units,
+                (SELECT COUNT(*) FROM syllabus_files sf JOIN subjects s ON sf.subject_id = s.id
+                  WHERE s.is_active = 1) AS files
+        """)
+        stats.update(dict(cursor.fetchone()))
         cursor.close()
         conn.close()
-        return files
+        stats['users'] = get_total_users()
     except Exception as e:
-        print(f"Error getting syllabus files: {e}")
-        return []
+        logger.error(f"Error getting dashboard stats: {e}")
+    return stats
 
+# Keyset-paginated listings for the JSON API
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
 
-def get_total_users():
+# Per listing: the parent filters, the sort key (ending in id, so it is
+# unique) and the selectable fields. Default fields are plain columns;
+# the others are only computed when asked for.
+CATALOGUE_LISTINGS = {
+    'programs': {
+        'table': 'programs',
+        'filters': (),
+        'order': ('name', 'id'),
+        'fields': {
+            'id': 't.id', 'name': 't.name', 'code': 't.code',
+            'description': 't.description', 'duration_years': 't.duration_years',
+        },
+        'extra_fields': {
+            'specialization_count': "(SELECT COUNT(*) FROM specializations WHERE program_id = t.id AND is_active = 1)",
+            'semester_count': "(SELECT COUNT(*) FROM semesters WHERE program_id = t.id AND is_active = 1)",
+        },
+    },
+    'specializations': {
+        'table': 'specializations',
+        'filters': ('program_id',),
+        'order': ('name', 'id'),
+        'fields': {
+            'id': 't.id', 'program_id': 't.program_id', 'name': 't.name',
+            'code': 't.code', 'description': 't.description',
+        },
+        'extra_fields': {},
+    },
+    'semesters': {
+        'table': 'semesters',
+        'filters': ('program_id',),
+        'order': ('semester_number', 'id'),
+        'fields': {
+            'id': 't.id', 'program_id': 't.program_id',
+            'semester_number': 't.semester_number', 'name': 't.name',
+        },
+        'extra_fields': {
+            'subject_count': "(SELECT COUNT(*) FROM subjects WHERE semester_id = t.id AND is_active = 1)",
+        },
+    },
+    'subjects': {
+        'table': 'subjects',
+        'filters': ('semester_id', 'specialization_id'),
+        'order': ('name', 'id'),
+        'fields': {
+            'id': 't.id', 'name': 't.name', 'code': 't.code', 'credits': 't.credits',
+            'description': 't.description', 'specialization_id': 't.specialization_id',
+            'semester_id': 't.semester_id',
+        },
+        'extra_fields': {
+            'specialization_name': "(SELECT name FROM specializations WHERE id = t.specialization_id)",
+            'semester_name': "(SELECT name FROM semesters WHERE id = t.semester_id)",
+            'unit_count': "(SELECT COUNT(*) FROM units WHERE subject_id = t.id AND is_active = 1)",
+        },
+    },
+    'units': {
+        'table': 'units',
+        'filters': ('subject_id',),
+        'order': ('unit_number', 'id'),
+        'fields': {
+            'id': 't.id', 'subject_id': 't.subject_id', 'unit_number': 't.unit_number',
+            'title': 't.title', 'description': 't.description', 'topics': 't.topics',
+            'hours_allocated': 't.hours_allocated',
+        },
+        'extra_fields': {},
+    },
+}
+
+def get_catalogue_page(listing, filters=None, after=None, limit=API_PAGE_SIZE, fields=None):
     """
-    Get the total number of registered users.
+    Read one page of an active catalogue listing in sort-key order.
+    after is the sort key of the previous page's last row; the page starts
+    right after it, so deep pages cost the same as the first one.
+    Args:
+        listing: a CATALOGUE_LISTINGS key
+        filters: {column: value} for the listing's parent filters (None values are ignored)
+        fields: field names to return (default: the listing's plain columns)
     Returns:
-        int: Total number of users
+        tuple: (rows, next_key) where next_key is None on the last page
+    Raises:
+        ValueError: unknown field or malformed key
     """
+    spec = CATALOGUE_LISTINGS[listing]
+    available = {**spec['fields'], **spec['extra_fields']}
+    fields = list(fields or spec['fields'])
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise ValueError(f"Unknown field(s) for {listing}: {', '.join(unknown)}")
+    order = spec['order']
+    if after is not None and len(after) != len(order):
+        raise ValueError("Malformed cursor")
+
+    where = ['t.is_active = 1']
+    params = []
+    for column in spec['filters']:
+        value = (filters or {}).get(column)
+        if value is not None:
+            where.append(f't.{column} = ?')
+            params.append(value)
+    if after is not None:
+        where.append(f"({', '.join('t.' + c for c in order)}) > ({', '.join('?' * len(order))})")
+        params.extend(after)
+
+    # Sort key columns are always selected so the next cursor can be built
+    select = [f'{available[name]} AS {name}' for name in fields]
+    select += [f't.{column} AS _key_{column}' for column in order]
+    sql = f"""
+        SELECT {', '.join(select)} FROM {spec['table']} t
+        WHERE {' AND '.join(where)}
+        ORDER BY {', '.join('t.' + c for c in order)}
+        LIMIT ?
+    """
+    params.append(limit + 1)
+
+    conn = get_db_connection()
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+    next_key = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_key = [rows[-1][f'_key_{column}'] for column in order]
+    return [{name: row[name] for name in fields} for row in rows], next_key
+
+# Paginated admin listings
+ADMIN_PER_PAGE = 50
+ADMIN_FILTERS = ('program_id', 'specialization_id', 'semester_id', 'subject_id')
+
+# Per listing: one JOIN query for the page, a narrower one for the count,
+# the condition each filter applies and the allowed sort keys. Sorts end in
+# the row id so pages never overlap.
+PROGRAM_FILTER = 's.specialization_id IN (SELECT id FROM specializations WHERE program_id = ?)'
+ADMIN_LISTINGS = {
+    'subjects': {
+        'from': """subjects s
+            LEFT JOIN specializations sp ON sp.id = s.specialization_id
+            LEFT JOIN semesters sem ON sem.id = s.semester_id""",
+        'count_from': "subjects s",
+        'columns': "s.*, sp.name AS specialization_name, sem.name AS semester_name",
+        'where': "s.is_active = 1",
+        'filters': {'program_id': PROGRAM_FILTER, 'specialization_id': 's.specialization_id',
+                    'semester_id': 's.semester_id'},
+        'sorts': {'name': ('s.name',), 'code': ('s.code',), 'credits': ('s.credits',),
+                  'semester': ('sem.semester_number',)},
+        'id': 's.id',
+        'default_sort': 'name',
+    },
+    'units': {
+        'from': """units u
+            JOIN subjects s ON s.id = u.subject_id
+            LEFT JOIN specializations sp ON sp.id = s.specialization_id""",
+        'count_from': "units u JOIN subjects s ON s.id = u.subject_id",
+        'columns': "u.*, s.name AS subject_name, s.code AS subject_code",
+        'where': "u.is_active = 1 AND s.is_active = 1",
+        'filters': {'program_id': PROGRAM_FILTER, 'specialization_id': 's.specialization_id',
+                    'semester_id': 's.semester_id', 'subject_id': 'u.subject_id'},
+        # Grouping by subject id keeps same-named subjects' units apart
+        'sorts': {'subject': ('s.name', 's.id', 'u.unit_number'), 'unit_number': ('u.unit_number',),
+                  'title': ('u.title',), 'hours': ('u.hours_allocated',)},
+        'id': 'u.id',
+        'default_sort': 'subject',
+    },
+    'files': {
+        'from': """syllabus_files f
+            JOIN subjects s ON s.id = f.subject_id
+            LEFT JOIN specializations sp ON sp.id = s.specialization_id
+            LEFT JOIN semesters sem ON sem.id = s.semester_id
+            LEFT JOIN users usr ON usr.id = f.uploaded_by""",
+        'count_from': "syllabus_files f JOIN subjects s ON s.id = f.subject_id",
+        'columns': """f.*, s.name AS subject_name, sp.name AS specialization_name,
+            sem.name AS semester_name, usr.username AS uploaded_by_name""",
+        'where': "s.is_active = 1",
+        'filters': {'program_id': PROGRAM_FILTER, 'specialization_id': 's.specialization_id',
+                    'semester_id': 's.semester_id', 'subject_id': 'f.subject_id'},
+        'sorts': {'uploaded_at': ('f.uploaded_at',), 'name': ('f.original_filename',),
+                  'size': ('f.file_size',), 'subject': ('s.name', 's.id')},
+        'id': 'f.id',
+        'default_sort': '-uploaded_at',
+    },
+}
+
+def get_admin_listing(listing, filters=None, sort=None, page=1, per_page=ADMIN_PER_PAGE):
+    """
+    Read one page of an admin listing with a single JOIN query (plus a count).
+    Args:
+        filters: {name: id} for any of ADMIN_FILTERS the listing supports
+        sort: a sort key from the listing, prefixed with '-' for descending
+    Returns:
+        dict: rows, page, per_page, total, pages, has_next, sort
+    """
+    spec = ADMIN_LISTINGS[listing]
+    if not sort or sort.lstrip('-') not in spec['sorts']:
+        sort = spec['default_sort']
+    direction = 'DESC' if sort.startswith('-') else 'ASC'
+    order = [f'{column} {direction}' for column in spec['sorts'][sort.lstrip('-')] + (spec['id'],)]
+
+    where = [spec['where']]
+    params = []
+    for name, condition in spec['filters'].items():
+        value = (filters or {}).get(name)
+        if value is not None:
+            where.append(condition if '?' in condition else f'{condition} = ?')
+            params.append(value)
+    where_sql = ' AND '.join(where)
+
+    page = max(1, int(page))
+    response = {'rows': [], 'page': page, 'per_page': per_page, 'total': 0, 'pages': 1,
+                'has_next': False, 'sort': sort}
+    try:
+        conn = get_db_connection()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT COUNT(*) FROM {spec['count_from']} WHERE {where_sql}", params)
+        response['total'] = cursor.fetchone()[0]
+        cursor.execute(f"""
+            SELECT {spec['columns']} FROM {spec['from']}
+            WHERE {where_sql}
+            ORDER BY {', '.join(order)}
+            LIMIT ? OFFSET ?
+        """, params + [per_page, (page - 1) * per_page])
+        response['rows'] = [dict(row) for row in cursor.fetchall()]
+        cursor.close()
+        conn.close()
+    except Exception as e:
+        logger.error(f"Error getting admin {listing} listing: {e}")
+        return response
+
+    response['pages'] = max(1, -(-response['total'] // per_page))
+    response['has_next'] = page < response['pages']
+    return response
+
+# Full-text search
+SEARCH_PER_PAGE = 20
+SEARCH_MIN_PREFIX = 3
+SEARCH_SNIPPET_WORDS = 16
+
+def _search_words(text):
+    return re.findall(r'\w+', text or '')
+
+def build_search_query(text):
+    """
+    Turn free text into an FTS5 query: every word must match, and the last
+    word also matches as a prefix (as-you-type) once it has SEARCH_MIN_PREFIX
+    characters.
+    """
+    words = _search_words(text)
+    terms = [f'"{word}"' for word in words]
+    if words and len(words[-1]) >= SEARCH_MIN_PREFIX:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+def _match_pattern(text):
+    """Regex matching the query words the same way build_search_query does."""
+    words = _search_words(text)
+    alternatives = [re.escape(word) + r'\b' for word in words]
+    if words and len(words[-1]) >= SEARCH_MIN_PREFIX:
+        alternatives[-1] = re.escape(words[-1]) + r'\w*'
+    return re.compile(r'\b(?:' + '|'.join(alternatives) + ')', re.IGNORECASE)
+
+def _highlight_html(text, pattern):
+    """Escape text and wrap query matches in <mark> tags."""
+    text = text or ''
+    parts = []
+    last = 0
+    for match in pattern.finditer(text):
+        parts.append(escape(text[last:match.start()]))
+        parts.append(Markup('<mark>%s</mark>') % match.group(0))
+        last = match.end()
+    parts.append(escape(text[last:]))
+    return Markup('').join(parts)
+
+def _snippet_html(fields, pattern, width=SEARCH_SNIPPET_WORDS):
+    """A short highlighted window around the first match in the first matching field."""
+    text = next((field for field in fields if field and pattern.search(field)),
+                next((field for field in fields if field), ''))
+    words = text.split()
+    first = next((i for i, word in enumerate(words) if pattern.search(word)), 0)
+    start = max(0, min(first - width // 2, len(words) - width))
+    end = min(len(words), start + width)
+    snippet = _highlight_html(' '.join(words[start:end]), pattern)
+    return Markup('%s%s%s') % ('…' if start > 0 else '', snippet, '…' if end < len(words) else '')
+
+@contextmanager
+def search_triggers_suspended(cursor):
+    """
+    Drop the search index triggers for the rest of the caller's transaction.
+    FTS5 flushes a segment for every trigger-driven row, so bulk loads run
+    without the triggers and call rebuild_search_index() afterwards. The
+    triggers are recreated before the transaction commits.
+    """
+    cursor.execute("""
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'trigger' AND name LIKE '%\\_search\\_%' ESCAPE '\\'
+    """)
+    triggers = cursor.fetchall()
+    if not cursor.connection.in_transaction:
+        cursor.execute("BEGIN")
+    for name, _ in triggers:
+        cursor.execute(f"DROP TRIGGER {name}")
+    try:
+        yield
+    finally:
+        for _, sql in triggers:
+            cursor.execute(sql)
+
+def rebuild_search_index(cursor):
+    """Repopulate the full-text index from the active subjects and units."""
+    cursor.execute("DELETE FROM catalogue_search")
+    cursor.execute("""
+        INSERT INTO catalogue_search (rowid, subject_id, title, code, description, topics)
+        SELECT id * 2, id, name, code, description, NULL
+        FROM subjects WHERE is_active = 1
+        ORDER BY id
+    """)
+    cursor.execute("""
+        INSERT INTO catalogue_search (rowid, subject_id, title, code, description, topics)
+        SELECT u.id * 2 + 1, u.subject_id, u.title, NULL, u.description, u.topics
+        FROM units u JOIN subjects s ON s.id = u.subject_id
+        WHERE u.is_active = 1 AND s.is_active = 1
+        ORDER BY u.id
+    """)
+    cursor.execute("INSERT INTO catalogue_search (catalogue_search) VALUES ('optimize')")
+
+def search_catalogue(text, page=1, per_page=SEARCH_PER_PAGE):
+    """
+    Search active subjects and units, best BM25 matches first.
+    Every match is ranked, but FTS5 only keeps the top of the order for the
+    requested page, so broad queries cost a scan rather than a full sort.
+    Returns:
+        dict: results (list), page, per_page, has_next
+    """
+    page = max(1, int(page))
+    response = {'results': [], 'page': page, 'per_page': per_page, 'has_next': False}
+    fts_query = build_search_query(text)
+    if not fts_query:
+        return response
     try:
         conn = get_db_connection()
+        conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) as count FROM users")
-        result = cursor.fetchone()
+        cursor.execute("""
+            SELECT rowid FROM catalogue_search
+            WHERE catalogue_search MATCH ?
+            ORDER BY rank
+            LIMIT ? OFFSET ?
+        """, (fts_query, per_page + 1, (page - 1) * per_page))
+        rowids = [row[0] for row in cursor.fetchall()]
+        response['has_next'] = len(rowids) > per_page
+        rowids = rowids[:per_page]
+
+        # Only the rows on this page are fetched for display
+        hits = {}
+        if rowids:
+            placeholders = ','.join('?' * len(rowids))
+            cursor.execute(f"""
+                SELECT cs.rowid, cs.subject_id, cs.title, cs.code, cs.description, cs.topics,
+                       s.name AS subject_name, s.code AS subject_code
+                FROM catalogue_search cs
+                JOIN subjects s ON s.id = cs.subject_id
+                WHERE cs.rowid IN ({placeholders})
+            """, rowids)
+            hits = {row['rowid']: row for row in cursor.fetchall()}
         cursor.close()
         conn.close()
-        return result[0] if result else 0
     except Exception as e:
-        print(f"Error getting total users: {e}")
-        return 0
\ No newline at end of file
+        logger.error(f"Error searching catalogue: {e}")
+        return response
+
+    pattern = _match_pattern(text)
+    for rowid in rowids:
+        row = hits.get(rowid)
+        if row is None:
+            continue
+        response['results'].append({
+            'kind': 'subject' if rowid % 2 == 0 else 'unit',
+            'id': rowid // 2,
+            'subject_id': row['subject_id'],
+            'subject_name': row['subject_name'],
+            'subject_code': row['subject_code'],
+            'title': _highlight_html(row['title'], pattern),
+            'snippet': _snippet_html((row['description'], row['topics'], row['title'], row['code']), pattern)
+        })
+    return response
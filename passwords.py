@@ -0,0 +1,244 @@
+"""
+Password hashing for Syllabus Management System.
+
+PASSWORD_HASH_METHOD is the hashing policy: a werkzeug method string with its
+cost, e.g. "pbkdf2:sha256:600000" or "scrypt:32768:8:1". Hashes written under
+an older policy still verify and are replaced under the current one the next
+time their user logs in, so raising the cost needs no migration.
+
+Hashing is CPU-bound. With PASSWORD_VERIFY_WORKERS > 0 it runs on a bounded
+thread (or process) pool instead of the request thread; hashlib releases the
+GIL while hashing, so threads hash in parallel. At most PASSWORD_VERIFY_QUEUE
+hashes wait for a free worker; beyond that, or after PASSWORD_VERIFY_TIMEOUT,
+VerifierBusy is raised and the login is turned away instead of queueing
+behind a login storm.
+
+Under gevent workers a pool thread is a greenlet too, so every hash, pooled
+or inline, is handed to serving.offload() and runs on a native thread.
+"""
+
+import os
+import threading
+import time
+from collections import Counter
+from functools import partial
+from itertools import repeat
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+from serving import offload
+
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', f'pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}')
+PASSWORD_SALT_LENGTH = 16
+PASSWORD_VERIFY_WORKERS = int(os.environ.get('PASSWORD_VERIFY_WORKERS', 0))  # 0 hashes on the request thread
+PASSWORD_VERIFY_EXECUTOR = os.environ.get('PASSWORD_VERIFY_EXECUTOR', 'thread')  # thread or process
+PASSWORD_VERIFY_QUEUE = int(os.environ.get('PASSWORD_VERIFY_QUEUE', 32))
+PASSWORD_VERIFY_TIMEOUT = float(os.environ.get('PASSWORD_VERIFY_TIMEOUT', 10))
+
+
+class VerifierBusy(Exception):
+    """The hashing pool is saturated; the caller should ask the user to retry."""
+
+
+def normalize_method(method):
+    """The method string werkzeug records in a hash made with `method`, defaults filled in."""
+    name, *args = method.split(':')
+    if name == 'pbkdf2' and len(args) <= 2:
+        hash_name = args[0] if args else 'sha256'
+        iterations = int(args[1]) if len(args) == 2 else DEFAULT_PBKDF2_ITERATIONS
+        return f"pbkdf2:{hash_name}:{iterations}"
+    if name == 'scrypt' and len(args) in (0, 3):
+        n, r, p = map(int, args) if args else (2 ** 15, 8, 1)
+        return f"scrypt:{n}:{r}:{p}"
+    raise ValueError(f"Unsupported password hash method: {method}")
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords under one policy, optionally on a bounded pool."""
+
+    def __init__(self, method=PASSWORD_HASH_METHOD, workers=PASSWORD_VERIFY_WORKERS,
+                 executor=PASSWORD_VERIFY_EXECUTOR, queue=PASSWORD_VERIFY_QUEUE,
+                 timeout=PASSWORD_VERIFY_TIMEOUT):
+        if executor not in ('thread', 'process'):
+            raise ValueError(f"PASSWORD_VERIFY_EXECUTOR must be thread or process, not {executor}")
+        self.method = normalize_method(method)
+        self.workers = workers
+        self.executor = executor
+        self.queue = queue
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+        # One slot per running or waiting hash
+        self._slots = threading.BoundedSemaphore(workers + queue) if workers > 0 else None
+        self.in_flight = 0
+        self.verifications = 0
+        self.verify_seconds = 0.0
+        self.rehashed = 0
+        self.busy = 0
+        self.logins = Counter()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method, PASSWORD_SALT_LENGTH)
+
+    def hash_many(self, passwords):
+        """Hash a batch, e.g. an intake of students, spread over the pool when there is one."""
+        if self._slots is None or not passwords:
+            return [self.hash(password) for password in passwords]
+        # A batch is an admin operation; it is not turned away by the login queue bound
+        return list(self._get_pool().map(partial(offload, generate_password_hash), passwords, repeat(self.method),
+                                         repeat(PASSWORD_SALT_LENGTH), chunksize=64))
+
+    def verify(self, pwhash, password):
+        started = time.perf_counter()
+        valid = self._run(check_password_hash, pwhash, password)
+        with self._lock:
+            self.verifications += 1
+            self.verify_seconds += time.perf_counter() - started
+        return valid
+
+    def needs_rehash(self, pwhash):
+        return pwhash.split('$', 1)[0] != self.method
+
+    def _run(self, func, *args):
+        if self._slots is None:
+            return offload(func, *args)
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.busy += 1
+            raise VerifierBusy("Too many password checks are waiting")
+        with self._lock:
+            self.in_flight += 1
+        try:
+            future = self._get_pool().submit(offload, func, *args)
+        except BaseException:
+            self._done(None)
+            raise
+        # The slot is held until the hash finishes, even if the caller gives up
+        future.add_done_callback(self._done)
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            with self._lock:
+                self.busy += 1
+            raise VerifierBusy("Password check timed out")
+
+    def _done(self, future):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def _get_pool(self):
+        # Pool threads and processes do not survive a fork, so each worker starts its own
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                if self.executor == 'process':
+                    # multiprocessing is only imported by deployments that hash in processes
+                    from concurrent.futures import ProcessPoolExecutor
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers)
+                self._pid = os.getpid()
+            return self._pool
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None and self._pid == os.getpid():
+            pool.shutdown(wait=False)
+
+    def reinit_after_fork(self):
+        """
+        Start over in a forked child: the parent's pool threads are gone and
+        its locks may have been held mid-update at the moment of the fork.
+        """
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+        self.in_flight = 0
+        if self._slots is not None:
+            self._slots = threading.BoundedSemaphore(self.workers + self.queue)
+
+    def record_login(self, result):
+        with self._lock:
+            self.logins[result] += 1
+
+    def record_rehash(self):
+        with self._lock:
+            self.rehashed += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'method': self.method.split(':', 1)[0],
+                'cost': self.method.split(':', 1)[1],
+                'workers': self.workers,
+                'executor': self.executor if self.workers else 'inline',
+                'queue': self.queue,
+                'in_flight': self.in_flight,
+                'verifications': self.verifications,
+                'avg_verify_ms': round(self.verify_seconds / self.verifications * 1000, 2)
+                                 if self.verifications else 0.0,
+                'verify_seconds': round(self.verify_seconds, 6),
+                'rehashed': self.rehashed,
+                'busy': self.busy,
+                'logins': dict(self.logins),
+            }
+
+
+hasher = PasswordHasher()
+_hasher_lock = threading.Lock()
+
+
+def configure(method=None, workers=None, executor=None, queue=None, timeout=None):
+    """Replace the process-wide hasher, e.g. from app config."""
+    global hasher
+    with _hasher_lock:
+        old = hasher
+        hasher = PasswordHasher(
+            method or old.method,
+            old.workers if workers is None else workers,
+            executor or old.executor,
+            old.queue if queue is None else queue,
+            timeout or old.timeout,
+        )
+    old.shutdown()
+    return hasher
+
+
+def reinit_after_fork():
+    global _hasher_lock
+    _hasher_lock = threading.Lock()
+    hasher.reinit_after_fork()
+
+
+os.register_at_fork(after_in_child=reinit_after_fork)
+
+
+def hash_password(password):
+    return hasher.hash(password)
+
+
+def hash_passwords(passwords):
+    return hasher.hash_many(passwords)
+
+
+def verify_password(pwhash, password):
+    return hasher.verify(pwhash, password)
+
+
+def needs_rehash(pwhash):
+    return hasher.needs_rehash(pwhash)
+
+
+def get_password_stats():
+    return hasher.stats()
+
+
+def init_app(app):
+    configure(
+        app.config.get('PASSWORD_HASH_METHOD', PASSWORD_HASH_METHOD),
+        app.config.get('PASSWORD_VERIFY_WORKERS', PASSWORD_VERIFY_WORKERS),
+        app.config.get('PASSWORD_VERIFY_EXECUTOR', PASSWORD_VERIFY_EXECUTOR),
+        app.config.get('PASSWORD_VERIFY_QUEUE', PASSWORD_VERIFY_QUEUE),
+        app.config.get('PASSWORD_VERIFY_TIMEOUT', PASSWORD_VERIFY_TIMEOUT),
+    )
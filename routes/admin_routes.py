@@ -1,24 +1,34 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, send_file, abort
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, send_file, abort, Response, stream_with_context
 from flask_login import login_required, current_user
 from models import (
     get_programs, get_specializations, get_semesters, get_subjects, 
-    get_units, get_syllabus_files, get_total_users, get_db_connection
+    get_units, get_syllabus_files, get_user_counts, get_db_connection,
+    get_units_by_subject_ids, get_syllabus_files_by_subject_ids, get_dashboard_stats,
+    get_syllabus_file, get_admin_listing, ADMIN_FILTERS, get_enrollment_counts,
+    get_student_roster, delete_student_account, ROSTER_PAGE_SIZE, ROSTER_MAX_PAGE_SIZE
 )
+from db_config import rollback_request_connection
+from catalogue_cache import bump_catalogue_version
+from template_cache import Deferred
+from catalogue_io import CATALOGUE_IMPORT_MAX_SIZE, CatalogueImportError, detect_format, export_catalogue, import_catalogue
+from student_io import StudentImportError, import_students
+from routes.api_routes import encode_cursor, decode_cursor
+from routes.student_routes import admin_api_required
+from file_store import MAX_UPLOAD_SIZE, blob_path, release_blob, remove_released_blob, file_cache, send_stored_file
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
 from werkzeug.utils import secure_filename
 import os
 import sqlite3
-import magic
 import logging
 from functools import wraps
 from datetime import datetime
 import shutil
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Configuration
-MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+MAX_FILE_SIZE = MAX_UPLOAD_SIZE
+RECENT_FILES = 10
 ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'txt'}
 ALLOWED_MIME_TYPES = {
     'application/pdf',
@@ -29,7 +39,8 @@ ALLOWED_MIME_TYPES = {
 
 def ensure_upload_dir():
     """Ensure upload directory exists and has correct permissions."""
-    upload_dir = os.path.join(current_app.root_path, 'uploads')
+    # UPLOAD_FOLDER is relative to the app unless it is absolute
+    upload_dir = os.path.join(current_app.root_path, current_app.config['UPLOAD_FOLDER'])
     try:
         os.makedirs(upload_dir, exist_ok=True, mode=0o755)
         return upload_dir
@@ -39,6 +50,12 @@ def ensure_upload_dir():
 
 admin_bp = Blueprint('admin', __name__)
 
+@admin_bp.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    limit = request.content_limit or MAX_FILE_SIZE
+    flash(f'File too large. Maximum size is {limit/1024/1024:g}MB', 'error')
+    return redirect(request.url)
+
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -48,37 +65,32 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def listing_args():
+    """Filters, sort and page of an admin listing from the query string."""
+    filters = {name: request.args.get(name, type=int) for name in ADMIN_FILTERS}
+    return filters, request.args.get('sort'), request.args.get('page', 1, type=int)
+
+def listing_filter_options(filters):
+    """Choices for the filter bar, narrowed by the filters already chosen."""
+    program_id = filters.get('program_id')
+    specialization_id = filters.get('specialization_id')
+    semester_id = filters.get('semester_id')
+    return {
+        'programs': get_programs(),
+        'specializations': get_specializations(program_id),
+        'semesters': get_semesters(program_id),
+        # Listing every subject would grow with the catalogue
+        'subjects': get_subjects(specialization_id, semester_id) if specialization_id or semester_id else None,
+    }
+
 @admin_bp.route('/admin/dashboard')
 @login_required
 @admin_required
 def admin_dashboard():
-    # Get data for dashboard statistics
-    programs = get_programs()
-    specializations = get_specializations()
-    subjects = get_subjects()
-    units = []
-    files = []
-    
-    # Get all units
-    for subject in subjects:
-        subject_units = get_units(subject['id'])
-        units.extend(subject_units)
-    
-    # Get all files
-    for subject in subjects:
-        subject_files = get_syllabus_files(subject['id'])
-        files.extend(subject_files)
-    
-    # Get total number of users
-    total_users = get_total_users()
-    
-    return render_template('admin_dashboard.html', 
-                         programs=programs, 
-                         specializations=specializations,
-                         subjects=subjects, 
-                         units=units, 
-                         files=files,
-                         total_users=total_users)
+    # Catalogue counters come from a single aggregate query, only run when
+    # the cached stats cards are stale; user counts are trigger-maintained
+    return render_template('admin_dashboard.html', stats=Deferred(get_dashboard_stats),
+                           user_counts=get_user_counts())
 
 # Program Management
 @admin_bp.route('/admin/programs', methods=['GET', 'POST'])
@@ -98,11 +110,13 @@ def manage_programs():
                 "INSERT INTO programs (name, code, description, duration_years) VALUES (?, ?, ?, ?)",
                 (name, code, description, duration)
             )
+            bump_catalogue_version(cursor)
             conn.commit()
             cursor.close()
             conn.close()
             flash('Program added successfully', 'success')
         except Exception as e:
+            rollback_request_connection()
             flash(f'Error adding program: {str(e)}', 'error')
     
     programs = get_programs()
@@ -116,11 +130,13 @@ def delete_program(program_id):
         conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute("UPDATE programs SET is_active = 0 WHERE id = ?", (program_id,))
+        bump_catalogue_version(cursor)
         conn.commit()
         cursor.close()
         conn.close()
         flash('Program deleted successfully', 'success')
     except Exception as e:
+        rollback_request_connection()
         flash(f'Error deleting program: {str(e)}', 'error')
     
     return redirect(url_for('admin.manage_programs'))
@@ -145,23 +161,22 @@ def manage_subjects():
                 "INSERT INTO subjects (name, code, credits, description, specialization_id, semester_id) VALUES (?, ?, ?, ?, ?, ?)",
                 (name, code, credits, description, specialization_id, semester_id)
             )
+            bump_catalogue_version(cursor)
             conn.commit()
             cursor.close()
             conn.close()
             flash('Subject added successfully', 'success')
         except Exception as e:
+            rollback_request_connection()
             flash(f'Error adding subject: {str(e)}', 'error')
     
-    programs = get_programs()
-    specializations = get_specializations()
-    semesters = get_semesters()
-    subjects = get_subjects()
-    
-    return render_template('admin_subjects.html', 
-                         programs=programs, 
-                         specializations=specializations, 
-                         semesters=semesters, 
-                         subjects=subjects)
+    filters, sort, page = listing_args()
+    return render_template('admin_subjects.html',
+                         specializations=get_specializations(),
+                         semesters=get_semesters(),
+                         filters=filters,
+                         filter_options=listing_filter_options(filters),
+                         listing=Deferred(lambda: get_admin_listing('subjects', filters, sort, page)))
 
 @admin_bp.route('/admin/subjects/<int:subject_id>/delete', methods=['POST'])
 @login_required
@@ -171,11 +186,13 @@ def delete_subject(subject_id):
         conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute("UPDATE subjects SET is_active = 0 WHERE id = ?", (subject_id,))
+        bump_catalogue_version(cursor)
         conn.commit()
         cursor.close()
         conn.close()
         flash('Subject deleted successfully', 'success')
     except Exception as e:
+        rollback_request_connection()
         flash(f'Error deleting subject: {str(e)}', 'error')
     
     return redirect(url_for('admin.manage_subjects'))
@@ -200,22 +217,20 @@ def manage_units():
                 "INSERT INTO units (subject_id, unit_number, title, description, topics, hours_allocated) VALUES (?, ?, ?, ?, ?, ?)",
                 (subject_id, unit_number, title, description, topics, hours)
             )
+            bump_catalogue_version(cursor)
             conn.commit()
             cursor.close()
             conn.close()
             flash('Unit added successfully', 'success')
         except Exception as e:
+            rollback_request_connection()
             flash(f'Error adding unit: {str(e)}', 'error')
     
-    subjects = get_subjects()
-    units = []
-    for subject in subjects:
-        subject_units = get_units(subject['id'])
-        for unit in subject_units:
-            unit['subject_name'] = subject['name']
-        units.extend(subject_units)
-    
-    return render_template('admin_units.html', subjects=subjects, units=units)
+    # Listings are cached template fragments; they are only loaded on a miss
+    filters, sort, page = listing_args()
+    return render_template('admin_units.html', subjects=Deferred(get_subjects),
+                           filters=filters, filter_options=listing_filter_options(filters),
+                           listing=Deferred(lambda: get_admin_listing('units', filters, sort, page)))
 
 @admin_bp.route('/admin/units/<int:unit_id>/delete', methods=['POST'])
 @login_required
@@ -225,11 +240,13 @@ def delete_unit(unit_id):
         conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute("UPDATE units SET is_active = 0 WHERE id = ?", (unit_id,))
+        bump_catalogue_version(cursor)
         conn.commit()
         cursor.close()
         conn.close()
         flash('Unit deleted successfully', 'success')
     except Exception as e:
+        rollback_request_connection()
         flash(f'Error deleting unit: {str(e)}', 'error')
     
     return redirect(url_for('admin.manage_units'))
@@ -240,6 +257,17 @@ def delete_unit(unit_id):
 @admin_required
 def upload_syllabus():
     if request.method == 'POST':
+        # Ensure upload directory exists
+        try:
+            upload_dir = ensure_upload_dir()
+        except Exception as e:
+            logger.error(f"Upload directory error: {e}")
+            flash('Server configuration error. Please contact administrator.', 'error')
+            return redirect(request.url)
+        
+        # The file is written into upload_dir as it is parsed; oversized uploads
+        # abort with RequestEntityTooLarge and uncommitted ones are removed on teardown
+        request.stream_uploads_to(upload_dir, MAX_FILE_SIZE)
         if 'file' not in request.files:
             flash('No file selected', 'error')
             return redirect(request.url)
@@ -251,82 +279,61 @@ def upload_syllabus():
             flash('No file selected', 'error')
             return redirect(request.url)
         
-        # Check file size
-        file_content = file.read()
-        if len(file_content) > MAX_FILE_SIZE:
-            flash(f'File too large. Maximum size is {MAX_FILE_SIZE/1024/1024}MB', 'error')
-            return redirect(request.url)
-        
-        # Reset file pointer
-        file.seek(0)
-        
         if not allowed_file(file.filename):
             flash('Invalid file type. Allowed: pdf, doc, docx, txt', 'error')
             return redirect(request.url)
         
-        # Ensure upload directory exists
-        try:
-            upload_dir = ensure_upload_dir()
-        except Exception as e:
-            logger.error(f"Upload directory error: {e}")
-            flash('Server configuration error. Please contact administrator.', 'error')
+        # Verify MIME type from the first chunk, still in memory
+        ingest = file.stream
+        file_mime = ingest.sniff_mime()
+        if file_mime not in ALLOWED_MIME_TYPES:
+            flash('Invalid file type detected', 'error')
             return redirect(request.url)
         
         # Generate safe filename
         unique_filename = sanitize_filename(file.filename)
-        file_path = os.path.join(upload_dir, unique_filename)
         
         conn = None
         cursor = None
         try:
-            # Save file temporarily to check MIME type
-            temp_path = f"{file_path}.tmp"
-            file.save(temp_path)
-            
-            # Verify MIME type
-            mime = magic.Magic(mime=True)
-            file_mime = mime.from_file(temp_path)
-            if file_mime not in ALLOWED_MIME_TYPES:
-                os.remove(temp_path)
-                flash('Invalid file type detected', 'error')
-                return redirect(request.url)
-            
-            # Rename temp file to final name
-            os.rename(temp_path, file_path)
-            
             # Save to database in a transaction
             conn = get_db_connection()
             cursor = conn.cursor()
             
+            # The row is inserted first so the write lock is held while the blob
+            # is placed; delete_file takes the same lock again before unlinking blobs
             cursor.execute("""
                 INSERT INTO syllabus_files 
                 (subject_id, filename, original_filename, file_path, 
-                 file_size, file_type, uploaded_by, uploaded_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'))
+                 file_size, file_type, uploaded_by, uploaded_at, content_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'), ?)
             """, (
                 subject_id, 
                 unique_filename, 
                 file.filename, 
-                file_path,
-                os.path.getsize(file_path),
+                blob_path(upload_dir, ingest.sha256),
+                ingest.size,
                 file_mime,
-                current_user.id
+                current_user.id,
+                ingest.sha256
             ))
+            # Identical content already in the store is reused, not written again
+            ingest.commit_blob(upload_dir)
+            # File listings and counts are cached with the catalogue
+            bump_catalogue_version(cursor)
             
             conn.commit()
-            logger.info(f"File uploaded successfully: {unique_filename}")
+            logger.info(f"File uploaded successfully: {unique_filename} (sha256 {ingest.sha256}"
+                        f"{', deduplicated' if ingest.deduplicated else ''})")
             flash('File uploaded successfully', 'success')
             
         except Exception as e:
-            # Clean up in case of error
-            if os.path.exists(temp_path):
-                try:
-                    os.remove(temp_path)
-                except:
-                    pass
-            if os.path.exists(file_path):
+            if conn:
+                conn.rollback()
+            # Clean up a blob this upload created
+            if ingest.path and not ingest.deduplicated:
                 try:
-                    os.remove(file_path)
+                    os.remove(ingest.path)
                 except:
                     pass
                     
@@ -338,17 +345,12 @@ def upload_syllabus():
                 cursor.close()
             if conn:
                 conn.close()
-                
-        # Clean up orphaned files (run occasionally, not on every request)
-        if datetime.now().hour % 6 == 0:  # Run every 6 hours
-            cleanup_orphaned_files()
-    
-    subjects = get_subjects()
-    # Add files data to each subject
-    for subject in subjects:
-        subject['files'] = get_syllabus_files(subject['id'])
     
-    return render_template('admin_upload.html', subjects=subjects)
+    filters, sort, page = listing_args()
+    return render_template('admin_upload.html', subjects=Deferred(get_subjects),
+                           recent_files=Deferred(lambda: get_admin_listing('files', per_page=RECENT_FILES)['rows']),
+                           filters=filters, filter_options=listing_filter_options(filters),
+                           listing=Deferred(lambda: get_admin_listing('files', filters, sort, page)))
 
 @admin_bp.route('/admin/files/<int:file_id>/delete', methods=['POST'])
 @login_required
@@ -359,19 +361,27 @@ def delete_file(file_id):
         cursor = conn.cursor()
         
         # Get file info before deleting
-        cursor.execute("SELECT file_path FROM syllabus_files WHERE id = ?", (file_id,))
+        cursor.execute("SELECT file_path, content_hash FROM syllabus_files WHERE id = ?", (file_id,))
         file_info = cursor.fetchone()
         
-        if file_info and os.path.exists(file_info[0]):
-            os.remove(file_info[0])
-        
         cursor.execute("DELETE FROM syllabus_files WHERE id = ?", (file_id,))
+        # Shared blobs are only released once the last reference is gone
+        released = bool(file_info and file_info[1] and release_blob(cursor, file_info[1]))
+        bump_catalogue_version(cursor)
         conn.commit()
+        file_cache.invalidate(file_id)
+
+        # Files are unlinked only after the delete has committed
+        if released:
+            remove_released_blob(conn, file_info[1], file_info[0])
+        elif file_info and not file_info[1] and os.path.exists(file_info[0]):
+            os.remove(file_info[0])
         cursor.close()
         conn.close()
         
         flash('File deleted successfully', 'success')
     except Exception as e:
+        rollback_request_connection()
         flash(f'Error deleting file: {str(e)}', 'error')
     
     return redirect(url_for('admin.upload_syllabus'))
@@ -384,107 +394,53 @@ from werkzeug.utils import secure_filename
 def download_file(file_id):
     """
     Download a file using its database ID.
-    Uses Flask's send_file for better performance with large files.
+    Metadata comes from the per-worker file cache, so repeated downloads skip
+    SQLite; blobs are immutable and served with their content hash as ETag.
     """
-    conn = None
-    cursor = None
     try:
-        # Get file info from database
-        conn = get_db_connection()
-        conn.row_factory = sqlite3.Row  # This enables dictionary-style access
-        cursor = conn.cursor()
-        
-        # Get file metadata with user permissions check
-        cursor.execute("""
-            SELECT sf.id, sf.file_path, sf.original_filename, sf.file_type, 
-                   sf.file_size, sf.uploaded_by, u.username as uploaded_by_name
-            FROM syllabus_files sf
-            LEFT JOIN users u ON sf.uploaded_by = u.id
-            WHERE sf.id = ?
-        """, (file_id,))
-        
-        file_info = cursor.fetchone()
-        if not file_info:
-            logger.warning(f"File not found in database: {file_id}")
-            flash('File not found', 'error')
-            return redirect(url_for('view_syllabus'))
-        
-        # Convert Row to dict if needed
-        if hasattr(file_info, 'keys'):
-            file_info = dict(file_info)
-        
-        # Check if user has permission to download
-        if current_user.role != 'admin' and str(file_info.get('uploaded_by')) != str(current_user.id):
-            logger.warning(f"Unauthorized download attempt by user {current_user.id} for file {file_id}")
-            abort(403, description="You don't have permission to download this file")
-        
-        file_path = file_info.get('file_path')
-        if not file_path:
-            logger.error(f"File path is empty for file_id: {file_id}")
-            flash('File path is missing', 'error')
-            return redirect(url_for('view_syllabus'))
-        
-        # Verify file exists and is readable
-        if not os.path.isfile(file_path):
-            # Try to find in uploads directory as fallback
-            filename = os.path.basename(file_path)
-            alt_path = os.path.join(current_app.root_path, 'uploads', filename)
-            if os.path.isfile(alt_path):
-                file_path = alt_path
-            else:
-                logger.error(f"File not found on server: {file_path}")
-                flash('File not found on server', 'error')
+        for attempt in range(2):
+            file_info = file_cache.get(file_id, get_syllabus_file)
+            if not file_info:
+                logger.warning(f"File not found in database: {file_id}")
+                flash('File not found', 'error')
                 return redirect(url_for('view_syllabus'))
-        
-        # Get safe filename for download
-        download_name = secure_filename(file_info.get('original_filename', f'file_{file_id}'))
-        
-        # Set appropriate MIME type
-        mime_type = file_info.get('file_type', 'application/octet-stream')
-        
-        # Log the download
-        logger.info(f"File downloaded - ID: {file_id}, User: {current_user.id}, File: {file_path}")
-        
-        # Send the file
-        return send_file(
-            file_path,
-            as_attachment=True,
-            download_name=download_name,
-            mimetype=mime_type,
-            etag=True,
-            max_age=0,  # Prevent caching
-            conditional=True
-        )
-        
+            
+            # Check if user has permission to download
+            if current_user.role != 'admin' and str(file_info.get('uploaded_by')) != str(current_user.id):
+                logger.warning(f"Unauthorized download attempt by user {current_user.id} for file {file_id}")
+                abort(403, description="You don't have permission to download this file")
+            
+            if not file_info.get('file_path'):
+                logger.error(f"File path is empty for file_id: {file_id}")
+                flash('File path is missing', 'error')
+                return redirect(url_for('view_syllabus'))
+            
+            # Get safe filename for download
+            download_name = secure_filename(file_info.get('original_filename') or f'file_{file_id}')
+            try:
+                response = send_stored_file(file_info, ensure_upload_dir(), download_name)
+                break
+            except FileNotFoundError:
+                # The cached row may predate a delete or backfill; reload it once
+                file_cache.invalidate(file_id)
+                if attempt:
+                    logger.error(f"File not found on server: {file_info['file_path']}")
+                    flash('File not found on server', 'error')
+                    return redirect(url_for('view_syllabus'))
+        
+        logger.info(f"File downloaded - ID: {file_id}, User: {current_user.id}, Status: {response.status_code}")
+        return response
+        
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error downloading file {file_id}: {str(e)}", exc_info=True)
         flash('Error downloading file. Please try again.', 'error')
         return redirect(url_for('view_syllabus'))
-        
-    finally:
-        # Clean up database connection
-        try:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
-        except Exception as e:
-            logger.error(f"Error closing database connection: {e}")
-            logger.error(f"Error closing database connection: {str(e)}")
 
 def allowed_file(filename):
-    """Check if the file has an allowed extension and MIME type."""
-    if not ('.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS):
-        return False
-    
-    # Verify MIME type
-    try:
-        mime = magic.Magic(mime=True)
-        file_mime = mime.from_file(filename)
-        return file_mime in ALLOWED_MIME_TYPES
-    except Exception as e:
-        logger.error(f"Error checking MIME type: {e}")
-        return False
+    """Check if the file has an allowed extension (the MIME type is sniffed from the upload)."""
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 def sanitize_filename(filename):
     """Sanitize filename and ensure it's unique."""
@@ -492,34 +448,6 @@ def sanitize_filename(filename):
     timestamp = int(datetime.utcnow().timestamp() * 1000)
     return f"{base}_{timestamp}{ext}"
 
-def cleanup_orphaned_files():
-    """Remove files that exist on disk but not in the database."""
-    try:
-        upload_dir = ensure_upload_dir()
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Get all files in the database
-        cursor.execute("SELECT file_path FROM syllabus_files")
-        db_files = {os.path.basename(row[0]) for row in cursor.fetchall()}
-        
-        # Check files on disk
-        for filename in os.listdir(upload_dir):
-            file_path = os.path.join(upload_dir, filename)
-            if os.path.isfile(file_path) and filename not in db_files:
-                try:
-                    os.remove(file_path)
-                    logger.info(f"Removed orphaned file: {filename}")
-                except Exception as e:
-                    logger.error(f"Failed to remove orphaned file {filename}: {e}")
-        
-        cursor.close()
-        conn.close()
-    except Exception as e:
-        logger.error(f"Error during orphaned files cleanup: {e}")
-        if 'conn' in locals():
-            conn.close()
-
 # Specialization Management
 @admin_bp.route('/admin/specializations', methods=['GET', 'POST'])
 @login_required
@@ -538,11 +466,13 @@ def manage_specializations():
                 "INSERT INTO specializations (name, code, description, program_id) VALUES (?, ?, ?, ?)",
                 (name, code, description, program_id)
             )
+            bump_catalogue_version(cursor)
             conn.commit()
             cursor.close()
             conn.close()
             flash('Specialization added successfully', 'success')
         except Exception as e:
+            rollback_request_connection()
             flash(f'Error adding specialization: {str(e)}', 'error')
     
     programs = get_programs()
@@ -557,11 +487,13 @@ def delete_specialization(specialization_id):
         conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute("UPDATE specializations SET is_active = 0 WHERE id = ?", (specialization_id,))
+        bump_catalogue_version(cursor)
         conn.commit()
         cursor.close()
         conn.close()
         flash('Specialization deleted successfully', 'success')
     except Exception as e:
+        rollback_request_connection()
         flash(f'Error deleting specialization: {str(e)}', 'error')
     
     return redirect(url_for('admin.manage_specializations'))
@@ -583,11 +515,13 @@ def manage_semesters():
                 "INSERT INTO semesters (name, semester_number, program_id) VALUES (?, ?, ?)",
                 (name, semester_number, program_id)
             )
+            bump_catalogue_version(cursor)
             conn.commit()
             cursor.close()
             conn.close()
             flash('Semester added successfully', 'success')
         except Exception as e:
+            rollback_request_connection()
             flash(f'Error adding semester: {str(e)}', 'error')
     
     programs = get_programs()
@@ -602,11 +536,114 @@ def delete_semester(semester_id):
         conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute("UPDATE semesters SET is_active = 0 WHERE id = ?", (semester_id,))
+        bump_catalogue_version(cursor)
         conn.commit()
         cursor.close()
         conn.close()
         flash('Semester deleted successfully', 'success')
     except Exception as e:
+        rollback_request_connection()
         flash(f'Error deleting semester: {str(e)}', 'error')
     
-    return redirect(url_for('admin.manage_semesters')) 
\ No newline at end of file
+    return redirect(url_for('admin.manage_semesters')) 
+
+# Student roster
+def roster_page():
+    """One keyset page of the roster from the query string: (search, rows, next cursor)."""
+    search = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', ROSTER_PAGE_SIZE, type=int), 1), ROSTER_MAX_PAGE_SIZE)
+    after = decode_cursor(request.args['after']) if request.args.get('after') else None
+    rows, next_key = get_student_roster(search, after, limit)
+    return search, rows, encode_cursor(next_key) if next_key is not None else None
+
+@admin_bp.route('/admin/students', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def manage_students():
+    if request.method == 'POST':
+        student = {field: request.form.get(field) for field in
+                   ('username', 'email', 'full_name', 'password', 'program_id', 'specialization_id')}
+        try:
+            report = import_students([(1, student)])
+            if report['created']:
+                flash('Student added successfully', 'success')
+            else:
+                flash('A student with this email already exists; their enrollment was updated', 'info')
+        except StudentImportError as e:
+            flash(f"Error adding student: {e.errors[0].split(': ', 1)[-1]}", 'error')
+        except Exception as e:
+            logger.error(f"Error adding student: {e}", exc_info=True)
+            flash(f'Error adding student: {str(e)}', 'error')
+        return redirect(url_for('admin.manage_students'))
+
+    try:
+        search, students, next_cursor = roster_page()
+    except ValueError:
+        abort(400, description='Malformed cursor')
+    return render_template('admin_students.html', students=students, search=search, next_cursor=next_cursor,
+                           user_counts=get_user_counts(), enrollment_counts=get_enrollment_counts(),
+                           programs=Deferred(get_programs))
+
+@admin_bp.route('/admin/students/<int:student_id>/delete', methods=['POST'])
+@login_required
+@admin_required
+def delete_student(student_id):
+    if delete_student_account(student_id):
+        flash('Student deleted successfully', 'success')
+    else:
+        flash('Student not found', 'error')
+    return redirect(url_for('admin.manage_students', q=request.args.get('q') or None))
+
+@admin_bp.route('/admin/api/students')
+@admin_api_required
+def roster_api():
+    try:
+        search, students, next_cursor = roster_page()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'data': students,
+        'next': next_cursor,
+        'counts': {'users': get_user_counts(), 'enrollments': get_enrollment_counts()},
+    })
+
+# Bulk catalogue import/export
+@admin_bp.route('/admin/catalogue', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def catalogue_import():
+    report = None
+    errors = None
+    if request.method == 'POST':
+        # Catalogue files are far larger than syllabus uploads
+        request.content_limit = CATALOGUE_IMPORT_MAX_SIZE
+        file = request.files.get('file')
+        fmt = detect_format(file.filename) if file else None
+        if not file or file.filename == '':
+            flash('No file selected', 'error')
+        elif fmt is None:
+            flash('Invalid file type. Allowed: csv, jsonl, json', 'error')
+        else:
+            try:
+                report = import_catalogue(file.stream, fmt, dry_run=bool(request.form.get('dry_run')))
+                logger.info(f"Catalogue import by user {current_user.id}: {report}")
+                flash('Catalogue checked, nothing was written' if report['dry_run'] else 'Catalogue imported successfully', 'success')
+            except CatalogueImportError as e:
+                errors = e.errors
+            except Exception as e:
+                logger.error(f"Error importing catalogue: {e}", exc_info=True)
+                flash(f'Error importing catalogue: {str(e)}', 'error')
+    
+    return render_template('admin_catalogue.html', report=report, errors=errors)
+
+@admin_bp.route('/admin/catalogue/export')
+@login_required
+@admin_required
+def catalogue_export():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'jsonl'):
+        abort(400, description='Unsupported export format')
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = Response(stream_with_context(export_catalogue(fmt)), mimetype=mimetype)
+    response.headers.set('Content-Disposition', 'attachment', filename=f'catalogue.{fmt}')
+    return response
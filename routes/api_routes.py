@@ -0,0 +1,92 @@
+"""
+Versioned JSON API for browsing the catalogue (/api/v1).
+
+Every listing is keyset-paginated: a page carries an opaque `next` cursor
+that is passed back as `after` to read the following page, so the browser
+loads the tree one level (and one page) at a time. `fields` selects the
+returned fields, including computed ones such as child counts that are only
+calculated when asked for. Responses carry an ETag derived from the
+catalogue version and the request, so unchanged pages are answered with a
+304 before the listing is queried.
+"""
+
+import base64
+import hashlib
+import json
+from flask import Blueprint, request, jsonify, make_response
+from catalogue_cache import catalogue_cache
+from models import API_PAGE_SIZE, API_MAX_PAGE_SIZE, get_catalogue_page
+
+api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        raise ValueError("Malformed cursor")
+    if not isinstance(key, list) or not all(isinstance(value, (str, int, float)) for value in key):
+        raise ValueError("Malformed cursor")
+    return key
+
+
+def listing_response(listing, **filters):
+    """Serve one page of a catalogue listing with conditional GET support."""
+    version = catalogue_cache.current_version()
+    etag = None
+    if version is not None:
+        etag = hashlib.sha1(f"{version}:{request.full_path}".encode()).hexdigest()
+        if request.if_none_match.contains(etag):
+            response = make_response('', 304)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'public, no-cache'
+            return response
+
+    limit = min(max(request.args.get('limit', API_PAGE_SIZE, type=int), 1), API_MAX_PAGE_SIZE)
+    fields = [name for name in request.args.get('fields', '').split(',') if name] or None
+    try:
+        after = decode_cursor(request.args['after']) if request.args.get('after') else None
+        rows, next_key = get_catalogue_page(listing, filters, after, limit, fields)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    response = jsonify({
+        'data': rows,
+        'limit': limit,
+        'next': encode_cursor(next_key) if next_key is not None else None,
+    })
+    if etag:
+        response.set_etag(etag)
+    # Clients must revalidate, which costs a version read and no listing query
+    response.headers['Cache-Control'] = 'public, no-cache'
+    return response
+
+
+@api_bp.route('/programs')
+def list_programs():
+    return listing_response('programs')
+
+
+@api_bp.route('/programs/<int:program_id>/specializations')
+def list_specializations(program_id):
+    return listing_response('specializations', program_id=program_id)
+
+
+@api_bp.route('/programs/<int:program_id>/semesters')
+def list_semesters(program_id):
+    return listing_response('semesters', program_id=program_id)
+
+
+@api_bp.route('/semesters/<int:semester_id>/subjects')
+def list_subjects(semester_id):
+    return listing_response('subjects', semester_id=semester_id,
+                            specialization_id=request.args.get('specialization_id', type=int))
+
+
+@api_bp.route('/subjects/<int:subject_id>/units')
+def list_units(subject_id):
+    return listing_response('units', subject_id=subject_id)
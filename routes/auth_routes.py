@@ -1,10 +1,17 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_user, logout_user, login_required, current_user
 from models import User
+from passwords import VerifierBusy
+import throttle
 import re
 
 auth_bp = Blueprint('auth', __name__)
 
+def too_many_attempts(template, wait):
+    """429 page for a throttled login or registration attempt."""
+    flash(f'Too many attempts. Please try again in {wait} seconds.', 'error')
+    return render_template(template), 429, {'Retry-After': str(wait)}
+
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
@@ -18,8 +25,18 @@ def login():
             flash('Please fill in all fields', 'error')
             return render_template('login.html')
         
-        user = User.get_by_email(email)
-        if user and user.check_password(password):
+        # Rejected before the user is looked up or any hashing is done
+        wait = throttle.check_login(request.remote_addr, email)
+        if wait:
+            return too_many_attempts('login.html', wait)
+        
+        try:
+            user = User.authenticate(email, password)
+        except VerifierBusy:
+            flash('Too many sign-in attempts right now. Please try again in a moment.', 'error')
+            return render_template('login.html'), 503
+        
+        if user:
             login_user(user)
             flash(f'Welcome back, {user.full_name}!', 'success')
             return redirect(url_for('dashboard'))
@@ -45,6 +62,10 @@ def register():
             flash('Please fill in all fields', 'error')
             return render_template('register.html')
         
+        wait = throttle.check_registration(request.remote_addr)
+        if wait:
+            return too_many_attempts('register.html', wait)
+        
         if password != confirm_password:
             flash('Passwords do not match', 'error')
             return render_template('register.html')
@@ -99,8 +120,17 @@ def admin_login():
             flash('Please fill in all fields', 'error')
             return render_template('admin_login.html')
         
-        user = User.get_by_email(email)
-        if user and user.role == 'admin' and user.check_password(password):
+        wait = throttle.check_login(request.remote_addr, email)
+        if wait:
+            return too_many_attempts('admin_login.html', wait)
+        
+        try:
+            user = User.authenticate(email, password)
+        except VerifierBusy:
+            flash('Too many sign-in attempts right now. Please try again in a moment.', 'error')
+            return render_template('admin_login.html'), 503
+        
+        if user and user.role == 'admin':
             login_user(user)
             flash(f'Welcome back, Admin {user.full_name}!', 'success')
             return redirect(url_for('dashboard'))
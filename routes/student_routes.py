@@ -1,40 +1,134 @@
-from flask import Blueprint, request, jsonify
-from db_config import get_db_connection
+import logging
+from functools import wraps
+from flask import Blueprint, request, jsonify, render_template, redirect, url_for, flash, Response, stream_with_context
+from flask_login import login_required, current_user
+from catalogue_io import read_records
+from models import (get_programs, get_specializations, get_student_enrollments, get_program_syllabus,
+                    enroll_student, update_enrollment, drop_enrollment)
+from routes.api_routes import encode_cursor, decode_cursor
+from student_io import (StudentImportError, STUDENT_IMPORT_MAX_SIZE, STUDENT_PAGE_SIZE, STUDENT_MAX_PAGE_SIZE,
+                        import_students, get_student_page_end, export_students)
+from template_cache import Deferred
+
+logger = logging.getLogger(__name__)
 
 student_bp = Blueprint('student_bp', __name__)
 
+# My syllabus: the student's enrollments and only their slice of the catalogue
+@student_bp.route('/my_syllabus')
+@login_required
+def my_syllabus():
+    enrollments = get_student_enrollments(current_user.id)
+    for enrollment in enrollments:
+        # Shared by every student in the same program and specialization
+        enrollment['syllabus'] = get_program_syllabus(enrollment['program_id'], enrollment['specialization_id'])
+        enrollment['specializations'] = get_specializations(enrollment['program_id'])
+    return render_template('my_syllabus.html', enrollments=enrollments, programs=Deferred(get_programs))
+
+@student_bp.route('/enrollments', methods=['POST'])
+@login_required
+def create_enrollment():
+    program_id = request.form.get('program_id', type=int)
+    specialization_id = request.form.get('specialization_id', type=int)
+    if not program_id or not specialization_id:
+        flash('Please select a program and a specialization', 'error')
+        return redirect(url_for('student_bp.my_syllabus'))
+    
+    enrollment_id, error = enroll_student(current_user.id, program_id, specialization_id)
+    if error:
+        flash(error, 'error')
+    else:
+        flash('Enrollment saved', 'success')
+    return redirect(url_for('student_bp.my_syllabus'))
+
+@student_bp.route('/enrollments/<int:enrollment_id>/update', methods=['POST'])
+@login_required
+def change_enrollment(enrollment_id):
+    specialization_id = request.form.get('specialization_id', type=int)
+    error = update_enrollment(enrollment_id, current_user.id, specialization_id) if specialization_id \
+        else 'Please select a specialization'
+    if error:
+        flash(error, 'error')
+    else:
+        flash('Specialization updated', 'success')
+    return redirect(url_for('student_bp.my_syllabus'))
+
+@student_bp.route('/enrollments/<int:enrollment_id>/delete', methods=['POST'])
+@login_required
+def delete_enrollment(enrollment_id):
+    if drop_enrollment(enrollment_id, current_user.id):
+        flash('Enrollment removed', 'success')
+    else:
+        flash('Enrollment not found', 'error')
+    return redirect(url_for('student_bp.my_syllabus'))
+
+# Students API (admins only): batch onboarding and a streamed, cursor-paginated listing
+def admin_api_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return jsonify({'error': 'Authentication required'}), 401
+        if current_user.role != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        return f(*args, **kwargs)
+    return decorated_function
+
+def onboard(records):
+    """Run an intake from the request and answer with its report or its errors."""
+    try:
+        report = import_students(records, dry_run=request.args.get('dry_run', type=int) == 1)
+    except StudentImportError as e:
+        return jsonify({'errors': e.errors}), 400
+    except ValueError as e:
+        return jsonify({'errors': [f'Unreadable request body: {e}']}), 400
+    except Exception as e:
+        logger.error(f"Error importing students: {e}", exc_info=True)
+        return jsonify({'error': 'Error importing students'}), 500
+    logger.info(f"Student import by user {current_user.id}: {report}")
+    return jsonify(report), 200 if report['dry_run'] else 201
+
 # Route to add a student
 @student_bp.route('/add_student', methods=['POST'])
+@admin_api_required
 def add_student():
-    data = request.get_json()
-    name = data.get('name')
-    email = data.get('email')
-    program = data.get('program')
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    return onboard([(1, data)])
 
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        query = "INSERT INTO students (name, email, program) VALUES (%s, %s, %s)"
-        cursor.execute(query, (name, email, program))
-        conn.commit()
-        return jsonify({'message': 'Student added successfully'}), 201
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-    finally:
-        cursor.close()
-        conn.close()
+# Route to add many students: a JSON array, or JSON Lines with Content-Type application/x-ndjson
+@student_bp.route('/students', methods=['POST'])
+@admin_api_required
+def add_students():
+    # Intakes are far larger than the app-wide request limit
+    request.content_limit = STUDENT_IMPORT_MAX_SIZE
+    if request.mimetype == 'application/x-ndjson':
+        return onboard(read_records(request.stream, 'jsonl'))
+    data = request.get_json(silent=True)
+    if not isinstance(data, list):
+        return jsonify({'error': 'Expected a JSON array of students'}), 400
+    return onboard(enumerate(data, start=1))
 
-# Route to get all students
+# Route to list students as JSON Lines, a page at a time
 @student_bp.route('/students', methods=['GET'])
+@admin_api_required
 def get_students():
+    filters = {name: request.args.get(name, type=int) for name in ('program_id', 'specialization_id')}
+    limit = min(max(request.args.get('limit', STUDENT_PAGE_SIZE, type=int), 1), STUDENT_MAX_PAGE_SIZE)
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM students")
-        students = cursor.fetchall()
-        return jsonify(students), 200
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-    finally:
-        cursor.close()
-        conn.close()
+        after = decode_cursor(request.args['after']) if request.args.get('after') else [0]
+        if len(after) != 1 or not isinstance(after[0], int):
+            raise ValueError("Malformed cursor")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Bound the page first, so the next cursor can go in a header ahead of the streamed body
+    until, more = get_student_page_end(filters, after[0], limit)
+    response = Response(stream_with_context(export_students(filters, after[0], until, limit)),
+                        mimetype='application/x-ndjson')
+    if more:
+        next_cursor = encode_cursor([until])
+        response.headers['X-Next-Cursor'] = next_cursor
+        next_url = url_for('student_bp.get_students', **dict(request.args.to_dict(), after=next_cursor))
+        response.headers['Link'] = f'<{next_url}>; rel="next"'
+    return response
@@ -0,0 +1,96 @@
+"""
+Serving modes for Syllabus Management System.
+
+gunicorn.conf.py runs the app under one of three worker classes
+(GUNICORN_WORKER_CLASS): sync workers handle one request at a time, gthread
+workers run GUNICORN_THREADS requests on threads, and gevent workers run up
+to GUNICORN_WORKER_CONNECTIONS requests as greenlets on a single OS thread,
+so a slow client or a long download no longer ties up a whole worker.
+
+Under gevent, anything that holds the CPU without yielding stalls every
+greenlet of its worker. The two such calls here - password hashing and
+libmagic sniffing - go through offload(), which runs them on gevent's pool of
+native threads (both release the GIL) while the calling greenlet yields. In
+the other modes offload() simply calls the function.
+
+The request connection lives on flask.g, which every greenlet has its own
+copy of, so each in-flight request checks out its own pooled connection, and
+the pool waits cooperatively once threading is monkey-patched (gunicorn.conf.py
+patches before the app is preloaded, so no lock is created unpatched).
+gunicorn.conf.py sizes DB_POOL_SIZE to GUNICORN_WORKER_CONNECTIONS, up to 16
+connections since each keeps its own page cache; beyond that greenlets queue
+for a connection without blocking the others. SQLite's own wait for a write
+lock would sleep inside the C library and stall the hub, so under gevent
+db_config turns busy_timeout off and retries locked statements and commits
+with sleeps that yield.
+"""
+
+import os
+import sys
+import threading
+import time
+
+OFFLOAD_THREADS = int(os.environ.get('OFFLOAD_THREADS', 4))
+
+
+def cooperative():
+    """Whether gevent has monkey-patched threading in this process."""
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('threading')
+
+
+class Offloader:
+    """Runs blocking calls off the gevent hub, and counts them."""
+
+    def __init__(self, threads=OFFLOAD_THREADS):
+        self.threads = max(1, int(threads))
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.seconds = 0.0
+
+    def run(self, func, *args, **kwargs):
+        if not cooperative():
+            return func(*args, **kwargs)
+        from gevent import get_hub
+
+        pool = get_hub().threadpool
+        if pool.maxsize != self.threads:
+            pool.maxsize = self.threads
+        started = time.perf_counter()
+        try:
+            return pool.apply(func, args, kwargs)
+        finally:
+            with self._lock:
+                self.calls += 1
+                self.seconds += time.perf_counter() - started
+
+    def stats(self):
+        with self._lock:
+            return {
+                'mode': 'gevent' if cooperative() else 'threads',
+                'offload_threads': self.threads,
+                'offloaded': self.calls,
+                'offload_seconds': round(self.seconds, 6),
+            }
+
+
+offloader = Offloader()
+
+
+def configure(threads=None):
+    """Replace the process-wide offloader, e.g. from app config."""
+    global offloader
+    offloader = Offloader(offloader.threads if threads is None else threads)
+    return offloader
+
+
+def offload(func, *args, **kwargs):
+    return offloader.run(func, *args, **kwargs)
+
+
+def get_serving_stats():
+    return offloader.stats()
+
+
+def init_app(app):
+    configure(app.config.get('OFFLOAD_THREADS', OFFLOAD_THREADS))
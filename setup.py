@@ -6,35 +6,36 @@ This script initializes the database with the schema and sample data.
 
 import sqlite3
 import os
-from werkzeug.security import generate_password_hash
+from passwords import hash_password
+from db_config import DB_PATH
+from migrate import run_migrations
 
 def init_database():
     """Initialize the database with schema and sample data."""
     
     # Create database directory if it doesn't exist
-    db_dir = 'database'
-    if not os.path.exists(db_dir):
+    db_dir = os.path.dirname(DB_PATH)
+    if db_dir and not os.path.exists(db_dir):
         os.makedirs(db_dir)
     
-    db_path = os.path.join(db_dir, 'syllabus_app.db')
-    
-    # Read the schema file
-    with open('db_schema.sql', 'r') as f:
-        schema = f.read()
-    
-    # Connect to database and execute schema
-    conn = sqlite3.connect(db_path)
+    # Connect to database and apply pending schema migrations
+    conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
     try:
-        # Execute the schema
-        cursor.executescript(schema)
+        applied = run_migrations(conn)
+        if applied:
+            print(f"🗂️  Applied schema migrations: {', '.join(str(v) for v in applied)}")
         
-        # Create admin user with proper password hash
-        admin_password_hash = generate_password_hash('admin123')
+        # Create admin user with proper password hash. An upsert, not INSERT OR
+        # REPLACE: REPLACE's implicit delete skips the users_count_ad trigger,
+        # so every run would count the admin again
+        admin_password_hash = hash_password('admin123')
         cursor.execute("""
-            INSERT OR REPLACE INTO users (username, email, password_hash, role, full_name) 
+            INSERT INTO users (username, email, password_hash, role, full_name) 
             VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(email) DO UPDATE SET username = excluded.username, password_hash = excluded.password_hash,
+                                             role = excluded.role, full_name = excluded.full_name
         """, ('admin', 'admin@syllabus.com', admin_password_hash, 'admin', 'System Administrator'))
         
         # Insert sample subjects
@@ -67,6 +68,9 @@ def init_database():
                 VALUES (?, ?, ?, ?, ?, ?)
             """, unit)
         
+        conn.commit()
+        # Refresh planner statistics now that sample data is in place
+        cursor.execute("ANALYZE")
         conn.commit()
         print("✅ Database initialized successfully!")
         print("📊 Sample data added:")
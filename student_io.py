@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Bulk student onboarding and listing for Syllabus Management System.
+
+Records are one per student; program_id and specialization_id, when given,
+enroll the student (a specialization must belong to its program):
+
+    field              required   notes
+    email              yes        matched against existing accounts
+    full_name          yes
+    username           no         defaults to the email
+    password           new only   existing accounts keep their password
+    program_id         no         together with specialization_id
+    specialization_id  no
+
+An import is validated completely, then written in a single transaction:
+new accounts are inserted with one executemany, existing student accounts
+are kept as they are, and enrollments are upserted with another executemany,
+so re-running an intake is harmless. Passwords are hashed before the
+transaction starts, spread over the password pool when there is one; the
+account checks are repeated once it holds the write lock, so a concurrent
+registration of the same email or username is reported, not a crash.
+
+Listings walk students in id order from a keyset cursor and are streamed a
+chunk of rows at a time, so a page of any size is never held in memory.
+
+Usage:
+    python student_io.py import <file.jsonl|file.json> [--dry-run]
+    python student_io.py export [output_file]
+"""
+
+import json
+import os
+import re
+import sys
+import passwords
+from catalogue_io import read_records, detect_format
+from db_config import get_db_connection
+from models import get_programs, get_specializations
+
+STUDENT_FIELDS = ('email', 'full_name', 'username', 'password', 'program_id', 'specialization_id')
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+PASSWORD_MIN_LENGTH = 6
+
+STUDENT_IMPORT_MAX_SIZE = int(os.environ.get('STUDENT_IMPORT_MAX_SIZE', 50 * 1024 * 1024))
+STUDENT_PAGE_SIZE = 1000
+STUDENT_MAX_PAGE_SIZE = 50000
+IMPORT_MAX_ERRORS = 20
+# Intakes this large refresh the planner statistics of the tables they grew
+ANALYZE_THRESHOLD = 1000
+EXPORT_CHUNK_ROWS = 1000
+
+
+class StudentImportError(Exception):
+    """Raised when an intake has invalid or conflicting records."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f"{len(errors)} invalid record(s): " + '; '.join(errors[:3]))
+
+
+def parse_student(raw):
+    """Validate one raw record and return the cleaned dict."""
+    if not isinstance(raw, dict):
+        raise ValueError("record must be an object")
+    record = {}
+    for field in STUDENT_FIELDS:
+        value = raw.get(field)
+        if isinstance(value, str):
+            value = value.strip()
+        record[field] = None if value in ('', None) else value
+    for field in ('program_id', 'specialization_id'):
+        if record[field] is not None:
+            try:
+                record[field] = int(record[field])
+            except (TypeError, ValueError):
+                raise ValueError(f"{field} must be an integer")
+    if record['email'] is None or not EMAIL_PATTERN.match(str(record['email'])):
+        raise ValueError(f"invalid email {record['email']!r}")
+    if record['full_name'] is None:
+        raise ValueError("full_name is missing")
+    if (record['program_id'] is None) != (record['specialization_id'] is None):
+        raise ValueError("program_id and specialization_id must be given together")
+    if record['password'] is not None and len(str(record['password'])) < PASSWORD_MIN_LENGTH:
+        raise ValueError(f"password must be at least {PASSWORD_MIN_LENGTH} characters long")
+    record['username'] = str(record['username'] or record['email'])
+    return record
+
+
+USERS_BY_EMAIL = "SELECT id, email, role FROM users WHERE email IN (SELECT value FROM json_each(?))"
+USERS_BY_USERNAME = "SELECT username, email FROM users WHERE username IN (SELECT value FROM json_each(?))"
+
+
+def _lookup(cursor, sql, keys):
+    """Rows of `sql` for many keys in one statement; the keys are bound as a single JSON array."""
+    cursor.execute(sql, (json.dumps(keys),))
+    return cursor.fetchall()
+
+
+def _check_accounts(cursor, students):
+    """
+    Split an intake into existing and new accounts against the users table.
+    Returns:
+        tuple: existing ({email: (id, role)}), new records, errors
+    """
+    errors = []
+    existing = {email: (id, role) for id, email, role in _lookup(cursor, USERS_BY_EMAIL, list(students))}
+    new = [record for email, record in students.items() if email not in existing]
+    username_owner = {}
+    for record in new:
+        owner = username_owner.setdefault(record['username'], record['email'])
+        if owner != record['email']:
+            errors.append(f"{record['email']}: username {record['username']!r} is also given to {owner}")
+        # Nobody could log in to an account created without a password
+        if record['password'] is None:
+            errors.append(f"{record['email']}: password is required for a new account")
+    for username, email in _lookup(cursor, USERS_BY_USERNAME, list(username_owner)):
+        errors.append(f"{username_owner[username]}: username {username!r} is taken by {email}")
+    for email, (_, role) in existing.items():
+        if role != 'student':
+            errors.append(f"{email}: belongs to an {role} account")
+    return existing, new, errors
+
+
+def import_students(records, dry_run=False):
+    """
+    Validate and onboard an intake in one transaction.
+    Args:
+        records: iterable of (line number, raw record)
+    Raises:
+        StudentImportError: nothing is written if any record is invalid
+    Returns:
+        dict: records, created, existing, enrolled and dry_run
+    """
+    students = {}
+    errors = []
+    for line_number, raw in records:
+        try:
+            record = parse_student(raw)
+        except ValueError as e:
+            errors.append(f"line {line_number}: {e}")
+            if len(errors) >= IMPORT_MAX_ERRORS:
+                break
+            continue
+        # An email repeated in the intake keeps its last record
+        students[record['email']] = record
+    if errors:
+        raise StudentImportError(errors)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        existing, new, errors = _check_accounts(cursor, students)
+        active_programs = {program['id'] for program in get_programs()}
+        specialization_programs = {spec['id']: spec['program_id'] for spec in get_specializations()
+                                   if spec['program_id'] in active_programs}
+        for record in students.values():
+            if record['program_id'] is not None and \
+                    specialization_programs.get(record['specialization_id']) != record['program_id']:
+                errors.append(f"{record['email']}: specialization {record['specialization_id']} "
+                              f"is not an active specialization of program {record['program_id']}")
+        if errors:
+            raise StudentImportError(errors[:IMPORT_MAX_ERRORS])
+
+        # Hashing dominates a large intake; do it before taking the write lock
+        for record, password_hash in zip(new, passwords.hash_passwords([str(r['password']) for r in new])):
+            record['password_hash'] = password_hash
+
+        # Accounts created since the checks above would otherwise fail the inserts
+        cursor.execute("BEGIN IMMEDIATE")
+        existing, new, errors = _check_accounts(cursor, students)
+        if errors:
+            raise StudentImportError(errors[:IMPORT_MAX_ERRORS])
+        for record in new:
+            # An account deleted in between is new after all; rare enough to hash under the lock
+            if 'password_hash' not in record:
+                record['password_hash'] = passwords.hash_password(str(record['password']))
+
+        cursor.executemany(
+            "INSERT INTO users (username, email, password_hash, role, full_name) VALUES (?, ?, ?, 'student', ?)",
+            ((r['username'], r['email'], r['password_hash'], r['full_name']) for r in new)
+        )
+        student_ids = {email: id for id, email, _ in _lookup(
+            cursor, USERS_BY_EMAIL, [record['email'] for record in new])}
+        student_ids.update((email, id) for email, (id, _) in existing.items())
+
+        enrollments = [(student_ids[r['email']], r['program_id'], r['specialization_id'])
+                       for r in students.values() if r['program_id'] is not None]
+        cursor.executemany("""
+            INSERT INTO student_enrollments (student_id, program_id, specialization_id, enrollment_date)
+            VALUES (?, ?, ?, date('now'))
+            ON CONFLICT(student_id, program_id) WHERE is_active = 1
+            DO UPDATE SET specialization_id = excluded.specialization_id
+        """, enrollments)
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+            # Statistics from a far smaller table would steer listings into full scans
+            if len(new) + len(enrollments) >= ANALYZE_THRESHOLD:
+                cursor.execute("ANALYZE users")
+                cursor.execute("ANALYZE student_enrollments")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    return {
+        'records': len(students),
+        'created': len(new),
+        'existing': len(existing),
+        'enrolled': len(enrollments),
+        'dry_run': dry_run,
+    }
+
+
+STUDENT_COLUMNS = """
+    u.id, u.username, u.email, u.full_name, u.created_at,
+    (SELECT json_group_array(json_object(
+            'id', e.id, 'program_id', e.program_id, 'specialization_id', e.specialization_id,
+            'enrollment_date', e.enrollment_date))
+     FROM student_enrollments e WHERE e.student_id = u.id AND e.is_active = 1) AS enrollments
+"""
+
+
+def _listing_query(columns, filters, after, until=None):
+    """
+    SELECT of students with ids in (after, until], in id order. Filtered
+    listings are driven by the enrollment indexes rather than by all users.
+    """
+    program_id = filters.get('program_id')
+    specialization_id = filters.get('specialization_id')
+    if program_id is None and specialization_id is None:
+        key = 'u.id'
+        source = "users u"
+        clauses = ["u.role = 'student'"]
+        params = []
+    else:
+        # One active enrollment per student and program, so no student is listed twice
+        key = 'f.student_id'
+        source = "student_enrollments f JOIN users u ON u.id = f.student_id"
+        clauses = []
+        params = []
+        for column, value in (('program_id', program_id), ('specialization_id', specialization_id)):
+            if value is not None:
+                clauses.append(f"f.{column} = ?")
+                params.append(value)
+        clauses += ["f.is_active = 1", "u.role = 'student'"]
+    clauses.append(f"{key} > ?")
+    params.append(after)
+    if until is not None:
+        clauses.append(f"{key} <= ?")
+        params.append(until)
+    return f"SELECT {columns} FROM {source} WHERE {' AND '.join(clauses)} ORDER BY {key}", params
+
+
+def get_student_page_end(filters, after=0, limit=STUDENT_PAGE_SIZE):
+    """
+    Bound the page of `limit` students after the cursor id, before streaming it.
+    Returns:
+        tuple: (id of the page's last student or None if the page is the last one,
+                whether more students follow)
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        sql, params = _listing_query('u.id', filters, after)
+        cursor.execute(f"{sql} LIMIT 2 OFFSET ?", params + [limit - 1])
+        ids = [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+    return (ids[0] if ids else None), len(ids) == 2
+
+
+def iter_students(filters, after=0, until=None, limit=STUDENT_PAGE_SIZE):
+    """Yield student dicts with their active enrollments, in id order, fetched a chunk at a time."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        sql, params = _listing_query(STUDENT_COLUMNS, filters, after, until)
+        cursor.execute(f"{sql} LIMIT ?", params + [limit])
+        columns = [column[0] for column in cursor.description]
+        while True:
+            rows = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+            if not rows:
+                break
+            for row in rows:
+                student = dict(zip(columns, row))
+                student['enrollments'] = json.loads(student['enrollments'])
+                yield student
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def export_students(filters, after=0, until=None, limit=STUDENT_PAGE_SIZE):
+    """Yield students as JSON Lines text, a chunk of rows at a time."""
+    lines = []
+    for student in iter_students(filters, after, until, limit):
+        lines.append(json.dumps(student) + '\n')
+        if len(lines) >= EXPORT_CHUNK_ROWS:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def main():
+    args = sys.argv[1:]
+    command = args.pop(0) if args else None
+    dry_run = '--dry-run' in args
+    args = [arg for arg in args if arg != '--dry-run']
+
+    if command == 'import' and args:
+        fmt = detect_format(args[0])
+        if fmt not in ('jsonl', 'json'):
+            print(f"❌ Unknown file type for {args[0]} (use .jsonl or .json)")
+            sys.exit(1)
+        print(f"📥 Importing students from {args[0]}{' (dry run)' if dry_run else ''}...")
+        try:
+            with open(args[0], 'rb') as f:
+                report = import_students(read_records(f, fmt), dry_run)
+        except (StudentImportError, ValueError) as e:
+            for error in getattr(e, 'errors', [str(e)]):
+                print(f"   - {error}")
+            print(f"❌ Import failed, nothing was written")
+            sys.exit(1)
+        print(f"   - {report['created']} created, {report['existing']} already registered, "
+              f"{report['enrolled']} enrollments, {report['without_password']} without a password")
+        print(f"✅ {report['records']} student(s) {'checked' if dry_run else 'imported'}")
+    elif command == 'export':
+        output = open(args[0], 'w') if args else sys.stdout
+        try:
+            for chunk in export_students({}, limit=-1):
+                output.write(chunk)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+    else:
+        print('\n'.join(line.strip() for line in __doc__.strip().splitlines()[-2:]))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
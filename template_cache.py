@@ -0,0 +1,192 @@
+"""
+Template rendering caches for Syllabus Management System.
+
+Fragment cache: expensive blocks of a template are wrapped in
+
+    {% cache 'units_table' %} ... {% endcache %}
+
+and rendered once per catalogue version (plus any extra key values given
+after the name). Routes pass catalogue-wide data wrapped in Deferred, so a
+cached fragment skips both the query and the rendering.
+
+Bytecode cache: compiled templates are kept on disk, so new workers load them
+instead of recompiling every template on first use.
+
+Render timings: with debug on (or TEMPLATE_TIMING_HEADERS=true), responses
+carry an X-Render-Timing header listing the time spent in each template and
+fragment, with fragment cache hits marked.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import before_render_template, g, has_request_context, template_rendered
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from catalogue_cache import catalogue_cache, catalogue_read_failed
+
+FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', 256))
+TEMPLATE_BYTECODE_CACHE = os.environ.get('TEMPLATE_BYTECODE_CACHE', 'True').lower() == 'true'
+# Defaults to a per-user directory under the system temp dir
+TEMPLATE_BYTECODE_DIR = os.environ.get('TEMPLATE_BYTECODE_DIR')
+TEMPLATE_TIMING_HEADERS = os.environ.get('TEMPLATE_TIMING_HEADERS', 'False').lower() == 'true'
+
+
+class Deferred:
+    """
+    A value that is only loaded when a template first uses it.
+    Iteration, len(), truthiness, attribute and item access all load it once.
+    """
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._loaded = False
+        self._value = None
+
+    @property
+    def value(self):
+        if not self._loaded:
+            self._value = self._loader()
+            self._loaded = True
+        return self._value
+
+    def __iter__(self):
+        return iter(self.value)
+
+    def __len__(self):
+        return len(self.value)
+
+    def __bool__(self):
+        return bool(self.value)
+
+    def __getitem__(self, key):
+        return self.value[key]
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.value, name)
+
+
+class FragmentCache:
+    """Bounded LRU of rendered template fragments for one catalogue version."""
+
+    def __init__(self, maxsize=FRAGMENT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._version = None
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, key, render):
+        started = time.perf_counter()
+        version = catalogue_cache.current_version()
+        if version is None or self.maxsize <= 0:
+            return render()
+
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        hit = html is not None
+
+        if not hit:
+            html = Markup(render())
+            with self._lock:
+                self.misses += 1
+                # A write may have bumped the version while the fragment rendered,
+                # and a fragment built from a failed catalogue read is not kept
+                if version == self._version and not catalogue_read_failed():
+                    self._entries[key] = html
+                    while len(self._entries) > self.maxsize:
+                        self._entries.popitem(last=False)
+                        self.evictions += 1
+        _record_timing(f"fragment.{key[0]}", started, hit)
+        return html
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'version': self._version[1] if self._version else None,
+                'entries': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+fragment_cache = FragmentCache()
+
+
+class FragmentCacheExtension(Extension):
+    """The {% cache name[, key, ...] %}...{% endcache %} tag."""
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', [nodes.List(key)]), [], [], body).set_lineno(lineno)
+
+    def _render(self, key, caller):
+        return fragment_cache.render(tuple(str(part) for part in key), caller)
+
+
+def _record_timing(label, started, hit=None):
+    if has_request_context() and 'render_timings' in g:
+        g.render_timings.append((label, (time.perf_counter() - started) * 1000, hit))
+
+
+def _template_started(sender, template, context, **extra):
+    if has_request_context():
+        g.setdefault('render_timings', [])
+        g.setdefault('_render_started', []).append(time.perf_counter())
+
+
+def _template_finished(sender, template, context, **extra):
+    if has_request_context() and g.get('_render_started'):
+        _record_timing(f"template.{template.name}", g._render_started.pop())
+
+
+def _add_timing_header(response):
+    timings = g.get('render_timings')
+    if timings:
+        response.headers['X-Render-Timing'] = ', '.join(
+            f"{label};dur={duration:.2f}" + ('' if hit is None else f";hit={int(hit)}")
+            for label, duration, hit in timings
+        )
+    return response
+
+
+def get_fragment_cache_stats():
+    return fragment_cache.stats()
+
+
+def init_app(app):
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    if app.config.get('TEMPLATE_BYTECODE_CACHE', TEMPLATE_BYTECODE_CACHE):
+        bytecode_dir = app.config.get('TEMPLATE_BYTECODE_DIR', TEMPLATE_BYTECODE_DIR)
+        if bytecode_dir:
+            os.makedirs(bytecode_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(bytecode_dir)
+
+    if app.debug or app.config.get('TEMPLATE_TIMING_HEADERS', TEMPLATE_TIMING_HEADERS):
+        before_render_template.connect(_template_started, app)
+        template_rendered.connect(_template_finished, app)
+        app.after_request(_add_timing_header)
@@ -84,6 +84,1273 @@ def test_database_connection():
         print(f"❌ Database connection error: {e}")
         return False
 
+def test_connection_pool():
+    """Test that pooled connections are reused and tuned"""
+    import os
+    import tempfile
+    from db_config import ConnectionPool, PooledConnection
+
+    pool = ConnectionPool(os.path.join(tempfile.mkdtemp(), 'pool.db'), size=2)
+    first = PooledConnection(pool, pool.acquire())
+    journal_mode = first.execute("PRAGMA journal_mode").fetchone()[0]
+    first.close()
+    second = PooledConnection(pool, pool.acquire())
+    second.close()
+    stats = pool.stats()
+    pool.close_all()
+
+    assert journal_mode == 'wal' and stats['created'] == 1 and stats['checkouts'] == 2, \
+        f"Connection pool check failed: journal_mode={journal_mode}, stats={stats}"
+    print(f"✅ Connection pool reuses connections: {stats}")
+
+def test_request_connection_isolation():
+    """Test that a failed write is rolled back and row_factory does not leak between helpers"""
+    import os
+    import sqlite3
+    import tempfile
+    import db_config
+    from app import app
+    from migrate import run_migrations
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'isolation.db')
+    conn = sqlite3.connect(db_path)
+    run_migrations(conn)
+    conn.close()
+    db_config.configure_pool(db_path)
+
+    with app.app_context():
+        conn = db_config.get_db_connection()
+        conn.row_factory = sqlite3.Row
+        reset = db_config.get_db_connection().row_factory is None
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO programs (name, code) VALUES ('Half Written', 'HALF')")
+        try:
+            cursor.execute("INSERT INTO programs (name, code) VALUES ('Half Written', 'HALF')")
+        except sqlite3.IntegrityError:
+            db_config.rollback_request_connection()
+        cursor.execute("SELECT COUNT(*) FROM programs WHERE code = 'HALF'")
+        leaked = cursor.fetchone()[0]
+        conn.commit()
+    conn = sqlite3.connect(db_path)
+    persisted = conn.execute("SELECT COUNT(*) FROM programs WHERE code = 'HALF'").fetchone()[0]
+    conn.close()
+
+    assert reset and leaked == 0 and persisted == 0, \
+        f"Request connection check failed: reset={reset}, leaked={leaked}, persisted={persisted}"
+    print("✅ Failed writes are rolled back and every checkout starts with plain rows")
+
+def test_catalogue_cache_errors():
+    """Test that failed catalogue reads are not cached and entries are kept per database"""
+    import os
+    import sqlite3
+    import tempfile
+    import db_config
+    import models
+    from app import app
+    from catalogue_cache import catalogue_cache, read_catalogue_version
+    from migrate import run_migrations
+
+    paths = []
+    for name in ('first.db', 'second.db'):
+        paths.append(os.path.join(tempfile.mkdtemp(), name))
+        conn = sqlite3.connect(paths[-1])
+        run_migrations(conn)
+        conn.close()
+    conn = sqlite3.connect(paths[1])
+    conn.execute("INSERT INTO programs (name, code) VALUES ('Only Here', 'ONLY')")
+    conn.commit()
+    conn.close()
+
+    db_config.configure_pool(paths[0])
+    errors = catalogue_cache.stats()['errors']
+    conn = sqlite3.connect(paths[0])
+    conn.execute("ALTER TABLE programs RENAME TO programs_away")
+    conn.commit()
+    with app.app_context():
+        failed = models.get_programs()
+    conn.execute("ALTER TABLE programs_away RENAME TO programs")
+    conn.commit()
+    with app.app_context():
+        recovered = models.get_programs()
+    conn.execute("DROP TABLE catalogue_version")
+    conn.commit()
+    conn.close()
+    unversioned = read_catalogue_version()
+    conn = sqlite3.connect(paths[0])
+    created = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'catalogue_version'").fetchone()[0]
+    conn.close()
+
+    # Same catalogue version, different database
+    db_config.configure_pool(paths[1])
+    with app.app_context():
+        other = [program['code'] for program in models.get_programs()]
+
+    assert failed == [] and recovered and catalogue_cache.stats()['errors'] == errors + 1 \
+        and unversioned is None and created == 0 and 'ONLY' in other, \
+        (f"Catalogue cache error check failed: failed={failed}, recovered={len(recovered)}, "
+         f"unversioned={unversioned}, created={created}, other={other}, stats={catalogue_cache.stats()}")
+    print(f"✅ Failed catalogue reads are not cached: {catalogue_cache.stats()}")
+
+def test_query_plans_use_indexes():
+    """Test that the models.py queries never fall back to full-table scans"""
+    import os
+    import sqlite3
+    import tempfile
+    import db_config
+    import models
+    import passwords
+    import student_io
+    from app import app
+    from catalogue_cache import catalogue_cache
+    from migrate import run_migrations
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'plans.db')
+    conn = sqlite3.connect(db_path)
+    run_migrations(conn)
+    conn.close()
+    db_config.configure_pool(db_path)
+
+    # Catalogue lookups cached by earlier tests must not feed the intake's validation
+    catalogue_cache.invalidate()
+    statements = []
+    # New students need passwords; a cheap hash keeps seeding fast
+    passwords.configure(method='pbkdf2:sha256:1000')
+    with app.app_context():
+        # Enough students for the planner to see users and enrollments as the large tables they are
+        intake = student_io.import_students(enumerate(
+            ({'email': f'student{n}@example.com', 'full_name': f'Student {n}', 'password': 'secret1',
+              'program_id': 1, 'specialization_id': 1 + n % 4} for n in range(student_io.ANALYZE_THRESHOLD)),
+            start=1))
+        assert intake['created'] == student_io.ANALYZE_THRESHOLD, f"Student seeding failed: {intake}"
+        conn = db_config.get_db_connection()
+        conn.set_trace_callback(statements.append)
+        models.User.get_by_id(1)
+        models.User.get_by_email('admin@syllabus.com')
+        models.get_programs.uncached()
+        models.get_specializations.uncached()
+        models.get_specializations.uncached(1)
+        models.get_semesters.uncached()
+        models.get_semesters.uncached(1)
+        models.get_subjects.uncached()
+        models.get_subjects.uncached(1)
+        models.get_subjects.uncached(1, 1)
+        models.get_subjects.uncached(None, 1)
+        models.get_units.uncached(1)
+        models.get_syllabus_files(1)
+        models.get_units_by_subject_ids([1, 2])
+        models.get_syllabus_files_by_subject_ids([1, 2])
+        models.get_subject(1)
+        models.get_subject_detail(1)
+        models.get_dashboard_stats()
+        models.get_catalogue_page('programs', after=['', 0])
+        models.get_catalogue_page('specializations', {'program_id': 1}, after=['', 0])
+        models.get_catalogue_page('semesters', {'program_id': 1}, after=[0, 0])
+        models.get_catalogue_page('subjects', {'semester_id': 1}, after=['', 0])
+        models.get_catalogue_page('subjects', {'semester_id': 1, 'specialization_id': 1})
+        models.get_catalogue_page('units', {'subject_id': 1}, after=[0, 0])
+        models.get_admin_listing('units', {'subject_id': 1})
+        models.get_admin_listing('subjects', {'specialization_id': 1, 'semester_id': 1})
+        models.get_admin_listing('files', {'subject_id': 1})
+        models.get_student_enrollments(1)
+        models.get_user_counts()
+        models.get_enrollment_counts()
+        models.get_student_roster()
+        models.get_student_roster('stud', ['Student 5', 7])
+        models.get_program_syllabus.uncached(1, 1)
+        student_io.import_students([(1, {'email': 'new@example.com', 'full_name': 'New', 'password': 'secret1',
+                                         'program_id': 1, 'specialization_id': 1})], dry_run=True)
+        for filters in ({}, {'program_id': 1}, {'specialization_id': 1}, {'program_id': 1, 'specialization_id': 1}):
+            student_io.get_student_page_end(filters, 0, 10)
+            list(student_io.iter_students(filters, 0, 10, 10))
+        conn.set_trace_callback(None)
+        passwords.configure(method=passwords.PASSWORD_HASH_METHOD)
+
+        full_scans = []
+        for sql in statements:
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            # Scans of subqueries (co-routines/materialized views) are not table scans
+            subqueries = {'CONSTANT ROW'}
+            for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}"):
+                detail = row[-1]
+                if detail.startswith(('CO-ROUTINE ', 'MATERIALIZE ')):
+                    subqueries.add(detail.split(' ', 1)[1])
+                elif detail.startswith('SCAN') and 'INDEX' not in detail \
+                        and detail[5:] not in subqueries:
+                    full_scans.append((detail, ' '.join(sql.split())[:80]))
+                # Automatic indexes are built by scanning the table on every run,
+                # and a SEARCH with no index is a scan with a filter
+                elif 'AUTOMATIC' in detail or detail.startswith('SEARCH') and ' USING ' not in detail:
+                    full_scans.append((detail, ' '.join(sql.split())[:80]))
+
+    assert not full_scans, '; '.join(f"{detail}: {sql}" for detail, sql in full_scans)
+    print(f"✅ {len(statements)} queries checked, no full-table scans")
+
+def test_admin_listings():
+    """Test admin listing filters, sort whitelist, id tiebreaks and page boundaries on a seeded catalogue"""
+    import os
+    import sqlite3
+    import tempfile
+    import db_config
+    import models
+    from app import app
+    from migrate import run_migrations
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'listings.db')
+    conn = sqlite3.connect(db_path)
+    run_migrations(conn)
+    conn.execute("INSERT INTO specializations (program_id, name, code) VALUES (2, 'VLSI Design', 'VLSI')")
+    # Four subjects share a name, so only the id orders them
+    seeded = [('Same' if i < 4 else f'Subject {i:02d}', f'C{i:02d}', i % 3 + 2, i % 2 + 1, i % 3 + 1)
+              for i in range(10)]
+    seeded.append(('Chip Design', 'M01', 4, 5, 2))
+    conn.executemany("INSERT INTO subjects (name, code, credits, specialization_id, semester_id) "
+                     "VALUES (?, ?, ?, ?, ?)", seeded)
+    conn.execute("INSERT INTO subjects (name, code, specialization_id, semester_id, is_active) "
+                 "VALUES ('Retired', 'OLD', 1, 1, 0)")
+    conn.commit()
+    rows = conn.execute("SELECT id, name, specialization_id, semester_id FROM subjects WHERE is_active = 1").fetchall()
+    conn.close()
+    db_config.configure_pool(db_path)
+
+    def ids(listing):
+        return [row['id'] for row in listing['rows']]
+
+    with app.app_context():
+        pages = [models.get_admin_listing('subjects', sort='name', page=n, per_page=4) for n in (1, 2, 3, 4)]
+        descending = models.get_admin_listing('subjects', sort='-name', per_page=20)
+        by_program = models.get_admin_listing('subjects', {'program_id': 2})
+        by_both = models.get_admin_listing('subjects', {'specialization_id': 1, 'semester_id': 1})
+        unknown = models.get_admin_listing('subjects', sort='-password_hash', per_page=20)
+        injected = models.get_admin_listing('subjects', sort='name; DROP TABLE subjects', per_page=20)
+        semester_only = models.get_subjects.uncached(None, 2)
+
+    by_name = [row[0] for row in sorted(rows, key=lambda row: (row[1], row[0]))]
+    walked = sum((ids(page) for page in pages[:3]), [])
+    pages_ok = walked == by_name and [len(page['rows']) for page in pages] == [4, 4, 3, 0] \
+        and [page['has_next'] for page in pages] == [True, True, False, False] \
+        and all(page['total'] == 11 and page['pages'] == 3 for page in pages)
+    same = [row[0] for row in rows if row[1] == 'Same']
+    tiebreak_ok = [row['id'] for row in descending['rows'] if row['name'] == 'Same'] == sorted(same, reverse=True)
+    filters_ok = [row['name'] for row in by_program['rows']] == ['Chip Design'] \
+        and sorted(ids(by_both)) == sorted(row[0] for row in rows if row[2] == 1 and row[3] == 1)
+    sorts_ok = unknown['sort'] == injected['sort'] == 'name' and ids(unknown) == ids(injected) == by_name
+    semester_ok = [s['name'] for s in semester_only] == sorted(row[1] for row in rows if row[3] == 2) \
+        and all(s['semester_name'] == 'Second Semester' for s in semester_only)
+
+    assert pages_ok and tiebreak_ok and filters_ok and sorts_ok and semester_ok, \
+        f"Admin listing check failed: pages={pages_ok}, tiebreak={tiebreak_ok}, filters={filters_ok}, " \
+        f"sorts={sorts_ok}, semester={semester_ok}"
+    print("✅ Admin listings filter, sort, break ties by id and page without overlap")
+
+def test_search_catalogue():
+    """Test that catalogue writes reach the full-text index"""
+    import os
+    import sqlite3
+    import tempfile
+    import db_config
+    from app import app
+    from migrate import run_migrations
+    from models import search_catalogue
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'search.db')
+    conn = sqlite3.connect(db_path)
+    run_migrations(conn)
+    spec_id = conn.execute("SELECT id FROM specializations LIMIT 1").fetchone()[0]
+    sem_id = conn.execute("SELECT id FROM semesters LIMIT 1").fetchone()[0]
+    cursor = conn.execute(
+        "INSERT INTO subjects (name, code, credits, description, specialization_id, semester_id) VALUES (?, ?, ?, ?, ?, ?)",
+        ('Database Systems', 'CS301', 4, 'Relational design', spec_id, sem_id))
+    subject_id = cursor.lastrowid
+    conn.execute("INSERT INTO units (subject_id, unit_number, title, topics) VALUES (?, ?, ?, ?)",
+                 (subject_id, 1, 'Transactions', 'ACID, locking'))
+    # Weak matches indexed ahead of the best one must not push it off the first page
+    conn.executemany(
+        "INSERT INTO subjects (name, code, credits, description, specialization_id, semester_id) VALUES (?, ?, ?, ?, ?, ?)",
+        [(f'Elective {i}', f'EL{i:03d}', 2, 'Case studies in design, including networks, ' * 5, spec_id, sem_id)
+         for i in range(300)])
+    conn.execute(
+        "INSERT INTO subjects (name, code, credits, description, specialization_id, semester_id) VALUES (?, ?, ?, ?, ?, ?)",
+        ('Networks', 'CS401', 4, 'Networks', spec_id, sem_id))
+    conn.commit()
+    db_config.configure_pool(db_path)
+
+    with app.app_context():
+        by_prefix = search_catalogue('datab')['results']
+        by_topic = search_catalogue('acid')['results']
+        best_match = search_catalogue('networks')['results'][:1]
+        conn.execute("UPDATE subjects SET is_active = 0 WHERE id = ?", (subject_id,))
+        conn.commit()
+        after_delete = search_catalogue('transactions')['results']
+    conn.close()
+
+    assert [r['kind'] for r in by_prefix] == ['subject'] and [r['kind'] for r in by_topic] == ['unit'] \
+        and '<mark>' in by_prefix[0]['title'] and not after_delete \
+        and [r['subject_code'] for r in best_match] == ['CS401'], \
+        f"Search check failed: {by_prefix}, {by_topic}, {best_match}, {after_delete}"
+    print("✅ Search index follows catalogue writes and ranks every match")
+
+def test_catalogue_api():
+    """Test keyset pagination, field selection and conditional GET on the JSON API"""
+    import os
+    import sqlite3
+    import tempfile
+    import db_config
+    from app import app
+    from migrate import run_migrations
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'api.db')
+    conn = sqlite3.connect(db_path)
+    run_migrations(conn)
+    expected = [row[0] for row in conn.execute(
+        "SELECT name FROM specializations WHERE program_id = 1 AND is_active = 1 ORDER BY name, id")]
+    conn.close()
+    db_config.configure_pool(db_path)
+
+    client = app.test_client()
+    names, after, pages = [], None, 0
+    while True:
+        url = '/api/v1/programs/1/specializations?limit=1&fields=name'
+        page = client.get(url + (f'&after={after}' if after else '')).get_json()
+        names += [row['name'] for row in page['data']]
+        pages += 1
+        after = page['next']
+        if not after:
+            break
+
+    first = client.get('/api/v1/programs?fields=id,specialization_count')
+    revalidated = client.get('/api/v1/programs?fields=id,specialization_count',
+                             headers={'If-None-Match': first.headers['ETag']})
+    bad_field = client.get('/api/v1/programs?fields=password_hash')
+    bad_cursor = client.get('/api/v1/programs?after=not-a-cursor')
+
+    assert names == expected and pages == len(expected) \
+        and set(first.get_json()['data'][0]) == {'id', 'specialization_count'} \
+        and revalidated.status_code == 304 \
+        and bad_field.status_code == 400 and bad_cursor.status_code == 400, \
+        (f"API check failed: {names} vs {expected}, {revalidated.status_code}, "
+         f"{bad_field.status_code}, {bad_cursor.status_code}")
+    print(f"✅ API paged {len(names)} specializations, revalidated with 304")
+
+def test_ajax_response_cache():
+    """Test that the dropdown endpoints are served from the versioned response cache"""
+    import os
+    import sqlite3
+    import tempfile
+    import db_config
+    from app import app
+    from catalogue_cache import bump_catalogue_version, response_cache
+    from migrate import run_migrations
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'ajax.db')
+    conn = sqlite3.connect(db_path)
+    run_migrations(conn)
+    conn.executemany("INSERT INTO specializations (program_id, name, code) VALUES (1, ?, ?)",
+                     [(f'Specialization {i}', f'SP{i}') for i in range(50)])
+    conn.commit()
+    db_config.configure_pool(db_path)
+
+    client = app.test_client()
+    first = client.get('/get_specializations/1', headers={'Accept-Encoding': 'gzip'})
+    hits = response_cache.stats()['hits']
+    repeat = client.get('/get_specializations/1')
+    revalidated = client.get('/get_specializations/1', headers={'If-None-Match': first.headers['ETag']})
+    served_from_cache = response_cache.stats()['hits'] - hits == 2
+
+    conn.execute("UPDATE specializations SET name = 'Renamed' WHERE code = 'SP0'")
+    bump_catalogue_version(conn.cursor())
+    conn.commit()
+    changed = client.get('/get_specializations/1', headers={'If-None-Match': first.headers['ETag']})
+    conn.close()
+
+    names = [spec['name'] for spec in changed.get_json()['specializations']]
+    assert first.headers.get('Content-Encoding') == 'gzip' and served_from_cache \
+        and len(repeat.get_json()['specializations']) == 54 \
+        and revalidated.status_code == 304 and changed.status_code == 200 and 'Renamed' in names, \
+        f"Response cache check failed: {first.headers}, {revalidated.status_code}, {changed.status_code}"
+    print("✅ AJAX responses cached per catalogue version")
+
+def test_subject_revalidation():
+    """Test that the subject page revalidates on its ETag alone, so removed units are never a stale 304"""
+    import os
+    import sqlite3
+    import tempfile
+    import db_config
+    from app import app
+    from migrate import run_migrations
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'subject.db')
+    conn = sqlite3.connect(db_path)
+    run_migrations(conn)
+    conn.execute("INSERT INTO subjects (name, code) VALUES ('Compilers', 'CS401')")
+    conn.executemany("INSERT INTO units (subject_id, unit_number, title) VALUES (1, ?, ?)",
+                     [(1, 'Lexing'), (2, 'Parsing')])
+    conn.commit()
+    db_config.configure_pool(db_path)
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = '1'
+    first = client.get('/subject/1')
+    revalidated = client.get('/subject/1', headers={'If-None-Match': first.headers['ETag']})
+    conn.execute("UPDATE units SET is_active = 0 WHERE unit_number = 2")
+    conn.commit()
+    conn.close()
+    since = client.get('/subject/1', headers={'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'})
+    changed = client.get('/subject/1', headers={'If-None-Match': first.headers['ETag']})
+
+    assert first.status_code == 200 and 'Last-Modified' not in first.headers \
+        and revalidated.status_code == 304 and since.status_code == 200 \
+        and changed.status_code == 200 and b'Parsing' not in changed.data, \
+        f"Subject revalidation failed: {first.status_code}, {revalidated.status_code}, " \
+        f"{since.status_code}, {changed.status_code}"
+    print("✅ Subject pages revalidate on their ETag only")
+
+def test_fragment_cache():
+    """Test that cached admin fragments skip their queries until the catalogue changes"""
+    import os
+    import sqlite3
+    import tempfile
+    import db_config
+    from app import app
+    from migrate import run_migrations
+    from werkzeug.security import generate_password_hash
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'fragments.db')
+    conn = sqlite3.connect(db_path)
+    run_migrations(conn)
+    conn.execute("UPDATE users SET password_hash = ? WHERE email = 'admin@syllabus.com'",
+                 (generate_password_hash('admin123'),))
+    subject_id = conn.execute(
+        "INSERT INTO subjects (name, code, specialization_id, semester_id) VALUES ('Compilers', 'CS401', 1, 1)"
+    ).lastrowid
+    conn.commit()
+    conn.close()
+    # A single pooled connection, so tracing it sees every request's queries
+    pool = db_config.configure_pool(db_path, size=1)
+
+    client = app.test_client()
+    client.post('/login', data={'email': 'admin@syllabus.com', 'password': 'admin123'})
+    client.get('/admin/units')
+
+    statements = []
+    raw = pool.acquire()
+    raw.set_trace_callback(statements.append)
+    pool.release(raw)
+    cached = client.get('/admin/units')
+    raw.set_trace_callback(None)
+    listing_queries = [sql for sql in statements if 'FROM units' in sql or 'FROM subjects' in sql]
+
+    client.post('/admin/units', data={'subject_id': subject_id, 'unit_number': 1, 'title': 'Parsing'})
+    refreshed = client.get('/admin/units')
+    db_config.configure_pool(db_path, size=db_config.POOL_SIZE)
+
+    assert cached.status_code == 200 and statements and not listing_queries and b'Parsing' in refreshed.data, \
+        f"Fragment cache check failed: {cached.status_code}, {listing_queries}"
+    print("✅ Admin fragments served from cache and refreshed on catalogue writes")
+
+def test_request_instrumentation():
+    """Test the Server-Timing header, /metrics, its allowlist and the per-request query budget"""
+    import os
+    import sqlite3
+    import tempfile
+    import db_config
+    import instrumentation
+    from app import app
+    from migrate import run_migrations
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'instrumentation.db')
+    conn = sqlite3.connect(db_path)
+    run_migrations(conn)
+    conn.close()
+    db_config.configure_pool(db_path)
+
+    client = app.test_client()
+    response = client.get('/api/v1/programs')
+    timing = response.headers.get('Server-Timing', '')
+
+    previous = app.config['QUERY_BUDGET']
+    app.config['QUERY_BUDGET'] = 1
+    before = instrumentation.metrics.budget_exceeded['api.list_programs']
+    client.get('/api/v1/programs?limit=2')
+    exceeded = instrumentation.metrics.budget_exceeded['api.list_programs'] - before
+    app.config['QUERY_BUDGET'] = previous
+
+    # Anonymous clients get neither metrics nor health details
+    hidden = client.get('/metrics').status_code == 403 and 'db_pool' not in client.get('/health').get_json()
+    previous = app.config['METRICS_ALLOWLIST']
+    app.config['METRICS_ALLOWLIST'] = '10.0.0.0/8, 127.0.0.1'
+    body = client.get('/metrics').get_data(as_text=True)
+    detailed = 'db_pool' in client.get('/health').get_json()
+    app.config['METRICS_ALLOWLIST'] = previous
+    assert ('db;dur=' in timing and 'queries' in timing and exceeded == 1 and hidden and detailed
+            and 'syllabus_db_queries_total{endpoint="api.list_programs"}' in body), \
+        f"Instrumentation check failed: {timing!r}, exceeded={exceeded}, hidden={hidden}, detailed={detailed}"
+    print("✅ Requests report Server-Timing, metrics and query budget overruns")
+
+def test_password_rehash_on_login():
+    """Test that logins verify on the hashing pool and upgrade hashes to the current policy"""
+    import os
+    import sqlite3
+    import tempfile
+    import db_config
+    import passwords
+    from app import app
+    from migrate import run_migrations
+    from werkzeug.security import generate_password_hash
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'passwords.db')
+    conn = sqlite3.connect(db_path)
+    run_migrations(conn)
+    conn.execute("UPDATE users SET password_hash = ? WHERE email = 'admin@syllabus.com'",
+                 (generate_password_hash('admin123', 'pbkdf2:sha256:1000'),))
+    conn.commit()
+    db_config.configure_pool(db_path)
+    hasher = passwords.configure(method='pbkdf2:sha256:2000', workers=2, queue=0)
+
+    login = app.test_client().post('/login', data={'email': 'admin@syllabus.com', 'password': 'admin123'})
+    upgraded = conn.execute("SELECT password_hash FROM users WHERE email = 'admin@syllabus.com'").fetchone()[0]
+    wrong = app.test_client().post('/login', data={'email': 'admin@syllabus.com', 'password': 'nope'})
+
+    # With every pool slot taken, logins are turned away rather than queued
+    hasher._slots.acquire()
+    hasher._slots.acquire()
+    busy = app.test_client().post('/login', data={'email': 'admin@syllabus.com', 'password': 'admin123'})
+    hasher._slots.release()
+    hasher._slots.release()
+    stats = hasher.stats()
+    conn.close()
+    passwords.configure(method=passwords.PASSWORD_HASH_METHOD, workers=passwords.PASSWORD_VERIFY_WORKERS,
+                        queue=passwords.PASSWORD_VERIFY_QUEUE)
+
+    ok = (login.status_code == 302 and upgraded.startswith('pbkdf2:sha256:2000$')
+          and wrong.status_code == 200 and busy.status_code == 503 and stats['rehashed'] == 1
+          and stats['logins'] == {'success': 1, 'failure': 1, 'busy': 1})
+    assert ok, \
+        f"Password policy check failed: {login.status_code}, {upgraded[:24]}, {busy.status_code}, {stats}"
+    print("✅ Password hashes upgraded on login and verified on a bounded pool")
+
+def test_identity_invalidation():
+    """Test that users cached or signed into sessions are dropped when another worker demotes or deletes them"""
+    import os
+    import sqlite3
+    import tempfile
+    import time
+    import db_config
+    import models
+    from app import app
+    from migrate import run_migrations
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'identity.db')
+    conn = sqlite3.connect(db_path)
+    run_migrations(conn)
+    conn.execute("INSERT INTO users (username, email, password_hash, role, full_name) "
+                 "VALUES ('kim', 'kim@example.com', 'x', 'admin', 'Kim')")
+    conn.commit()
+    user_id = conn.execute("SELECT id FROM users WHERE username = 'kim'").fetchone()[0]
+    conn.close()
+    db_config.configure_pool(db_path)
+    models.user_cache.invalidate()
+
+    def other_worker(sql):
+        other = sqlite3.connect(db_path)
+        other.execute(sql, (user_id,))
+        other.commit()
+        other.close()
+
+    with app.test_request_context():
+        claims = models.load_user_identity(user_id).to_claims()
+    with app.test_request_context():
+        cached = models.load_user_identity(user_id, claims)
+    other_worker("UPDATE users SET role = 'student' WHERE id = ?")
+    with app.test_request_context():
+        demoted = models.load_user_identity(user_id, claims)
+        stale_claims = models.claims_current(claims, user_id)
+        claims = demoted.to_claims()
+    expired = dict(claims, issued_at=time.time() - models.USER_CLAIMS_MAX_AGE - 1)
+    with app.test_request_context():
+        expired_current = models.claims_current(expired, user_id)
+    other_worker("DELETE FROM users WHERE id = ?")
+    with app.test_request_context():
+        deleted = models.load_user_identity(user_id, claims)
+
+    assert cached.role == 'admin' and demoted.role == 'student' and not stale_claims \
+        and not expired_current and deleted is None, \
+        f"Identity invalidation failed: demoted={demoted.role}, stale_claims={stale_claims}, " \
+        f"expired={expired_current}, deleted={deleted}"
+    print("✅ Demoted and deleted users are reloaded in every worker")
+
+def test_login_throttle():
+    """Test that login and registration attempts are rate limited before any password work"""
+    import os
+    import sqlite3
+    import tempfile
+    import db_config
+    import passwords
+    import throttle
+    from app import app
+    from migrate import run_migrations
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'throttle.db')
+    conn = sqlite3.connect(db_path)
+    run_migrations(conn)
+    conn.close()
+    db_config.configure_pool(db_path)
+    limits = dict(backend='sqlite', login_ip=(10, 1), login_account=(2, 0.01), register_ip=(1, 0.01))
+    throttle.configure(enabled=True, **limits)
+
+    client = app.test_client()
+    bad_login = {'email': 'admin@syllabus.com', 'password': 'wrong'}
+    attempts = [client.post('/login', data=bad_login).status_code for _ in range(2)]
+    verifications = passwords.get_password_stats()['verifications']
+    throttled = client.post('/login', data=bad_login)
+    hashed_while_throttled = passwords.get_password_stats()['verifications'] - verifications
+    other_account = client.post('/login', data={'email': 'student@example.com', 'password': 'wrong'})
+    # Buckets live in SQLite, so another worker sees the same account as exhausted
+    other_worker = throttle.LoginThrottle(**limits)
+    with app.app_context():
+        other_worker_wait = other_worker.check_login('10.0.0.9', 'Admin@Syllabus.com ')
+
+    registration = {'username': 'newstudent', 'email': 'new@example.com', 'password': 'secret1',
+                    'confirm_password': 'secret1', 'full_name': 'New Student'}
+    registered = app.test_client().post('/register', data=registration)
+    second_registration = app.test_client().post('/register', data=dict(registration, email='new2@example.com'))
+    stats = throttle.get_throttle_stats()
+    throttle.configure(enabled=throttle.LOGIN_THROTTLE, backend=throttle.LOGIN_THROTTLE_BACKEND,
+                       login_ip=(throttle.LOGIN_IP_BURST, throttle.LOGIN_IP_PER_MINUTE),
+                       login_account=(throttle.LOGIN_ACCOUNT_BURST, throttle.LOGIN_ACCOUNT_PER_MINUTE),
+                       register_ip=(throttle.REGISTER_IP_BURST, throttle.REGISTER_IP_PER_MINUTE))
+
+    ok = (attempts == [200, 200] and throttled.status_code == 429
+          and int(throttled.headers.get('Retry-After', 0)) > 0 and hashed_while_throttled == 0
+          and other_account.status_code == 200 and other_worker_wait > 0
+          and registered.status_code == 302 and second_registration.status_code == 429
+          and stats['rejected'] == {'login_account': 1, 'register_ip': 1})
+    assert ok, \
+        (f"Login throttle check failed: {attempts}, {throttled.status_code}, {other_account.status_code}, "
+         f"{other_worker_wait}, {registered.status_code}, {second_registration.status_code}, {stats}")
+    print("✅ Logins and registrations throttled per account and IP before hashing")
+
+def test_student_enrollment():
+    """Test enrollment CRUD and that my syllabus shows only the student's slice"""
+    import os
+    import sqlite3
+    import tempfile
+    import db_config
+    from app import app
+    from migrate import run_migrations
+    from werkzeug.security import generate_password_hash
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'enrollments.db')
+    conn = sqlite3.connect(db_path)
+    run_migrations(conn)
+    conn.execute("INSERT INTO users (username, email, password_hash, role, full_name) "
+                 "VALUES ('learner', 'learner@example.com', ?, 'student', 'Learner')",
+                 (generate_password_hash('secret1'),))
+    conn.executemany("INSERT INTO subjects (name, code, specialization_id, semester_id) VALUES (?, ?, ?, ?)",
+                     [('Compilers', 'CS401', 1, 1), ('Thermodynamics', 'ME201', 2, 1)])
+    conn.commit()
+    db_config.configure_pool(db_path)
+
+    client = app.test_client()
+    client.post('/login', data={'email': 'learner@example.com', 'password': 'secret1'})
+    mismatched = client.post('/enrollments', data={'program_id': 2, 'specialization_id': 1})
+    client.post('/enrollments', data={'program_id': 1, 'specialization_id': 2})
+    # Enrolling again in the same program switches specialization instead of adding a row
+    client.post('/enrollments', data={'program_id': 1, 'specialization_id': 1})
+    enrollment_id, = conn.execute(
+        "SELECT id FROM student_enrollments WHERE is_active = 1 AND specialization_id = 1").fetchone()
+    page = client.get('/my_syllabus')
+    dashboard = client.get('/dashboard')
+    client.post(f'/enrollments/{enrollment_id}/update', data={'specialization_id': 2})
+    switched = client.get('/my_syllabus')
+    client.post(f'/enrollments/{enrollment_id}/delete')
+    rows = conn.execute("SELECT is_active FROM student_enrollments").fetchall()
+    conn.close()
+
+    ok = (mismatched.status_code == 302 and page.status_code == 200
+          and b'Compilers' in page.data and b'Thermodynamics' not in page.data
+          and b'Thermodynamics' in switched.data and b'Compilers' not in switched.data
+          and b'Bachelor of Technology' in dashboard.data and rows == [(0,)])
+    assert ok, f"Enrollment check failed: {page.status_code}, {dashboard.status_code}, {rows}"
+    print("✅ Enrollments saved, switched and dropped; my syllabus shows only the student's slice")
+
+def test_students_api():
+    """Test batch onboarding and the streamed, cursor-paginated students listing"""
+    import json
+    import os
+    import sqlite3
+    import tempfile
+    import db_config
+    import passwords
+    from app import app
+    from migrate import run_migrations
+    from werkzeug.security import generate_password_hash
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'students.db')
+    conn = sqlite3.connect(db_path)
+    run_migrations(conn)
+    conn.execute("UPDATE users SET password_hash = ? WHERE email = 'admin@syllabus.com'",
+                 (generate_password_hash('admin123'),))
+    conn.commit()
+    db_config.configure_pool(db_path)
+
+    anonymous = app.test_client().get('/students')
+    client = app.test_client()
+    client.post('/login', data={'email': 'admin@syllabus.com', 'password': 'admin123'})
+    single = client.post('/add_student', json={'email': 'ada@example.com', 'full_name': 'Ada',
+                                               'password': 'secret1', 'program_id': 1, 'specialization_id': 1})
+    intake = ''.join(json.dumps({'email': f'student{n}@example.com', 'full_name': f'Student {n}',
+                                 'password': 'secret1', 'program_id': 1, 'specialization_id': 1 + n % 2}) + '\n'
+                     for n in range(3000))
+    # A cheap hash keeps 3000 new passwords fast
+    passwords.configure(method='pbkdf2:sha256:1000')
+    created = client.post('/students', data=intake, content_type='application/x-ndjson')
+    passwords.configure(method=passwords.PASSWORD_HASH_METHOD)
+    # Re-running an intake only refreshes enrollments; existing students need no password
+    rerun = client.post('/students', data=intake.replace('"password": "secret1", ', ''),
+                        content_type='application/x-ndjson')
+    invalid = client.post('/students', json=[{'email': 'new@example.com', 'full_name': 'New',
+                                              'program_id': 2, 'specialization_id': 1},
+                                             {'email': 'admin@syllabus.com', 'full_name': 'Admin'}])
+    users = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    listed = []
+    pages = 0
+    url = '/students?specialization_id=2&limit=1000'
+    while url:
+        page = client.get(url)
+        listed += [json.loads(line) for line in page.data.decode().splitlines()]
+        pages += 1
+        url = page.headers.get('Link', '').partition('<')[2].partition('>')[0]
+    everyone = client.get('/students?limit=50000').data.decode().splitlines()
+    conn.close()
+
+    ok = (anonymous.status_code == 401 and single.status_code == 201
+          and created.status_code == 201 and created.json['created'] == 3000
+          and rerun.status_code == 201 and rerun.json['created'] == 0 and rerun.json['existing'] == 3000
+          and invalid.status_code == 400 and len(invalid.json['errors']) == 3
+          and any('password is required' in error for error in invalid.json['errors']) and users == 3002
+          and pages == 2 and len(listed) == 1500 and len({s['id'] for s in listed}) == 1500
+          and all(s['enrollments'][0]['specialization_id'] == 2 for s in listed)
+          and len(everyone) == 3001)
+    assert ok, \
+        (f"Students API check failed: {anonymous.status_code}, {single.status_code}, {created.json}, "
+         f"{rerun.json}, {invalid.json}, {users}, {pages}, {len(listed)}, {len(everyone)}")
+    print("✅ Students onboarded in batches and listed a streamed page at a time")
+
+def test_student_import_race():
+    """Test that an account registered while an intake is hashing is reported, not a crash"""
+    import os
+    import sqlite3
+    import tempfile
+    import db_config
+    import passwords
+    import student_io
+    from app import app
+    from migrate import run_migrations
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'race.db')
+    conn = sqlite3.connect(db_path)
+    run_migrations(conn)
+    conn.close()
+    db_config.configure_pool(db_path)
+
+    def register_meanwhile(secrets):
+        other = sqlite3.connect(db_path)
+        other.execute("INSERT INTO users (username, email, password_hash, role, full_name) "
+                      "VALUES ('lin', 'lin@example.com', 'x', 'student', 'Lin')")
+        other.commit()
+        other.close()
+        return [f'hash-{n}' for n, _ in enumerate(secrets)]
+
+    hash_passwords = passwords.hash_passwords
+    passwords.hash_passwords = register_meanwhile
+    try:
+        with app.app_context():
+            student_io.import_students([(1, {'email': 'ann@example.com', 'full_name': 'Ann', 'password': 'secret1'}),
+                                        (2, {'email': 'bo@example.com', 'full_name': 'Bo', 'username': 'lin',
+                                             'password': 'secret1'})])
+        errors = []
+    except student_io.StudentImportError as e:
+        errors = e.errors
+    finally:
+        passwords.hash_passwords = hash_passwords
+    conn = sqlite3.connect(db_path)
+    written = conn.execute("SELECT COUNT(*) FROM users WHERE email IN ('ann@example.com', 'bo@example.com')").fetchone()[0]
+    conn.close()
+
+    assert len(errors) == 1 and "username 'lin' is taken" in errors[0] and written == 0, \
+        f"Import race check failed: errors={errors}, written={written}"
+    print("✅ Accounts registered during an intake are caught under the write lock")
+
+def test_student_roster():
+    """Test the keyset-paginated roster, prefix search and trigger-maintained counters"""
+    import os
+    import sqlite3
+    import tempfile
+    import db_config
+    import passwords
+    import student_io
+    from app import app
+    from migrate import run_migrations
+    from werkzeug.security import generate_password_hash
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'roster.db')
+    conn = sqlite3.connect(db_path)
+    run_migrations(conn)
+    conn.execute("UPDATE users SET password_hash = ? WHERE email = 'admin@syllabus.com'",
+                 (generate_password_hash('admin123'),))
+    conn.commit()
+    pool = db_config.configure_pool(db_path, size=1)
+
+    with app.app_context():
+        passwords.configure(method='pbkdf2:sha256:1000')
+        student_io.import_students(enumerate(
+            ({'email': f'{name.lower()}{n}@example.com', 'full_name': f'{name} {n}', 'password': 'secret1',
+              'program_id': 1, 'specialization_id': 1 + n % 4}
+             for n in range(60) for name in ('Ada', 'Alan', 'Grace')), start=1))
+        passwords.configure(method=passwords.PASSWORD_HASH_METHOD)
+    conn.execute("UPDATE student_enrollments SET is_active = 0 WHERE student_id % 3 = 0")
+    conn.execute("UPDATE student_enrollments SET program_id = 2 WHERE student_id % 3 = 1")
+    conn.execute("UPDATE users SET role = 'admin' WHERE email = 'ada0@example.com'")
+    conn.execute("DELETE FROM users WHERE email = 'ada1@example.com'")
+    conn.commit()
+
+    client = app.test_client()
+    client.post('/login', data={'email': 'admin@syllabus.com', 'password': 'admin123'})
+    client.post('/admin/students', data={'email': 'zoe@example.com', 'full_name': 'Zoe', 'password': 'secret1',
+                                         'program_id': 1, 'specialization_id': 2})
+    roster = []
+    url = '/admin/api/students?q=AL&limit=25'
+    while url:
+        page = client.get(url).json
+        roster += page['data']
+        url = f"/admin/api/students?q=AL&limit=25&after={page['next']}" if page['next'] else None
+    counts = page['counts']
+    expected_roles = dict(conn.execute("SELECT role, COUNT(*) FROM users GROUP BY role").fetchall())
+    expected_programs = dict(conn.execute(
+        "SELECT program_id, COUNT(*) FROM student_enrollments WHERE is_active = 1 GROUP BY program_id").fetchall())
+    conn.close()
+
+    # The dashboard reads the counters instead of counting users
+    statements = []
+    raw = pool.acquire()
+    raw.set_trace_callback(statements.append)
+    pool.release(raw)
+    dashboard = client.get('/dashboard')
+    raw.set_trace_callback(None)
+    page_html = client.get('/admin/students?q=zo')
+    db_config.configure_pool(db_path, size=db_config.POOL_SIZE)
+
+    names = [student['full_name'] for student in roster]
+    ok = (len(roster) == 60 and names == sorted(names, key=str.lower)
+          and all(name.startswith('Alan') for name in names)
+          and counts['users'] == expected_roles
+          and {c['id']: c['enrollments'] for c in counts['enrollments'] if c['enrollments']} == expected_programs
+          and dashboard.status_code == 200 and not [sql for sql in statements if 'FROM users' in sql]
+          and b'zoe@example.com' in page_html.data and b'ada2@example.com' not in page_html.data)
+    assert ok, \
+        (f"Roster check failed: {len(roster)}, {counts}, {expected_roles}, {expected_programs}, "
+         f"{dashboard.status_code}, {[sql for sql in statements if 'FROM users' in sql]}")
+    print("✅ Roster paged by name and searched by prefix; counters match the tables")
+
+def test_setup_keeps_counters():
+    """Test that re-running setup.py re-seeds the admin without counting it again"""
+    import os
+    import sqlite3
+    import subprocess
+    import sys
+    import tempfile
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'setup.db')
+    env = dict(os.environ, DATABASE_PATH=db_path)
+    for _ in range(2):
+        subprocess.run([sys.executable, 'setup.py'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                       env=env, capture_output=True, check=True, timeout=120)
+    conn = sqlite3.connect(db_path)
+    counted = dict(conn.execute("SELECT role, count FROM user_role_counts WHERE count != 0"))
+    actual = dict(conn.execute("SELECT role, COUNT(*) FROM users GROUP BY role"))
+    conn.close()
+
+    assert counted == actual == {'admin': 1}, f"Setup counter check failed: counted={counted}, actual={actual}"
+    print(f"✅ setup.py runs twice and the role counters still match the users: {counted}")
+
+def test_streaming_upload():
+    """Test that uploads are hashed, size-limited and committed atomically"""
+    import hashlib
+    import os
+    import tempfile
+    from file_store import IngestStream, UploadTooLarge
+
+    upload_dir = tempfile.mkdtemp()
+    data = b'%PDF-1.4\n' + os.urandom(200000)
+    ingest = IngestStream(upload_dir, max_size=len(data))
+    for i in range(0, len(data), 65536):
+        ingest.write(data[i:i + 65536])
+    final_path = ingest.commit(os.path.join(upload_dir, 'syllabus.pdf'))
+    with open(final_path, 'rb') as f:
+        stored = f.read()
+
+    oversized = IngestStream(upload_dir, max_size=10)
+    try:
+        oversized.write(b'x' * 11)
+        rejected = False
+    except UploadTooLarge:
+        rejected = True
+    oversized.discard()
+
+    ok = (stored == data and ingest.sha256 == hashlib.sha256(data).hexdigest()
+          and ingest.sniff_mime() == 'application/pdf' and rejected
+          and os.listdir(upload_dir) == ['syllabus.pdf'])
+    assert ok, f"Streaming upload check failed: {os.listdir(upload_dir)}"
+    print("✅ Streaming upload writes each byte once")
+
+def test_blob_reference_counting():
+    """Test that shared upload blobs survive until their last row is deleted"""
+    import os
+    import sqlite3
+    import tempfile
+    from file_store import IngestStream, release_blob, remove_released_blob
+    from migrate import run_migrations
+
+    upload_dir = tempfile.mkdtemp()
+    conn = sqlite3.connect(os.path.join(upload_dir, 'blobs.db'))
+    run_migrations(conn)
+    paths = []
+    for subject_id in (1, 2):
+        ingest = IngestStream(upload_dir)
+        ingest.write(b'%PDF-1.4 shared syllabus')
+        paths.append(ingest.commit_blob(upload_dir))
+        conn.execute(
+            "INSERT INTO syllabus_files (subject_id, filename, original_filename, file_path, file_size, content_hash) VALUES (?, ?, ?, ?, ?, ?)",
+            (subject_id, 'a.pdf', 'a.pdf', paths[-1], ingest.size, ingest.sha256))
+    content_hash = ingest.sha256
+
+    removed = []
+    for (file_id,) in conn.execute("SELECT id FROM syllabus_files ORDER BY id").fetchall():
+        conn.execute("DELETE FROM syllabus_files WHERE id = ?", (file_id,))
+        removed.append(release_blob(conn.cursor(), content_hash))
+    # Nothing is unlinked until the delete commits
+    kept_until_commit = os.path.exists(paths[0])
+    conn.commit()
+    removed.append(remove_released_blob(conn, content_hash, paths[0]))
+    conn.close()
+
+    assert paths[0] == paths[1] and ingest.deduplicated and removed == [False, True, True] \
+        and kept_until_commit and not os.path.exists(paths[0]), \
+        f"Blob reference counting failed: {paths}, {removed}"
+    print("✅ Identical uploads share one reference-counted blob")
+
+def test_cacheable_download():
+    """Test that blob downloads carry strong ETags and honour Range requests"""
+    import os
+    import tempfile
+    from app import app
+    from file_store import IngestStream, send_stored_file
+
+    upload_dir = tempfile.mkdtemp()
+    ingest = IngestStream(upload_dir)
+    ingest.write(b'%PDF-1.4 ' + b'x' * 1000)
+    metadata = {'file_path': ingest.commit_blob(upload_dir), 'content_hash': ingest.sha256,
+                'file_type': 'application/pdf'}
+
+    with app.test_request_context(headers={'Range': 'bytes=0-9'}):
+        partial = send_stored_file(metadata, upload_dir, 'syllabus.pdf')
+    with app.test_request_context(headers={'If-None-Match': f'"{ingest.sha256}"'}):
+        cached = send_stored_file(metadata, upload_dir, 'syllabus.pdf')
+    partial.direct_passthrough = False
+    cached.close()
+
+    assert partial.status_code == 206 and partial.get_data() == b'%PDF-1.4 x' \
+        and cached.status_code == 304 and cached.cache_control.immutable, \
+        f"Download check failed: {partial.status_code}, {cached.status_code}, {cached.headers}"
+    print("✅ Downloads are range-capable and cacheable by content hash")
+
+def test_orphan_cleanup():
+    """Test that incremental cleanup removes only stale, unreferenced files"""
+    import os
+    import sqlite3
+    import tempfile
+    import time
+    import db_config
+    import maintenance
+    from file_store import IngestStream
+    from migrate import run_migrations
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'maintenance.db')
+    conn = sqlite3.connect(db_path)
+    run_migrations(conn)
+    db_config.configure_pool(db_path)
+
+    upload_dir = tempfile.mkdtemp()
+    stale = time.time() - 2 * maintenance.MAINTENANCE_GRACE
+    paths = []
+    for i in range(6):
+        ingest = IngestStream(upload_dir)
+        ingest.write(b'syllabus %d' % i)
+        paths.append(ingest.commit_blob(upload_dir))
+        if i < 5:
+            os.utime(paths[-1], (stale, stale))
+        if i % 2 == 0:
+            conn.execute(
+                "INSERT INTO syllabus_files (subject_id, filename, original_filename, file_path, file_size, content_hash) VALUES (1, 'a', 'a', ?, ?, ?)",
+                (paths[-1], ingest.size, ingest.sha256))
+    conn.commit()
+    conn.close()
+
+    dry_run = maintenance.cleanup_orphaned_files(upload_dir, dry_run=True)
+    report = maintenance.cleanup_orphaned_files(upload_dir, max_files=1)
+    batches = 1
+    while not report['complete'] and batches < 20:
+        report = maintenance.cleanup_orphaned_files(upload_dir, report['cursor'], max_files=1)
+        batches += 1
+    remaining = [os.path.exists(path) for path in paths]
+
+    # Blobs 1 and 3 are orphaned and stale; 5 is orphaned but too new to touch
+    assert dry_run['removed'] == 2 and batches > 1 and remaining == [True, False, True, False, True, True], \
+        f"Orphan cleanup check failed: {dry_run}, {remaining}"
+    print(f"✅ Orphan cleanup resumed across {batches} runs")
+
+def test_catalogue_import_export():
+    """Test that a catalogue export can be imported back as upserts"""
+    import io
+    import os
+    import sqlite3
+    import tempfile
+    import db_config
+    from catalogue_io import CatalogueImportError, export_catalogue, import_catalogue
+    from migrate import run_migrations
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'catalogue.db')
+    conn = sqlite3.connect(db_path)
+    run_migrations(conn)
+    conn.close()
+    db_config.configure_pool(db_path)
+
+    csv_file = (
+        "type,program_code,specialization_code,subject_code,code,semester_number,unit_number,name,title\n"
+        "program,,,,BSC,,,Bachelor of Science,\n"
+        "specialization,BSC,,,PHY,,,Physics,\n"
+        "semester,BSC,,,,1,,First Semester,\n"
+        "subject,BSC,PHY,,PHY101,1,,Mechanics,\n"
+        "unit,,,PHY101,,,1,,Kinematics\n"
+        "unit,,,PHY101,,,2,,Dynamics\n"
+    )
+    first = import_catalogue(io.BytesIO(csv_file.encode()), 'csv')
+    exported = ''.join(export_catalogue('jsonl'))
+    second = import_catalogue(io.BytesIO(exported.encode()), 'jsonl')
+    try:
+        import_catalogue(io.BytesIO(b'type,subject_code,unit_number,title\nunit,NOPE,1,Lost\n'), 'csv')
+        rejected = False
+    except CatalogueImportError:
+        rejected = True
+
+    conn = sqlite3.connect(db_path)
+    units = conn.execute(
+        "SELECT COUNT(*) FROM units u JOIN subjects s ON s.id = u.subject_id WHERE s.code = 'PHY101'"
+    ).fetchone()[0]
+    conn.close()
+
+    assert first['units']['inserted'] == 2 and second['units'] == {'inserted': 0, 'updated': 2} \
+        and second['programs']['updated'] >= 1 and rejected and units == 2, \
+        f"Catalogue import/export failed: {first}, {second}, rejected={rejected}"
+    print("✅ Catalogue import/export round-trips")
+
+def test_benchmark_baseline():
+    """Test that the benchmark generates a catalogue and flags only real p95 regressions against a baseline"""
+    import os
+    import sqlite3
+    import tempfile
+    import benchmark
+    import passwords
+
+    work_dir = tempfile.mkdtemp()
+    db_path = os.path.join(work_dir, 'benchmark.db')
+    shape = {'programs': 1, 'specializations': 2, 'semesters': 2, 'subjects': 6,
+             'units': 2, 'files': 1, 'users': 3}
+    passwords.configure(method='pbkdf2:sha256:1000')
+    try:
+        ids = benchmark.generate_catalogue(db_path, os.path.join(work_dir, 'uploads'), **shape)
+    finally:
+        passwords.configure(method=passwords.PASSWORD_HASH_METHOD)
+    conn = sqlite3.connect(db_path)
+    units = conn.execute("SELECT COUNT(*) FROM units u JOIN subjects s ON s.id = u.subject_id "
+                         "WHERE s.code LIKE 'BSUB%'").fetchone()[0]
+    paths = [row[0] for row in conn.execute("SELECT file_path FROM syllabus_files WHERE id IN "
+                                            f"({','.join('?' * len(ids['files']))})", ids['files'])]
+    conn.close()
+
+    def result(p95_ms, errors=0):
+        return {'requests': 100, 'errors': errors, 'p50_ms': p95_ms / 2, 'p95_ms': p95_ms,
+                'p99_ms': p95_ms, 'rps': 100.0}
+
+    baseline_path = os.path.join(work_dir, 'baseline.json')
+    floor = benchmark.REGRESSION_FLOOR_MS
+    benchmark.save_baseline(baseline_path, shape, 1, {
+        'slower': result(10.0), 'within': result(10.0), 'noise': result(floor / 2),
+        'failing': result(10.0)})
+    regressions = benchmark.compare_baseline(baseline_path, shape, 1, {
+        'slower': result(10.0 * (1 + benchmark.REGRESSION_TOLERANCE) + floor),
+        'within': result(10.0 * (1 + benchmark.REGRESSION_TOLERANCE / 2)),
+        # Triples, but by less than the floor
+        'noise': result(floor * 1.5),
+        'failing': result(10.0, errors=1),
+        'new': result(50.0)})
+
+    assert len(ids['subjects']) == 6 and len(ids['pairs']) == 4 and units == 12 \
+        and len(paths) == 6 and all(path.startswith(work_dir) and os.path.exists(path) for path in paths) \
+        and regressions == ['slower', 'failing'], \
+        f"Benchmark check failed: subjects={len(ids['subjects'])}, units={units}, files={paths}, " \
+        f"regressions={regressions}"
+    print("✅ Benchmark catalogue generated; baseline comparison flags regressions past tolerance and floor")
+
+def test_app_factory():
+    """Test that create_app builds independent apps, loads libmagic lazily and survives a fork"""
+    import os
+    import subprocess
+    import sys
+    import sqlite3
+    import tempfile
+    import db_config
+    from app import create_app
+    from migrate import run_migrations
+
+    first, second = create_app('testing'), create_app('testing')
+    routed = first is not second and first.testing and 'dashboard' in first.view_functions
+    second.config['METRICS_ALLOWLIST'] = '127.0.0.1'
+    startup = second.test_client().get('/health').get_json()['startup']
+
+    # Building the app must not load libmagic; the first upload does
+    lazy = subprocess.run(
+        [sys.executable, '-c', "import sys, app; app.create_app(); print('magic' in sys.modules)"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True
+    ).stdout.strip().splitlines()[-1] == 'False'
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'fork.db')
+    conn = sqlite3.connect(db_path)
+    run_migrations(conn)
+    conn.close()
+    pool = db_config.configure_pool(db_path)
+    db_config.get_db_connection().close()
+    pid = os.fork()
+    if pid == 0:
+        # The child must get a pool of its own rather than the parent's connections
+        try:
+            conn = db_config.get_db_connection()
+            conn.execute("SELECT COUNT(*) FROM users").fetchone()
+            conn.close()
+            os._exit(0 if db_config.get_pool() is not pool else 1)
+        except BaseException:
+            os._exit(2)
+    _, status = os.waitpid(pid, 0)
+    conn = db_config.get_db_connection()
+    parent_ok = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] > 0
+    conn.close()
+    # Idle connections were closed before the fork, so this one was opened after it
+    reopened = pool.stats()['created'] == 2
+
+    assert routed and startup['preloaded'] is False and startup['create_ms'] > 0 and lazy \
+        and os.waitstatus_to_exitcode(status) == 0 and parent_ok and reopened, \
+        (f"App factory check failed: routed={routed}, startup={startup}, lazy={lazy}, "
+         f"child={os.waitstatus_to_exitcode(status)}, parent_ok={parent_ok}, stats={pool.stats()}")
+    print(f"✅ App factory builds apps lazily and pools survive a fork: {startup}")
+
+def test_gevent_serving():
+    """Test per-greenlet connections, offloaded hashing and lock waits under gevent, in a monkey-patched subprocess"""
+    import os
+    import subprocess
+    import sys
+    import tempfile
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'gevent.db')
+    script = f"""
+from gevent import monkey; monkey.patch_all()
+import json, sqlite3, gevent
+import db_config, passwords, serving
+from app import create_app
+from migrate import run_migrations
+
+conn = sqlite3.connect({db_path!r}); run_migrations(conn); conn.close()
+app = create_app('testing')
+db_config.configure_pool({db_path!r}, 8)
+seen = []
+
+def request(n):
+    with app.app_context():
+        conn = db_config.get_db_connection()
+        seen.append(id(conn._raw()))
+        gevent.sleep(0.05)
+        assert db_config.get_db_connection() is conn
+        conn.execute("SELECT COUNT(*) FROM users").fetchone()
+
+gevent.joinall([gevent.spawn(request, n) for n in range(8)], raise_error=True)
+ticks = []
+ticker = gevent.spawn(lambda: [(ticks.append(1), gevent.sleep(0.005)) for _ in iter(int, 1)])
+passwords.hash_password('gevent-password')
+ticker.kill()
+
+# A statement waiting for another connection's write lock must not stall the hub either
+locker = sqlite3.connect({db_path!r})
+locker.execute("BEGIN IMMEDIATE")
+def write():
+    with app.app_context():
+        conn = db_config.get_db_connection()
+        conn.execute("INSERT INTO programs (name, code) VALUES ('Waited', 'WAIT')")
+        conn.commit()
+writer = gevent.spawn(write)
+lock_ticks = []
+ticker = gevent.spawn(lambda: [(lock_ticks.append(1), gevent.sleep(0.005)) for _ in iter(int, 1)])
+gevent.sleep(0.2)
+locker.rollback()
+writer.get(timeout=5)
+ticker.kill()
+print(json.dumps({{'connections': len(set(seen)), 'pool': db_config.get_pool_stats(), 'ticks': len(ticks),
+                  'lock_ticks': len(lock_ticks), 'serving': serving.get_serving_stats()}}))
+"""
+    result = subprocess.run([sys.executable, '-c', script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, timeout=60)
+    report = json.loads(result.stdout.strip().splitlines()[-1]) if result.returncode == 0 else None
+
+    assert report and report['connections'] == 8 and report['pool']['in_use'] == 0 \
+        and report['pool']['cooperative'] and report['ticks'] > 0 and report['lock_ticks'] > 10 \
+        and report['serving']['mode'] == 'gevent' \
+        and report['serving']['offloaded'] >= 1, \
+        f"Gevent serving check failed: {report or result.stderr[-500:]}"
+    print(f"✅ Greenlets get their own connections; hashing and lock waits yield to them: {report}")
+
+def test_cooperative_commit_retry():
+    """Test that gevent-mode connections retry a commit that meets a lock instead of failing"""
+    import os
+    import sqlite3
+    import tempfile
+    import threading
+    from db_config import ConnectionPool, PooledConnection
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'commit.db')
+    pool = ConnectionPool(db_path, size=1)
+    # As in a monkey-patched worker: no waiting inside SQLite, retries in Python
+    pool.cooperative = True
+    conn = PooledConnection(pool, pool.acquire())
+    # In rollback-journal mode a commit needs every reader gone, so it can meet SQLITE_BUSY
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.execute("CREATE TABLE t (x)")
+    conn.commit()
+
+    reader = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+    reader.execute("BEGIN")
+    reader.execute("SELECT * FROM t").fetchall()
+    conn.execute("INSERT INTO t VALUES (1)")
+    threading.Timer(0.2, reader.rollback).start()
+    conn.commit()
+    conn.close()
+    committed = reader.execute("SELECT COUNT(*) FROM t").fetchone()[0]
+    reader.close()
+    pool.close_all()
+
+    assert committed == 1, f"Commit retry check failed: committed={committed}"
+    print("✅ Commits that meet a lock are retried cooperatively")
+
 def main():
     """Run all tests"""
     print("🧪 Testing Syllabus Management System...")
@@ -93,6 +1360,34 @@ def main():
         ("Health Check", test_health_check),
         ("Home Page", test_home_page),
         ("Database Connection", test_database_connection),
+        ("Connection Pool", test_connection_pool),
+        ("Request Connection", test_request_connection_isolation),
+        ("Catalogue Cache Errors", test_catalogue_cache_errors),
+        ("Query Plans", test_query_plans_use_indexes),
+        ("Admin Listings", test_admin_listings),
+        ("Search", test_search_catalogue),
+        ("Catalogue API", test_catalogue_api),
+        ("AJAX Response Cache", test_ajax_response_cache),
+        ("Subject Revalidation", test_subject_revalidation),
+        ("Fragment Cache", test_fragment_cache),
+        ("Request Instrumentation", test_request_instrumentation),
+        ("Password Rehash", test_password_rehash_on_login),
+        ("Identity Invalidation", test_identity_invalidation),
+        ("Login Throttle", test_login_throttle),
+        ("Student Enrollment", test_student_enrollment),
+        ("Students API", test_students_api),
+        ("Student Import Race", test_student_import_race),
+        ("Student Roster", test_student_roster),
+        ("Setup Counters", test_setup_keeps_counters),
+        ("Streaming Upload", test_streaming_upload),
+        ("Blob Store", test_blob_reference_counting),
+        ("Cacheable Download", test_cacheable_download),
+        ("Orphan Cleanup", test_orphan_cleanup),
+        ("Catalogue Import/Export", test_catalogue_import_export),
+        ("Benchmark Baseline", test_benchmark_baseline),
+        ("App Factory", test_app_factory),
+        ("Gevent Serving", test_gevent_serving),
+        ("Cooperative Commit Retry", test_cooperative_commit_retry),
         ("Admin Login", test_admin_login),
     ]
     
@@ -101,7 +1396,13 @@ def main():
     
     for test_name, test_func in tests:
         print(f"\n🔍 Testing: {test_name}")
-        if test_func():
+        # Live-server checks return True/False; the others raise when they fail
+        try:
+            ok = test_func() is not False
+        except Exception as e:
+            print(f"❌ {test_name} failed: {e}")
+            ok = False
+        if ok:
             passed += 1
         time.sleep(1)  # Small delay between tests
     
@@ -0,0 +1,210 @@
+"""
+Login and registration throttling for Syllabus Management System.
+
+Every attempt takes a token from a per-IP bucket and, for logins, from a
+per-account bucket, before the user is looked up or a password hashed.
+Buckets hold up to BURST tokens and refill at PER_MINUTE tokens a minute; an
+attempt is only allowed when all of its buckets have a token, and a rejected
+attempt costs nothing, so a client that waits is let back in on schedule.
+
+The sqlite backend keeps the buckets in the login_throttle table (migration
+0008), so the limits hold across all worker processes; the memory backend
+keeps them per process. Behind a reverse proxy set TRUSTED_PROXIES, or every
+client shares the proxy's address and its bucket.
+"""
+
+import os
+import random
+import threading
+import time
+from collections import Counter, OrderedDict
+from db_config import get_db_connection
+
+LOGIN_THROTTLE = os.environ.get('LOGIN_THROTTLE', 'True').lower() == 'true'
+LOGIN_THROTTLE_BACKEND = os.environ.get('LOGIN_THROTTLE_BACKEND', 'sqlite')  # sqlite or memory
+LOGIN_IP_BURST = float(os.environ.get('LOGIN_IP_BURST', 20))
+LOGIN_IP_PER_MINUTE = float(os.environ.get('LOGIN_IP_PER_MINUTE', 10))
+LOGIN_ACCOUNT_BURST = float(os.environ.get('LOGIN_ACCOUNT_BURST', 5))
+LOGIN_ACCOUNT_PER_MINUTE = float(os.environ.get('LOGIN_ACCOUNT_PER_MINUTE', 1))
+REGISTER_IP_BURST = float(os.environ.get('REGISTER_IP_BURST', 5))
+REGISTER_IP_PER_MINUTE = float(os.environ.get('REGISTER_IP_PER_MINUTE', 0.2))
+
+# Buckets kept by the memory backend; evicted ones start full again
+MEMORY_BUCKETS = 100000
+# Chance that an attempt also deletes the rows of buckets that are full again
+PURGE_PROBABILITY = 0.01
+
+
+class Limit:
+    """One bucket an attempt draws from."""
+
+    __slots__ = ('scope', 'key', 'burst', 'rate')
+
+    def __init__(self, scope, key, burst, per_minute):
+        self.scope = scope
+        self.key = f"{scope}:{key}"
+        self.burst = burst
+        self.rate = per_minute / 60.0
+
+    def refill(self, tokens, updated_at, now):
+        return min(self.burst, tokens + max(0.0, now - updated_at) * self.rate)
+
+    def wait(self, tokens, target=1):
+        """Seconds until a bucket holding `tokens` holds `target`."""
+        if self.rate <= 0:
+            return float('inf')
+        return max(0.0, (target - tokens) / self.rate)
+
+
+class MemoryBuckets:
+    """Token buckets in this process."""
+
+    def __init__(self, maxsize=MEMORY_BUCKETS):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def take(self, limits, now):
+        with self._lock:
+            levels = []
+            for limit in limits:
+                tokens, updated_at = self._buckets.get(limit.key, (limit.burst, now))
+                levels.append(limit.refill(tokens, updated_at, now))
+            rejected = [(limit, level) for limit, level in zip(limits, levels) if level < 1]
+            if rejected:
+                return rejected
+            for limit, level in zip(limits, levels):
+                self._buckets[limit.key] = (level - 1, now)
+                self._buckets.move_to_end(limit.key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+            return []
+
+
+class SQLiteBuckets:
+    """Token buckets in the login_throttle table, shared by all workers."""
+
+    def take(self, limits, now):
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        # Take the write lock up front, so concurrent attempts cannot both spend the last token
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.execute(
+                f"SELECT key, tokens, updated_at FROM login_throttle WHERE key IN ({', '.join('?' * len(limits))})",
+                [limit.key for limit in limits]
+            )
+            stored = {key: (tokens, updated_at) for key, tokens, updated_at in cursor.fetchall()}
+            levels = [limit.refill(*stored.get(limit.key, (limit.burst, now)), now) for limit in limits]
+            rejected = [(limit, level) for limit, level in zip(limits, levels) if level < 1]
+            if not rejected:
+                cursor.executemany("""
+                    INSERT INTO login_throttle (key, tokens, updated_at, full_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET
+                        tokens = excluded.tokens, updated_at = excluded.updated_at, full_at = excluded.full_at
+                """, [(limit.key, level - 1, now, now + limit.wait(level - 1, limit.burst))
+                      for limit, level in zip(limits, levels)])
+                if random.random() < PURGE_PROBABILITY:
+                    cursor.execute("DELETE FROM login_throttle WHERE full_at < ?", (now,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+        return rejected
+
+
+class LoginThrottle:
+    """Applies the configured limits and counts what it turned away."""
+
+    def __init__(self, enabled=LOGIN_THROTTLE, backend=LOGIN_THROTTLE_BACKEND,
+                 login_ip=(LOGIN_IP_BURST, LOGIN_IP_PER_MINUTE),
+                 login_account=(LOGIN_ACCOUNT_BURST, LOGIN_ACCOUNT_PER_MINUTE),
+                 register_ip=(REGISTER_IP_BURST, REGISTER_IP_PER_MINUTE)):
+        if backend not in ('sqlite', 'memory'):
+            raise ValueError(f"LOGIN_THROTTLE_BACKEND must be sqlite or memory, not {backend}")
+        self.enabled = enabled
+        self.backend = backend
+        self.buckets = SQLiteBuckets() if backend == 'sqlite' else MemoryBuckets()
+        self.login_ip = login_ip
+        self.login_account = login_account
+        self.register_ip = register_ip
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = Counter()
+
+    def check_login(self, ip, email):
+        """Seconds to wait before this login may be attempted, or 0 to go ahead."""
+        return self._take([
+            Limit('login_ip', ip, *self.login_ip),
+            Limit('login_account', email.strip().lower(), *self.login_account),
+        ])
+
+    def check_registration(self, ip):
+        return self._take([Limit('register_ip', ip, *self.register_ip)])
+
+    def _take(self, limits):
+        if not self.enabled:
+            return 0
+        rejected = self.buckets.take(limits, time.time())
+        with self._lock:
+            if not rejected:
+                self.allowed += 1
+            for limit, _ in rejected:
+                self.rejected[limit.scope] += 1
+        if not rejected:
+            return 0
+        wait = max(limit.wait(level) for limit, level in rejected)
+        return int(min(wait, 24 * 3600)) + 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'backend': self.backend,
+                'allowed': self.allowed,
+                'rejected': dict(self.rejected),
+            }
+
+
+login_throttle = LoginThrottle()
+
+
+def configure(enabled=None, backend=None, login_ip=None, login_account=None, register_ip=None):
+    """Replace the process-wide throttle, e.g. from app config."""
+    global login_throttle
+    old = login_throttle
+    login_throttle = LoginThrottle(
+        old.enabled if enabled is None else enabled,
+        backend or old.backend,
+        login_ip or old.login_ip,
+        login_account or old.login_account,
+        register_ip or old.register_ip,
+    )
+    return login_throttle
+
+
+def check_login(ip, email):
+    return login_throttle.check_login(ip, email)
+
+
+def check_registration(ip):
+    return login_throttle.check_registration(ip)
+
+
+def get_throttle_stats():
+    return login_throttle.stats()
+
+
+def init_app(app):
+    configure(
+        app.config.get('LOGIN_THROTTLE', LOGIN_THROTTLE),
+        app.config.get('LOGIN_THROTTLE_BACKEND', LOGIN_THROTTLE_BACKEND),
+        (app.config.get('LOGIN_IP_BURST', LOGIN_IP_BURST), app.config.get('LOGIN_IP_PER_MINUTE', LOGIN_IP_PER_MINUTE)),
+        (app.config.get('LOGIN_ACCOUNT_BURST', LOGIN_ACCOUNT_BURST),
+         app.config.get('LOGIN_ACCOUNT_PER_MINUTE', LOGIN_ACCOUNT_PER_MINUTE)),
+        (app.config.get('REGISTER_IP_BURST', REGISTER_IP_BURST),
+         app.config.get('REGISTER_IP_PER_MINUTE', REGISTER_IP_PER_MINUTE)),
+    )